@@ -1,13 +1,14 @@
 from django.contrib import admin
 
-from api.models import Category, Comment, Genre, Review, Title, User
+from api.models import (Category, Comment, Genre, OutboxMessage, Review, Title,
+                        User)
 
 EVD = '-пусто-'
 
 
 @admin.register(Title)
 class TitleAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'name', 'year', 'description',)
+    list_display = ('pk', 'name', 'year', 'rating', 'description',)
     search_fields = ('text',)
     list_filter = ('year',)
     empty_value_display = EVD
@@ -36,7 +37,7 @@ class ReviewAdmin(admin.ModelAdmin):
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'author', 'title', 'review', 'pub_date', 'text')
+    list_display = ('pk', 'author', 'review', 'pub_date', 'text')
     list_filter = ('pub_date',)
     empty_value_display = EVD
 
@@ -53,3 +54,13 @@ class UserAdmin(admin.ModelAdmin):
     )
     search_fields = ('username', 'email')
     empty_value_display = EVD
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = (
+        'pk', 'recipients', 'subject', 'created', 'attempts', 'sent', 'error'
+    )
+    list_filter = ('sent', 'attempts')
+    search_fields = ('recipients',)
+    empty_value_display = EVD
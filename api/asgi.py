@@ -0,0 +1,97 @@
+"""ASGI-обработчик каталога только для чтения.
+
+Соединения держит цикл событий ASGI-сервера, поэтому тысячи клиентов с
+keep-alive обходятся в одну корутину каждый, а не в воркер. Синхронный
+код Django и DRF выполняется в ограниченном пуле потоков
+(CATALOG_ASGI["THREADS"]): у каждого потока своё соединение с базой,
+так что потоков столько же, сколько соединений. Запросы сверх
+CATALOG_ASGI["MAX_PENDING"] сразу получают 503, а не копятся в очереди.
+
+Обработчик отвечает только на GET, HEAD и OPTIONS для произведений,
+жанров, категорий и отзывов; запись остаётся у WSGI-приложения. Потоковую
+выгрузку export/ тоже отдаёт WSGI-приложение: здесь её курсор читался бы
+в потоке цикла событий.
+"""
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import signals
+from django.core.exceptions import RequestAborted
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.http import (HttpResponse, HttpResponseNotAllowed,
+                         HttpResponseNotFound)
+from django.urls import set_script_prefix
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+CATALOG_PATH = re.compile(
+    r"^/api/v1/(?:categories|genres|titles(?:/[0-9]+/reviews)?)/"
+    r"(?:(?!export/)[^/]+/)?$"
+)
+
+
+class CatalogASGIHandler(ASGIHandler):
+
+    def __init__(self, threads=None, max_pending=None):
+        super().__init__()
+        self.threads = threads or settings.CATALOG_ASGI["THREADS"]
+        self.max_pending = (
+            settings.CATALOG_ASGI["MAX_PENDING"]
+            if max_pending is None else max_pending
+        )
+        # Запросы, которые выполняются или ждут поток. Меняется только
+        # в цикле событий, блокировка не нужна.
+        self.pending = 0
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.threads, thread_name_prefix="catalog"
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await super().__call__(scope, receive, send)
+            return
+        response = self.reject(scope)
+        if response is None:
+            try:
+                body_file = await self.read_body(receive)
+            except RequestAborted:
+                return
+            self.pending += 1
+            try:
+                response = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.respond, scope, body_file
+                )
+            finally:
+                self.pending -= 1
+        response._handler_class = self.__class__
+        await self.send_response(response, send)
+
+    def reject(self, scope):
+        """Ответ без обращения к Django или None, если запрос наш."""
+        if not CATALOG_PATH.match(scope["path"]):
+            return HttpResponseNotFound()
+        if scope["method"] not in SAFE_METHODS:
+            return HttpResponseNotAllowed(SAFE_METHODS)
+        if self.pending >= self.max_pending:
+            response = HttpResponse("Service Unavailable", status=503)
+            response["Retry-After"] = 1
+            return response
+        return None
+
+    def respond(self, scope, body_file):
+        """Выполняется в потоке пула, как запрос WSGI-воркера."""
+        set_script_prefix(self.get_script_prefix(scope))
+        # request_started закрывает устаревшие соединения этого потока.
+        signals.request_started.send(sender=self.__class__, scope=scope)
+        try:
+            request, error_response = self.create_request(scope, body_file)
+            if request is None:
+                return error_response
+            return self.get_response(request)
+        finally:
+            # request_finished ASGIHandler отправляет из цикла событий,
+            # где соединений этого потока не видно.
+            close_old_connections()
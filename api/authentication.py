@@ -0,0 +1,134 @@
+"""JWT-аутентификация без чтения пользователя из базы на каждый запрос.
+
+Токены, выданные MyTokenObtainPairSerializer, несут имя, роль, флаги
+is_staff/is_superuser и версию токенов пользователя (claim ``ver``).
+Из них собирается лёгкий ClaimsUser. Версия сверяется с общим кэшем:
+любое сохранение пользователя, меняющее поля REVOKING_FIELDS (в том числе
+из админки или shell), увеличивает User.token_version, а удаление
+пользователя сбрасывает кэш (api/signals.py), после чего старые токены
+отклоняются. Токены без claims (выданные раньше) проверяются по базе,
+как в JWTAuthentication.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import RoleMixin, User
+
+CLAIMS = ("username", "role", "is_staff", "is_superuser")
+# Изменение этих полей отзывает выданные токены: claims зашиты в токен,
+# а неактивный пользователь не должен проходить аутентификацию.
+REVOKING_FIELDS = CLAIMS + ("is_active",)
+VERSION_CLAIM = "ver"
+VERSION_KEY = "auth:token-version:{}"
+
+
+class ClaimsUser(RoleMixin):
+    """Пользователь, восстановленный из claims токена."""
+
+    __slots__ = ("id", "username", "role", "is_staff", "is_superuser")
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id, username, role, is_staff, is_superuser):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.username
+
+    def __eq__(self, other):
+        return isinstance(other, (ClaimsUser, User)) and self.id == other.pk
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+def token_claims(user):
+    return {claim: getattr(user, claim) for claim in CLAIMS}
+
+
+def token_for_user(user):
+    """Refresh-токен с claims; access-токен наследует их при выпуске."""
+    token = RefreshToken.for_user(user)
+    for claim, value in token_claims(user).items():
+        token[claim] = value
+    token[VERSION_CLAIM] = user.token_version
+    return token
+
+
+def get_cache():
+    return caches[settings.TOKEN_VERSION_CACHE["ALIAS"]]
+
+
+def token_version(user_id):
+    """Текущая версия токенов пользователя или None, если его нет."""
+    cache = get_cache()
+    key = VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = (
+            User.objects.filter(pk=user_id, is_active=True)
+            .values_list("token_version", flat=True)
+            .first()
+        )
+        # -1 запоминает, что пользователя нет, и не даёт бить в базу.
+        cache.set(
+            key,
+            -1 if version is None else version,
+            settings.TOKEN_VERSION_CACHE["TIMEOUT"],
+        )
+        return version
+    return None if version < 0 else version
+
+
+def revoke_tokens(user_id):
+    """Отзывает все выданные пользователю токены.
+
+    Кэш сбрасывается сейчас и ещё раз после коммита, чтобы параллельный
+    запрос не закэшировал прежнюю версию из незакоммиченной транзакции.
+    """
+    User.objects.filter(pk=user_id).update(
+        token_version=F("token_version") + 1
+    )
+    forget_token_version(user_id)
+
+
+def forget_token_version(user_id):
+    """Сбрасывает закэшированную версию сейчас и после коммита."""
+    key = VERSION_KEY.format(user_id)
+    get_cache().delete(key)
+    transaction.on_commit(lambda: get_cache().delete(key))
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+            claims = [validated_token[claim] for claim in CLAIMS]
+        except KeyError:
+            raise AuthenticationFailed(
+                "Token contained no recognizable user identification",
+                code="token_not_valid",
+            )
+        if token_version(user_id) != validated_token[VERSION_CLAIM]:
+            raise AuthenticationFailed(
+                "Token has been revoked", code="token_not_valid"
+            )
+        return ClaimsUser(user_id, *claims)
@@ -0,0 +1,377 @@
+"""Бенчмарк всех маршрутов API через тестовый клиент Django.
+
+Сценарий — метод маршрута из api/urls.py с ролью клиента и телом
+запроса. Для каждого считаются запросы в секунду, p50 и p99 времени
+ответа и число SQL-запросов (на последнем прогревочном запросе, когда
+кэши уже заполнены). Время и SQL считаются только у самого запроса,
+без подготовки данных. Прогон идёт в транзакции, которая откатывается;
+каждая запись — ещё и в своей точке сохранения, поэтому все повторы
+работают с одними и теми же данными. Результат сравнивается с базовым
+(compare): регрессия — рост времени больше допуска или рост числа
+SQL-запросов. Ограничение частоты на время прогона выключено: его
+стоимость измеряет команда bench_throttle.
+"""
+import platform
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+import django
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import override_settings
+from django.urls import URLResolver, reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import codes, metrics
+from .authentication import token_for_user
+from .models import (Category, ChangeLogEntry, Comment, Genre, Review, Title,
+                     User)
+
+ROLES = ("anon", "user", "moderator", "admin")
+
+Scenario = namedtuple(
+    "Scenario", "url_name method role build write format",
+    defaults=(False, "json"),
+)
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def _title(f):
+    return {"pk": f.title.pk}
+
+
+def _review(f):
+    return {"title_id": f.title.pk, "pk": f.review.pk}
+
+
+def _comment(f):
+    return {
+        "title_id": f.title.pk, "review_id": f.review.pk,
+        "pk": f.comment.pk,
+    }
+
+
+def _reviews(f):
+    return {"title_id": f.title.pk}
+
+
+def _comments(f):
+    return {"title_id": f.title.pk, "review_id": f.review.pk}
+
+
+def _batch(f):
+    return [
+        {"name": f"Бенчмарк {i}", "year": 2020,
+         "category": f.category.slug, "genre": [f.genre.slug]}
+        for i in range(20)
+    ]
+
+
+def _token(f):
+    return {
+        "email": f.user.email, "confirmation_code": codes.issue(f.user),
+    }
+
+
+# build(f) -> (kwargs для reverse, тело запроса).
+SCENARIOS = (
+    Scenario("api-root", "get", "anon", lambda f: ({}, None)),
+    Scenario("category-list", "get", "anon", lambda f: ({}, None)),
+    Scenario("category-list", "post", "admin", lambda f: (
+        {}, {"name": "Бенчмарк", "slug": "bench-category"}
+    ), True),
+    Scenario("category-detail", "delete", "admin", lambda f: (
+        {"slug": f.category.slug}, None
+    ), True),
+    Scenario("genre-list", "get", "anon", lambda f: ({}, None)),
+    Scenario("genre-list", "post", "admin", lambda f: (
+        {}, {"name": "Бенчмарк", "slug": "bench-genre"}
+    ), True),
+    Scenario("genre-detail", "delete", "admin", lambda f: (
+        {"slug": f.genre.slug}, None
+    ), True),
+    Scenario("title-list", "get", "anon", lambda f: ({}, None)),
+    Scenario("title-list", "post", "admin", lambda f: ({}, {
+        "name": "Бенчмарк", "year": 2020, "category": f.category.slug,
+        "genre": [f.genre.slug],
+    }), True, "multipart"),
+    Scenario("title-facets", "get", "anon", lambda f: (
+        {}, {"genre": f.genre.slug}
+    )),
+    Scenario("title-top", "get", "anon", lambda f: ({}, None)),
+    Scenario("title-trending", "get", "anon", lambda f: (
+        {}, {"category": f.category.slug}
+    )),
+    Scenario("title-batch", "post", "admin", lambda f: ({}, _batch(f)),
+             True),
+    Scenario("title-detail", "get", "anon", lambda f: (_title(f), None)),
+    Scenario("title-detail", "patch", "admin", lambda f: (
+        _title(f), {"description": "Бенчмарк"}
+    ), True),
+    Scenario("title-detail", "delete", "admin", lambda f: (
+        _title(f), None
+    ), True),
+    Scenario("review-list", "get", "anon", lambda f: (_reviews(f), None)),
+    Scenario("review-list", "post", "user", lambda f: (
+        _reviews(f), {"text": "Бенчмарк", "score": 7}
+    ), True),
+    Scenario("review-export", "get", "user", lambda f: (_reviews(f), None)),
+    Scenario("review-detail", "get", "anon", lambda f: (_review(f), None)),
+    Scenario("review-detail", "patch", "moderator", lambda f: (
+        _review(f), {"text": "Бенчмарк"}
+    ), True),
+    Scenario("review-detail", "delete", "moderator", lambda f: (
+        _review(f), None
+    ), True),
+    Scenario("comment-list", "get", "anon", lambda f: (_comments(f), None)),
+    Scenario("comment-list", "post", "user", lambda f: (
+        _comments(f), {"text": "Бенчмарк"}
+    ), True),
+    Scenario("comment-export", "get", "user", lambda f: (
+        _comments(f), None
+    )),
+    Scenario("comment-detail", "get", "anon", lambda f: (
+        _comment(f), None
+    )),
+    Scenario("comment-detail", "patch", "moderator", lambda f: (
+        _comment(f), {"text": "Бенчмарк"}
+    ), True),
+    Scenario("comment-detail", "delete", "moderator", lambda f: (
+        _comment(f), None
+    ), True),
+    Scenario("users-list", "get", "admin", lambda f: ({}, None)),
+    Scenario("users-list", "post", "admin", lambda f: ({}, {
+        "username": "bench_new", "email": "bench_new@example.com",
+    }), True),
+    Scenario("users-detail", "get", "admin", lambda f: (
+        {"username": f.user.username}, None
+    )),
+    Scenario("users-detail", "patch", "admin", lambda f: (
+        {"username": f.user.username}, {"bio": "Бенчмарк"}
+    ), True),
+    Scenario("users-detail", "delete", "admin", lambda f: (
+        {"username": f.user.username}, None
+    ), True),
+    Scenario("users-user-me", "get", "user", lambda f: ({}, None)),
+    Scenario("users-user-me", "patch", "user", lambda f: (
+        {}, {"bio": "Бенчмарк"}
+    ), True),
+    Scenario("email_auth", "post", "anon", lambda f: (
+        {}, {"email": f.user.email}
+    ), True),
+    Scenario("token_obtain_pair", "post", "anon", lambda f: ({}, _token(f)),
+             True),
+    Scenario("token_refresh", "post", "anon", lambda f: (
+        {}, {"refresh": str(token_for_user(f.user))}
+    ), True),
+    Scenario("changes", "get", "anon", lambda f: (
+        {}, {"after": f.changes_after}
+    )),
+    Scenario("db_stats", "get", "admin", lambda f: ({}, None)),
+    Scenario("metrics", "get", "admin", lambda f: ({}, None)),
+)
+
+
+def scenario_name(scenario):
+    return f"{scenario.url_name} {scenario.method.upper()}"
+
+
+def url_names(patterns=None):
+    """Имена всех маршрутов api/urls.py."""
+    if patterns is None:
+        from .urls import urlpatterns as patterns
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= url_names(pattern.url_patterns)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def uncovered():
+    """Маршруты, для которых нет сценария."""
+    return url_names() - {scenario.url_name for scenario in SCENARIOS}
+
+
+def make_fixture():
+    """Самый обсуждаемый отзыв, его произведение и свежие пользователи."""
+    review = (
+        Review.objects.annotate(comment_count=Count("review"))
+        .filter(comment_count__gt=0)
+        .order_by("-comment_count", "pk")
+        .select_related("title")
+        .first()
+    )
+    if review is None or review.title.category_id is None:
+        raise BenchmarkError(
+            "Нужен отзыв с комментариями на произведение с категорией: "
+            "загрузите данные командой generate_data."
+        )
+    title = review.title
+    # Лента отдаёт последние сто записей журнала.
+    recent = list(
+        ChangeLogEntry.objects.order_by("-seq")
+        .values_list("seq", flat=True)[:100]
+    )
+    users = {
+        role: User.objects.create(
+            username=f"bench_{role}", email=f"bench_{role}@example.com",
+            role=role,
+        )
+        for role in ROLES[1:]
+    }
+    return SimpleNamespace(
+        title=title,
+        review=review,
+        comment=Comment.objects.filter(review=review).first(),
+        category=Category.objects.get(pk=title.category_id),
+        genre=title.genre.order_by("pk").first() or Genre.objects.first(),
+        user=users["user"],
+        users=users,
+        changes_after=recent[-1] - 1 if recent else 0,
+    )
+
+
+def make_clients(fixture):
+    clients = {"anon": APIClient()}
+    for role, user in fixture.users.items():
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {token_for_user(user).access_token}"
+        )
+        clients[role] = client
+    return clients
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def call(client, scenario, fixture):
+    """Один запрос сценария; время и SQL без подготовки данных."""
+    kwargs, data = scenario.build(fixture)
+    path = reverse(scenario.url_name, kwargs=kwargs)
+    request = getattr(client, scenario.method)
+    args = (path,) if data is None else (path, data)
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        started = time.perf_counter()
+        response = request(*args, format=scenario.format)
+        if response.streaming:
+            # Потоковый ответ формируется, пока его читают.
+            b"".join(response.streaming_content)
+        elapsed = time.perf_counter() - started
+    return response, elapsed, queries.count, path
+
+
+def call_isolated(client, scenario, fixture):
+    if not scenario.write:
+        return call(client, scenario, fixture)
+    with transaction.atomic():
+        try:
+            return call(client, scenario, fixture)
+        finally:
+            transaction.set_rollback(True)
+
+
+def measure(client, scenario, fixture, iterations, warmup):
+    for _ in range(warmup):
+        response, _, queries, path = call_isolated(
+            client, scenario, fixture
+        )
+    timings = []
+    errors = 0
+    for _ in range(iterations):
+        response, elapsed, _, _ = call_isolated(client, scenario, fixture)
+        timings.append(elapsed * 1000)
+        errors += response.status_code >= 400
+    timings.sort()
+    return {
+        "method": scenario.method.upper(),
+        "path": path,
+        "status": response.status_code,
+        "errors": errors,
+        "rps": round(len(timings) / (sum(timings) / 1000), 1),
+        "p50_ms": round(metrics.percentile(timings, 0.5), 3),
+        "p99_ms": round(metrics.percentile(timings, 0.99), 3),
+        "queries": queries,
+    }
+
+
+def run(iterations=50, warmup=5, only=None):
+    """Прогон сценариев; only — имена маршрутов из api/urls.py."""
+    scenarios = [
+        scenario for scenario in SCENARIOS
+        if not only or scenario.url_name in only
+    ]
+    routes = {}
+    with override_settings(ROLES_THROTTLE={}), transaction.atomic():
+        fixture = make_fixture()
+        clients = make_clients(fixture)
+        for scenario in scenarios:
+            routes[scenario_name(scenario)] = measure(
+                clients[scenario.role], scenario, fixture,
+                iterations, max(warmup, 1),
+            )
+        transaction.set_rollback(True)
+    return {
+        "meta": {
+            "created": timezone.now().isoformat(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "counts": {
+                model._meta.label_lower: model.objects.count()
+                for model in (User, Category, Genre, Title, Review, Comment)
+            },
+        },
+        "routes": routes,
+    }
+
+
+def compare(current, baseline, tolerance=0.25, noise_ms=0.5):
+    """Регрессии относительно базового результата.
+
+    Время сравнивается с допуском tolerance (доля, для p99 — вдвое
+    больше) и не считается регрессией, пока разница меньше noise_ms;
+    число SQL-запросов не должно расти совсем.
+    """
+    regressions = []
+    for name, result in sorted(current["routes"].items()):
+        base = baseline["routes"].get(name)
+        if base is None:
+            continue
+        # p99 по нескольким десяткам замеров — почти максимум, допуск
+        # для него вдвое больше.
+        limits = (("p50_ms", tolerance), ("p99_ms", 2 * tolerance))
+        for key, allowed in limits:
+            if (result[key] > base[key] * (1 + allowed)
+                    and result[key] - base[key] > noise_ms):
+                regressions.append(
+                    f"{name}: {key} {base[key]} -> {result[key]}"
+                )
+        slower = 1000 / result["rps"] - 1000 / base["rps"]
+        if (result["rps"] * (1 + tolerance) < base["rps"]
+                and slower > noise_ms):
+            regressions.append(
+                f"{name}: rps {base['rps']} -> {result['rps']}"
+            )
+        if result["queries"] > base["queries"]:
+            regressions.append(
+                f"{name}: SQL {base['queries']} -> {result['queries']}"
+            )
+    return regressions
@@ -0,0 +1,81 @@
+"""Кэш ответов каталога с инвалидацией по версиям пространств имён.
+
+Каждое пространство имён (``titles``, ``title:<id>``, ``review:<id>``,
+``genres``, ``categories``, ``users``) хранит в кэше свою версию. Ключ
+ответа строится из версий всех пространств, от которых ответ зависит,
+поэтому запись в базу лишь увеличивает версию, а устаревшие ответы
+перестают находиться и вытесняются кэшем сами. Из тех же версий
+строятся ETag и Last-Modified (api/mixin.py).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+VERSION_KEY = "catalog:ns:{}"
+RESPONSE_KEY = "catalog:response:{}"
+
+
+def get_cache():
+    return caches[settings.CATALOG_CACHE["ALIAS"]]
+
+
+def get_versions(namespaces):
+    """Версии пространств имён; отсутствующие заводятся заново."""
+    cache = get_cache()
+    keys = [VERSION_KEY.format(name) for name in namespaces]
+    found = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def bump(*namespaces):
+    cache = get_cache()
+    keys = [VERSION_KEY.format(name) for name in namespaces]
+    current = cache.get_many(keys)
+    cache.set_many(
+        {key: _new_version(current.get(key, 0)) for key in keys},
+        timeout=None,
+    )
+
+
+def invalidate(*namespaces):
+    """Сбрасывает пространства имён сейчас и ещё раз после коммита.
+
+    Повторный сброс не даёт закэшировать ответ, прочитанный параллельным
+    запросом до того, как транзакция записи стала видна.
+    """
+    bump(*namespaces)
+    transaction.on_commit(lambda: bump(*namespaces))
+
+
+def response_validators(namespaces, request):
+    """Хэш ответа и время его последнего изменения в миллисекундах.
+
+    Хэш зависит от версий пространств имён, пути, параметров и формата
+    ответа, но не от тела: он служит и ключом кэша, и ETag.
+    """
+    versions = get_versions(namespaces)
+    query = sorted(request.query_params.lists())
+    raw = "|".join((
+        ",".join(map(str, versions)),
+        request.path,
+        repr(query),
+        request.accepted_media_type or "",
+    ))
+    return hashlib.md5(raw.encode()).hexdigest(), max(versions, default=0)
+
+
+def response_key(digest):
+    return RESPONSE_KEY.format(digest)
+
+
+def _new_version(previous=0):
+    # Версия — время сброса в миллисекундах: монотонна между перезапусками
+    # и пригодна как отметка времени последнего изменения.
+    return max(int(time.time() * 1000), previous + 1)
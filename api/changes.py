@@ -0,0 +1,271 @@
+"""Журнал изменений каталога для синхронизации по дельтам.
+
+Сигналы (api/signals.py) в той же транзакции, что и запись, добавляют в
+ChangeLogEntry строку с возрастающим seq: модель, id объекта и действие.
+Лента /api/v1/changes/?after=<seq> отдаёт записи после seq пачками, а
+данные объектов — в текущем состоянии, поэтому потребителю достаточно
+применять записи по порядку. Массовая запись в обход сигналов
+добавляет reset: коллекцию модели нужно перечитать целиком.
+
+seq выдаётся при вставке, а видна строка только после коммита, поэтому
+меньший seq может появиться позже большего. Лента останавливается перед
+пропуском в нумерации, пока записи за ним меньше CHANGES["GAP_TIMEOUT"]
+секунд; более старый пропуск — откатившаяся транзакция. compact()
+удаляет записи, перекрытые более поздними по тому же объекту, и записи
+старше CHANGES["RETENTION"]; потребитель, отставший сильнее, получает
+410 и синхронизируется заново.
+
+По тому же журналу индексы в памяти процесса (FollowingIndex: фасеты,
+поиск) узнают о записях других процессов и перечитывают только
+изменённые объекты.
+"""
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, Max, Min, OuterRef
+from django.utils import timezone
+
+from . import cache as catalog_cache
+from .models import Category, ChangeLogEntry, Comment, Genre, Review, Title
+
+Actions = ChangeLogEntry.Actions
+
+MODELS = {
+    "title": Title,
+    "genre": Genre,
+    "category": Category,
+    "review": Review,
+    "comment": Comment,
+}
+LABELS = {model: label for label, model in MODELS.items()}
+
+
+class CompactedError(Exception):
+    """Записи после запрошенного seq уже удалены компактизацией."""
+
+    def __init__(self, latest):
+        super().__init__(latest)
+        self.latest = latest
+
+
+def record(*changes):
+    """Добавляет записи журнала: пары (модель, действие, id объекта)."""
+    now = timezone.now()
+    ChangeLogEntry.objects.bulk_create([
+        ChangeLogEntry(
+            created=now, model=LABELS[model], action=action, object_id=pk
+        )
+        for model, action, pk in changes
+    ])
+
+
+def reset(*models):
+    """Коллекции моделей изменились целиком (массовая запись)."""
+    record(*(
+        (model, Actions.RESET, None) for model in models if model in LABELS
+    ))
+
+
+def latest():
+    return ChangeLogEntry.objects.aggregate(last=Max("seq"))["last"] or 0
+
+
+def read(after, limit):
+    """До limit записей после seq after в порядке seq.
+
+    Записи за пропуском в нумерации отдаются, только когда он старше
+    CHANGES["GAP_TIMEOUT"]. CompactedError — записи сразу после after удалены.
+    """
+    entries = ChangeLogEntry.objects.filter(seq__gt=after)[:limit]
+    border = timezone.now() - timedelta(
+        seconds=settings.CHANGES["GAP_TIMEOUT"]
+    )
+    ready = []
+    expected = after + 1
+    for entry in entries:
+        if entry.seq != expected and entry.created > border:
+            # Перед пропуском может быть незакоммиченная запись.
+            break
+        ready.append(entry)
+        expected = entry.seq + 1
+    if (
+        ready and ready[0].seq > after + 1
+        and not ChangeLogEntry.objects.filter(seq__lte=after).exists()
+    ):
+        raise CompactedError(latest())
+    return ready
+
+
+def position():
+    """seq, после которого журнал нужно дочитать после чтения всей базы.
+
+    Записи моложе CHANGES["GAP_TIMEOUT"] могут быть в ещё не
+    закоммиченных транзакциях, которых чтение базы не увидело, поэтому
+    позиция ставится перед первой из них.
+    """
+    border = timezone.now() - timedelta(
+        seconds=settings.CHANGES["GAP_TIMEOUT"]
+    )
+    first = ChangeLogEntry.objects.filter(created__gt=border).aggregate(
+        first=Min("seq")
+    )["first"]
+    return first - 1 if first else latest()
+
+
+def changed_since(after, labels):
+    """id объектов моделей labels, изменённых после seq after.
+
+    Возвращает (новая позиция, {модель: {id}}). Вместо словаря — None,
+    если коллекцию нужно перечитать целиком: reset одной из моделей или
+    записи после after уже удалены компактизацией.
+    """
+    limit = settings.CHANGES["MAX_BATCH_SIZE"]
+    changed = defaultdict(set)
+    while True:
+        try:
+            entries = read(after, limit)
+        except CompactedError as error:
+            return error.latest, None
+        for entry in entries:
+            if entry.model not in labels:
+                continue
+            if entry.action == Actions.RESET:
+                return entries[-1].seq, None
+            changed[entry.model].add(entry.object_id)
+        if entries:
+            after = entries[-1].seq
+        if len(entries) < limit:
+            return after, changed
+
+
+class FollowingIndex:
+    """Индекс в памяти процесса, который догоняет журнал изменений.
+
+    Подкласс задаёт namespace (версия в кэше каталога: её сдвиг —
+    перестройка во всех процессах, например после массовой записи),
+    labels (модели журнала), rebuild() и reload(changed): перечитать
+    объекты {модель: {id}} и вернуть False, если нужна перестройка.
+    Записи этого процесса применяются после коммита, записи других
+    процессов — при следующем sync() по журналу.
+    """
+
+    namespace = None
+    labels = ()
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.version = None
+        self.seq = None
+
+    def sync(self):
+        """Догоняет журнал; вызывается под self.lock."""
+        current = catalog_cache.get_versions([self.namespace])[0]
+        if current == self.version:
+            self.seq, changed = changed_since(self.seq, self.labels)
+            if changed is not None and self.reload(changed):
+                return
+        seq = position()
+        self.rebuild()
+        self.version, self.seq = current, seq
+
+    def reload_on_commit(self, changed=None):
+        """Перечитывает объекты после коммита; None — перестроить индекс.
+
+        Откаченная запись индекс не меняет.
+        """
+        def apply():
+            with self.lock:
+                if self.version is None:
+                    return
+                if changed is None or not self.reload(changed):
+                    self.version = None
+
+        transaction.on_commit(apply)
+
+
+def snapshots(entries):
+    """Текущие данные объектов записей: {(модель, id): dict}."""
+    wanted = defaultdict(set)
+    for entry in entries:
+        if entry.action in (Actions.CREATE, Actions.UPDATE):
+            wanted[entry.model].add(entry.object_id)
+    data = {}
+    for label, ids in wanted.items():
+        for pk, item in represent(label, ids).items():
+            data[label, pk] = item
+    return data
+
+
+def represent(label, ids):
+    """Данные объектов модели label как в API: {id: dict}.
+
+    У жанров и категорий добавлен id, у отзывов — id произведения, у
+    комментариев — id отзыва и произведения.
+    """
+    from .serializers import (CategorySerializer, CommentSerializer,
+                              GenreSerializer, ReviewSerializer,
+                              TitleSerializer)
+
+    if label == "title":
+        titles = Title.objects.for_listing().in_bulk(ids)
+        return {
+            pk: TitleSerializer(title).data for pk, title in titles.items()
+        }
+    if label in ("genre", "category"):
+        serializer_class = (
+            GenreSerializer if label == "genre" else CategorySerializer
+        )
+        return {
+            pk: {"id": pk, **serializer_class(item).data}
+            for pk, item in MODELS[label].objects.in_bulk(ids).items()
+        }
+    if label == "review":
+        reviews = Review.objects.select_related("author").in_bulk(ids)
+        return {
+            pk: {**ReviewSerializer(review).data, "title": review.title_id}
+            for pk, review in reviews.items()
+        }
+    comments = Comment.objects.select_related("author").annotate(
+        title_id=F("review__title_id")
+    ).in_bulk(ids)
+    return {
+        pk: {
+            **CommentSerializer(comment).data,
+            "review": comment.review_id,
+            "title": comment.title_id,
+        }
+        for pk, comment in comments.items()
+    }
+
+
+def compact(retention=None, compact_after=None):
+    """Удаляет перекрытые и устаревшие записи; возвращает их число.
+
+    Перекрытая запись — та, после которой есть запись того же объекта
+    или reset его модели; обе должны быть старше compact_after секунд,
+    чтобы в свежей части ленты не появлялись пропуски. Последняя запись
+    журнала не удаляется никогда: по ней продолжается нумерация.
+    """
+    options = settings.CHANGES
+    now = timezone.now()
+    if retention is None:
+        retention = options["RETENTION"]
+    if compact_after is None:
+        compact_after = options["COMPACT_AFTER"]
+    old = ChangeLogEntry.objects.filter(
+        created__lt=now - timedelta(seconds=compact_after)
+    )
+    later = old.filter(model=OuterRef("model"), seq__gt=OuterRef("seq"))
+    superseded, _ = old.filter(Exists(
+        later.filter(object_id=OuterRef("object_id"))
+    )).delete()
+    reset_before, _ = old.filter(Exists(
+        later.filter(action=Actions.RESET)
+    )).delete()
+    expired, _ = ChangeLogEntry.objects.filter(
+        created__lt=now - timedelta(seconds=retention), seq__lt=latest()
+    ).delete()
+    return superseded + reset_before + expired
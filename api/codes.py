@@ -0,0 +1,76 @@
+"""Одноразовые коды подтверждения для получения JWT-токена.
+
+В базе лежит только HMAC от email и кода (OneTimeCode.digest, уникальный
+индекс), поэтому проверка кода — поиск по индексу, а не по таблице
+пользователей. Проверка и погашение — один DELETE ... RETURNING: код,
+удалённый этим запросом, верен, второй раз он уже не сработает, а
+пользователь берётся из удалённой записи, а не по email из запроса.
+"""
+import hashlib
+import hmac
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .models import OneTimeCode
+
+PURGE_BATCH_SIZE = 10_000
+
+
+def digest(email, code):
+    message = f"{email.lower()}:{code}".encode()
+    return hmac.new(
+        settings.SECRET_KEY.encode(), message, hashlib.sha256
+    ).hexdigest()
+
+
+def issue(user):
+    """Новый код пользователя; прежние коды перестают действовать."""
+    code = get_random_string()
+    with transaction.atomic():
+        OneTimeCode.objects.filter(user=user).delete()
+        OneTimeCode.objects.create(
+            user=user,
+            digest=digest(user.email, code),
+            expires=timezone.now()
+            + timedelta(seconds=settings.CONFIRMATION_CODE_TTL),
+        )
+    return code
+
+
+def consume(email, code):
+    """Гасит код одним запросом; id его пользователя или None.
+
+    None — код неверен, просрочен или уже погашен.
+    """
+    meta = OneTimeCode._meta
+    ops = connection.ops
+    sql = "DELETE FROM {} WHERE {} = %s AND {} > %s RETURNING {}".format(
+        ops.quote_name(meta.db_table),
+        ops.quote_name(meta.get_field("digest").column),
+        ops.quote_name(meta.get_field("expires").column),
+        ops.quote_name(meta.get_field("user").column),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            digest(email, code),
+            ops.adapt_datetimefield_value(timezone.now()),
+        ])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def purge_expired(batch_size=PURGE_BATCH_SIZE):
+    """Удаляет просроченные коды пачками, не держа долгих блокировок."""
+    total = 0
+    while True:
+        pks = list(
+            OneTimeCode.objects.filter(expires__lte=timezone.now())
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return total
+        total += OneTimeCode.objects.filter(pk__in=pks).delete()[0]
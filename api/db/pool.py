@@ -0,0 +1,192 @@
+"""Пул соединений с базой внутри процесса.
+
+Бэкенды api.db.backends.* при закрытии соединения Django возвращают
+открытое соединение драйвера в пул, а при открытии берут его из пула.
+Перед выдачей соединение проверяется запросом ``SELECT 1``; соединения
+старше POOL["MAX_AGE"] секунд закрываются. Пул свой у каждого процесса
+(воркера gunicorn) и общий для его потоков. Настройки — ключ POOL в
+DATABASES:
+
+- MAX_SIZE — сколько соединений может быть открыто одновременно;
+- MAX_AGE — время жизни соединения в секундах;
+- TIMEOUT — сколько секунд ждать свободного соединения;
+- HEALTH_CHECK — проверять ли соединение перед выдачей.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULTS = {
+    "MAX_SIZE": 10,
+    "MAX_AGE": 300,
+    "TIMEOUT": 5,
+    "HEALTH_CHECK": True,
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class ConnectionPool:
+
+    def __init__(self, max_size, max_age, timeout, health_check):
+        self.max_size = max_size
+        self.max_age = max_age
+        self.timeout = timeout
+        self.health_check = health_check
+        self.idle = deque()
+        self.in_use = 0
+        # Время открытия каждого соединения пула, выданного или свободного.
+        self.opened = {}
+        self.counters = dict.fromkeys(
+            ("created", "reused", "expired", "broken", "discarded",
+             "timeouts"),
+            0,
+        )
+        self.condition = threading.Condition()
+
+    def acquire(self, connect):
+        """Свободное живое соединение или новое, открытое через connect()."""
+        while True:
+            raw = self.reserve()
+            if raw is None:
+                try:
+                    raw = connect()
+                except BaseException:
+                    self.forget(None, None)
+                    raise
+                with self.condition:
+                    self.opened[raw] = time.monotonic()
+                    self.counters["created"] += 1
+                return raw
+            if self.expired(raw):
+                self.forget(raw, "expired")
+            elif self.health_check and not is_usable(raw):
+                self.forget(raw, "broken")
+            else:
+                with self.condition:
+                    self.counters["reused"] += 1
+                return raw
+
+    def reserve(self):
+        """Занимает место в пуле; свободное соединение или None."""
+        deadline = time.monotonic() + self.timeout
+        with self.condition:
+            while not self.idle and self.in_use >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"Нет свободного соединения с базой за "
+                        f"{self.timeout} с (открыто {self.max_size})"
+                    )
+                self.condition.wait(remaining)
+            self.in_use += 1
+            # Последнее возвращённое соединение: оно проверено недавно.
+            return self.idle.pop() if self.idle else None
+
+    def release(self, raw, reusable=True):
+        if reusable and not self.expired(raw):
+            with self.condition:
+                self.in_use -= 1
+                self.idle.append(raw)
+                self.condition.notify()
+        else:
+            self.forget(raw, "expired" if reusable else "discarded")
+
+    def forget(self, raw, reason):
+        """Закрывает соединение и освобождает его место в пуле."""
+        if raw is not None:
+            try:
+                raw.close()
+            except Exception:
+                pass
+        with self.condition:
+            self.in_use -= 1
+            self.opened.pop(raw, None)
+            if reason:
+                self.counters[reason] += 1
+            self.condition.notify()
+
+    def expired(self, raw):
+        return time.monotonic() - self.opened[raw] >= self.max_age
+
+    def stats(self):
+        with self.condition:
+            return {
+                "max_size": self.max_size,
+                "max_age": self.max_age,
+                "size": self.in_use + len(self.idle),
+                "in_use": self.in_use,
+                "idle": len(self.idle),
+                **self.counters,
+            }
+
+
+def is_usable(raw):
+    try:
+        cursor = raw.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+def get_pool(alias, settings_dict):
+    with _pools_lock:
+        if alias not in _pools:
+            options = {**DEFAULTS, **settings_dict.get("POOL", {})}
+            _pools[alias] = ConnectionPool(
+                max_size=options["MAX_SIZE"],
+                max_age=options["MAX_AGE"],
+                timeout=options["TIMEOUT"],
+                health_check=options["HEALTH_CHECK"],
+            )
+        return _pools[alias]
+
+
+def stats():
+    """Состояние пулов этого процесса по алиасам баз."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {
+        "pid": os.getpid(),
+        "pools": {alias: pool.stats() for alias, pool in pools.items()},
+    }
+
+
+class PooledDatabaseWrapperMixin:
+    """Подмешивается к DatabaseWrapper бэкенда Django."""
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        try:
+            return self.pool.acquire(lambda: connect(conn_params))
+        except PoolTimeoutError as error:
+            raise self.Database.OperationalError(str(error)) from error
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Соединение внутри atomic в пул не возвращается, незавершённая
+        # транзакция вне atomic откатывается.
+        reusable = not self.in_atomic_block
+        if reusable:
+            try:
+                self.connection.rollback()
+            except Exception:
+                reusable = False
+        with self.wrap_database_errors:
+            self.pool.release(self.connection, reusable)
@@ -0,0 +1,230 @@
+"""Счётчики произведений по жанрам, категориям и годам (фасеты).
+
+Индекс держит по битовой карте (int, бит с номером id произведения) на
+каждый жанр, категорию и год. Счётчики при фильтрах — пересечение карт
+и подсчёт единиц, без GROUP BY по таблице связей с жанрами. Индекс общий
+для процесса и устроен как индекс поиска (api/search.py): записи этого
+процесса применяются сигналами после коммита, записи других процессов
+индекс находит в журнале изменений (api/changes.py) и перечитывает только
+изменённые произведения. Массовая запись в обход сигналов меняет версию
+пространства имён FACETS_NAMESPACE, и индекс перестраивается целиком.
+"""
+from collections import defaultdict
+
+from .changes import FollowingIndex
+
+FACETS_NAMESPACE = "title-facets"
+FACETS = ("genre", "category", "year")
+
+
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    # int.bit_count есть с Python 3.10; bin(x).count("1") втрое медленнее.
+    BIT_COUNTS = bytes(bin(byte).count("1") for byte in range(256))
+
+    def popcount(bitmap):
+        size = (bitmap.bit_length() + 7) // 8
+        return sum(bitmap.to_bytes(size, "little").translate(BIT_COUNTS))
+
+
+def make_bitmap(ids):
+    """Битовая карта множества id за один проход."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    bits = bytearray(max(ids) // 8 + 1)
+    for pk in ids:
+        bits[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(bits, "little")
+
+
+class FacetIndex(FollowingIndex):
+
+    namespace = FACETS_NAMESPACE
+    labels = ("title", "genre", "category")
+
+    def __init__(self):
+        super().__init__()
+        self.clear()
+
+    def clear(self):
+        self.titles = {}  # id -> (год, id категории, frozenset id жанров)
+        self.bitmaps = {facet: defaultdict(int) for facet in FACETS}
+        # Число произведений у значения: счётчики без фильтров.
+        self.sizes = {facet: defaultdict(int) for facet in FACETS}
+        self.all = 0
+        # Жанры и категории: id -> (slug, name).
+        self.names = {"genre": {}, "category": {}}
+
+    def counts(self, genre=None, category=None, year=None, ids=None):
+        """Счётчики фасетов среди произведений, прошедших фильтры.
+
+        genre и category — slug (без учёта регистра), ids — id,
+        отобранные остальными фильтрами (None — без ограничения).
+        """
+        with self.lock:
+            self.sync()
+            mask = self.all
+            if ids is not None:
+                mask &= make_bitmap(ids)
+            if year is not None:
+                mask &= self.bitmaps["year"].get(year, 0)
+            for facet, slug in (("genre", genre), ("category", category)):
+                if slug is not None:
+                    mask &= self.bitmaps[facet].get(self.find(facet, slug), 0)
+            return {
+                "count": len(self.titles) if mask == self.all
+                else popcount(mask),
+                "genre": self.dictionary_counts("genre", mask),
+                "category": self.dictionary_counts("category", mask),
+                "year": sorted(
+                    (
+                        {"year": year, "count": count}
+                        for year, count in self.facet_counts("year", mask)
+                    ),
+                    key=lambda item: (-item["count"], -item["year"]),
+                ),
+            }
+
+    def facet_counts(self, facet, mask):
+        if mask == self.all:
+            yield from self.sizes[facet].items()
+            return
+        for value, bitmap in self.bitmaps[facet].items():
+            count = popcount(bitmap & mask)
+            if count:
+                yield value, count
+
+    def dictionary_counts(self, facet, mask):
+        names = self.names[facet]
+        items = [
+            {"slug": names[pk][0], "name": names[pk][1], "count": count}
+            for pk, count in self.facet_counts(facet, mask)
+            if pk in names
+        ]
+        items.sort(key=lambda item: (-item["count"], item["slug"]))
+        return items
+
+    def find(self, facet, slug):
+        slug = slug.lower()
+        for pk, (value, _) in self.names[facet].items():
+            if value.lower() == slug:
+                return pk
+        return None
+
+    def rebuild(self):
+        from .models import Category, Genre, Title
+
+        self.clear()
+        for facet, model in (("genre", Genre), ("category", Category)):
+            self.names[facet] = {
+                pk: (slug, name)
+                for pk, slug, name in model.objects.values_list(
+                    "pk", "slug", "name"
+                )
+            }
+        genres = defaultdict(set)
+        for title_id, genre_id in Title.genre.through.objects.values_list(
+            "title_id", "genre_id"
+        ).iterator():
+            genres[title_id].add(genre_id)
+        members = {facet: defaultdict(list) for facet in FACETS}
+        for pk, year, category_id in Title.objects.order_by().values_list(
+            "pk", "year", "category_id"
+        ).iterator():
+            title_genres = frozenset(genres.get(pk, ()))
+            self.titles[pk] = (year, category_id, title_genres)
+            members["year"][year].append(pk)
+            members["category"][category_id].append(pk)
+            for genre_id in title_genres:
+                members["genre"][genre_id].append(pk)
+        for facet, values in members.items():
+            for value, ids in values.items():
+                if value is not None:
+                    self.bitmaps[facet][value] = make_bitmap(ids)
+                    self.sizes[facet][value] = len(ids)
+        self.all = make_bitmap(self.titles)
+
+    def reload(self, changed):
+        """Перечитывает изменённые произведения, жанры и категории."""
+        from .models import Category, Genre, Title
+
+        for facet, model in (("genre", Genre), ("category", Category)):
+            ids = changed.get(facet)
+            if not ids:
+                continue
+            rows = list(
+                model.objects.filter(pk__in=ids).values_list(
+                    "pk", "slug", "name"
+                )
+            )
+            if len(rows) < len(ids):
+                # Удаление меняет связи и категории произведений каскадом
+                # без сигналов и записей в журнале.
+                return False
+            for pk, slug, name in rows:
+                self.set_name(facet, pk, slug, name)
+        ids = changed.get("title")
+        if ids:
+            genres = defaultdict(set)
+            for title_id, genre_id in Title.genre.through.objects.filter(
+                title_id__in=ids
+            ).values_list("title_id", "genre_id"):
+                genres[title_id].add(genre_id)
+            found = set()
+            for pk, year, category_id in Title.objects.filter(
+                pk__in=ids
+            ).values_list("pk", "year", "category_id"):
+                self.set_title(pk, year, category_id, genres.get(pk, ()))
+                found.add(pk)
+            for pk in ids - found:
+                self.remove_title(pk)
+        return True
+
+    def set_title(self, pk, year, category_id, genre_ids):
+        """Добавляет или меняет произведение."""
+        self.remove_title(pk)
+        self.titles[pk] = (year, category_id, frozenset(genre_ids))
+        bit = 1 << pk
+        self.all |= bit
+        for facet, values in (
+            ("year", (year,)), ("category", (category_id,)),
+            ("genre", genre_ids),
+        ):
+            for value in values:
+                if value is not None:
+                    self.bitmaps[facet][value] |= bit
+                    self.sizes[facet][value] += 1
+
+    def set_name(self, facet, pk, slug, name):
+        self.names[facet][pk] = (slug, name)
+
+    def remove_title(self, pk):
+        previous = self.titles.pop(pk, None)
+        if previous is None:
+            return
+        year, category_id, genre_ids = previous
+        bit = 1 << pk
+        self.all &= ~bit
+        for facet, values in (
+            ("year", (year,)), ("category", (category_id,)),
+            ("genre", genre_ids),
+        ):
+            for value in values:
+                if value is None:
+                    continue
+                bitmap = self.bitmaps[facet][value] & ~bit
+                if bitmap:
+                    self.bitmaps[facet][value] = bitmap
+                    self.sizes[facet][value] -= 1
+                else:
+                    del self.bitmaps[facet][value]
+                    del self.sizes[facet][value]
+
+
+_title_facets = FacetIndex()
+
+
+def title_facets():
+    return _title_facets
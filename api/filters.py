@@ -2,6 +2,7 @@ import django_filters
 from django_filters.rest_framework import filters
 
 from .models import Title
+from .search import search_titles
 
 
 class TitleFilter(django_filters.FilterSet):
@@ -15,7 +16,14 @@ class TitleFilter(django_filters.FilterSet):
         field_name='genre__slug',
         lookup_expr='iexact'
     )
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Title
         fields = '__all__'
+        exclude = (
+            'rating_sum', 'rating_count', 'rating_avg', 'trending_score'
+        )
+
+    def filter_search(self, queryset, name, value):
+        return search_titles(queryset, value)
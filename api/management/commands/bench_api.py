@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет все маршруты API через тестовый клиент Django на "
+        "текущей базе (данные — generate_data) и выводит запросы в "
+        "секунду, p50 и p99 в миллисекундах и число SQL-запросов. "
+        "Изменения откатываются. С --baseline завершается ошибкой при "
+        "регрессии относительно сохранённого результата."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--output", help="Куда записать результат.")
+        parser.add_argument("--baseline", help="Результат для сравнения.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.25,
+            help="Допустимый рост времени, доля (0.25 — на 25%%).",
+        )
+        parser.add_argument(
+            "--noise-ms", type=float, default=0.5,
+            help="Разница времени, которая не считается регрессией.",
+        )
+        parser.add_argument(
+            "--only", nargs="+", metavar="URL_NAME",
+            help="Только эти маршруты (имена из api/urls.py).",
+        )
+
+    def handle(self, *args, **options):
+        missing = benchmark.uncovered()
+        if missing:
+            raise CommandError(
+                f"Нет сценариев для маршрутов: {', '.join(sorted(missing))}"
+            )
+        try:
+            result = benchmark.run(
+                options["iterations"], options["warmup"], options["only"]
+            )
+        except benchmark.BenchmarkError as error:
+            raise CommandError(error)
+        self.report(result)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as stream:
+                json.dump(result, stream, ensure_ascii=False, indent=2)
+                stream.write("\n")
+        failed = [
+            f"{name}: статус {route['status']}"
+            for name, route in result["routes"].items() if route["errors"]
+        ]
+        if options["baseline"]:
+            failed += self.compare(result, options)
+        if failed:
+            raise CommandError("\n".join(failed))
+
+    def report(self, result):
+        self.stdout.write(
+            f"{'маршрут':<28}{'rps':>9}{'p50':>9}{'p99':>9}{'SQL':>5}"
+        )
+        for name, route in result["routes"].items():
+            self.stdout.write(
+                f"{name:<28}{route['rps']:>9.1f}{route['p50_ms']:>9.2f}"
+                f"{route['p99_ms']:>9.2f}{route['queries']:>5}"
+            )
+
+    def compare(self, result, options):
+        with open(options["baseline"], encoding="utf-8") as stream:
+            baseline = json.load(stream)
+        if baseline["meta"].get("counts") != result["meta"]["counts"]:
+            self.stderr.write(
+                "Данные отличаются от базового прогона: сравнение неточно."
+            )
+        regressions = benchmark.compare(
+            result, baseline, options["tolerance"], options["noise_ms"]
+        )
+        if not regressions:
+            self.stdout.write("Регрессий нет.")
+        return regressions
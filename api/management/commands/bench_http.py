@@ -0,0 +1,128 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.metrics import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест по HTTP: заданное число соединений keep-alive "
+        "по кругу запрашивают адреса в течение заданного времени. "
+        "Выводит пропускную способность, ошибки и задержку (p50, p95, "
+        "p99, max). Нужен, чтобы сравнить gunicorn и ASGI-приложение "
+        "каталога на одних и тех же запросах."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+")
+        parser.add_argument("--connections", type=int, default=100)
+        parser.add_argument("--duration", type=float, default=10)
+        parser.add_argument(
+            "--timeout", type=float, default=10,
+            help="Тайм-аут одного запроса, в секундах.",
+        )
+
+    def handle(self, *args, **options):
+        targets = []
+        for url in options["urls"]:
+            parts = urlsplit(url)
+            if parts.scheme != "http":
+                raise CommandError(f"Поддерживается только http: {url}")
+            path = parts.path or "/"
+            if parts.query:
+                path = f"{path}?{parts.query}"
+            targets.append((parts.hostname, parts.port or 80, path))
+        stats = asyncio.run(self.run(targets, options))
+        latencies = sorted(stats["latencies"])
+        elapsed = stats["elapsed"]
+        self.stdout.write(
+            f"соединений: {options['connections']}, "
+            f"время: {elapsed:.1f} с, запросов: {len(latencies)}, "
+            f"в секунду: {len(latencies) / elapsed:.0f}"
+        )
+        self.stdout.write(
+            f"ошибок: {stats['errors']}, "
+            f"переподключений: {stats['reconnects']}, "
+            f"статусы: {dict(sorted(stats['statuses'].items()))}"
+        )
+        self.stdout.write(
+            "задержка, мс: "
+            + ", ".join(
+                f"{name} {value * 1000:.1f}"
+                for name, value in (
+                    ("p50", percentile(latencies, 0.5)),
+                    ("p95", percentile(latencies, 0.95)),
+                    ("p99", percentile(latencies, 0.99)),
+                    ("max", latencies[-1] if latencies else 0.0),
+                )
+            )
+        )
+
+    async def run(self, targets, options):
+        stats = {
+            "latencies": [], "errors": 0, "reconnects": 0, "statuses": {},
+        }
+        started = time.perf_counter()
+        deadline = started + options["duration"]
+        await asyncio.gather(*(
+            self.client(targets, position, deadline, options, stats)
+            for position in range(options["connections"])
+        ))
+        stats["elapsed"] = time.perf_counter() - started
+        return stats
+
+    async def client(self, targets, position, deadline, options, stats):
+        """Одно соединение; после закрытия сервером открывает новое."""
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            host, port, path = targets[position % len(targets)]
+            position += 1
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(host, port),
+                        options["timeout"],
+                    )
+                writer.write(
+                    f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+                    "Accept: application/json\r\n\r\n".encode()
+                )
+                status, keep_alive = await asyncio.wait_for(
+                    self.read_response(reader), options["timeout"]
+                )
+            except (OSError, asyncio.TimeoutError, ValueError,
+                    asyncio.IncompleteReadError):
+                stats["errors"] += 1
+                keep_alive = False
+            else:
+                stats["latencies"].append(time.perf_counter() - started)
+                stats["statuses"][status] = (
+                    stats["statuses"].get(status, 0) + 1
+                )
+            if not keep_alive and writer is not None:
+                writer.close()
+                reader = writer = None
+                stats["reconnects"] += 1
+        if writer is not None:
+            writer.close()
+
+    async def read_response(self, reader):
+        """Читает ответ с Content-Length; возвращает (статус, keep-alive)."""
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin1").split("\r\n")
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip().lower()
+        if "content-length" in headers:
+            await reader.readexactly(int(headers["content-length"]))
+            return status, headers.get("connection") != "close"
+        # Без Content-Length тело заканчивается закрытием соединения.
+        await reader.read()
+        return status, False
@@ -0,0 +1,76 @@
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.models import User
+from api.urls import router_v1
+
+METHODS = ("GET", "POST", "PATCH", "DELETE")
+
+
+class Command(BaseCommand):
+    help = (
+        "Измеряет стоимость проверки прав на запрос для каждого viewset: "
+        "все роли и методы, проверка на уровне представления и объекта. "
+        "База данных не используется."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20_000)
+
+    def handle(self, *args, **options):
+        users = [AnonymousUser()] + [
+            User(id=position, username=role, role=role)
+            for position, role in enumerate(User.Roles.values, start=1)
+        ]
+        # Объект чужого автора: проверка автора не проходит, решают роли.
+        obj = SimpleNamespace(author_id=0)
+        factory = APIRequestFactory()
+        self.stdout.write(
+            f"{'viewset':<24}{'проверок':>10}{'запрос, мкс':>14}"
+            f"{'объект, мкс':>14}"
+        )
+        seen = set()
+        for _, viewset, _ in router_v1.registry:
+            if viewset in seen:
+                continue
+            seen.add(viewset)
+            cases = []
+            for user in users:
+                for method in METHODS:
+                    request = Request(factory.generic(method, "/"))
+                    request.user = user
+                    view = viewset(request=request, format_kwarg=None)
+                    cases.append((view, request))
+            per_request = self.measure(
+                cases, options["iterations"],
+                lambda view, request: view.check_permissions(request),
+            )
+            per_object = self.measure(
+                cases, options["iterations"],
+                lambda view, request: view.check_object_permissions(
+                    request, obj
+                ),
+            )
+            self.stdout.write(
+                f"{viewset.__name__:<24}{len(cases):>10}"
+                f"{per_request:>14.2f}{per_object:>14.2f}"
+            )
+
+    def measure(self, cases, iterations, check):
+        """Среднее время одной проверки в микросекундах."""
+        rounds = max(1, iterations // len(cases))
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for view, request in cases:
+                try:
+                    check(view, request)
+                except APIException:
+                    pass
+        elapsed = time.perf_counter() - started
+        return elapsed / (rounds * len(cases)) * 1e6
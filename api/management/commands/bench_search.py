@@ -0,0 +1,106 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.models import Title
+from api.search import search_titles, title_index
+
+SYLLABLES = (
+    "ка", "ро", "ми", "на", "то", "ле", "са", "во", "ри", "до",
+    "ma", "ri", "to", "ne", "la", "so", "di", "ve", "ko", "ba",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает поиск произведений (search) с фильтром name "
+        "(icontains) на синтетическом каталоге. Данные пишутся в "
+        "транзакцию и откатываются, если не указан --keep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--titles", type=int, default=1_000_000)
+        parser.add_argument("--queries", type=int, default=50)
+        parser.add_argument("--words", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--keep", action="store_true")
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])
+        words = self.make_words(rnd, options["words"])
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.fill(rnd, words, options["titles"], options["batch_size"])
+            self.stdout.write(
+                f"Создано произведений: {options['titles']} "
+                f"за {time.perf_counter() - started:.1f} с"
+            )
+            queries = [
+                rnd.choice(words)[:rnd.randint(3, 6)]
+                for _ in range(options["queries"])
+            ]
+            started = time.perf_counter()
+            list(search_titles(Title.objects.all(), queries[0])[:1])
+            self.stdout.write(
+                f"Прогрев поиска (индекс в памяти строится здесь): "
+                f"{time.perf_counter() - started:.2f} с, "
+                f"документов в индексе: {len(title_index())}"
+            )
+            self.report("icontains", queries, lambda query: (
+                Title.objects.filter(name__icontains=query)
+            ))
+            self.report("search", queries, lambda query: (
+                search_titles(Title.objects.all(), query)
+            ))
+            if connection.vendor == "postgresql":
+                # Поиск должен идти по GIN-индексам, а не Seq Scan.
+                self.stdout.write(
+                    search_titles(Title.objects.all(), queries[0]).explain()
+                )
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+    def make_words(self, rnd, count):
+        words = set()
+        while len(words) < count:
+            words.add("".join(
+                rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))
+            ))
+        return sorted(words)
+
+    def fill(self, rnd, words, count, batch_size):
+        # Частота слов убывает по закону Ципфа, как в реальных названиях.
+        weights = list(itertools.accumulate(
+            1 / rank for rank in range(1, len(words) + 1)
+        ))
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            Title.objects.bulk_create(
+                Title(
+                    name=" ".join(rnd.choices(
+                        words, cum_weights=weights, k=rnd.randint(1, 4)
+                    )).capitalize(),
+                    year=rnd.randint(1900, 2020),
+                )
+                for _ in range(size)
+            )
+
+    def report(self, label, queries, make_queryset):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            queryset = make_queryset(query)
+            queryset.count()
+            list(queryset[:10])
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:>10}: медиана {statistics.median(timings):.2f} мс, "
+            f"p95 {p95:.2f} мс, запросов {len(timings)}"
+        )
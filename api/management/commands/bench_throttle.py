@@ -0,0 +1,97 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from django.urls import resolve
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api import throttling
+from api.models import User
+
+PATHS = ("/api/v1/titles/", "/api/v1/auth/token/")
+
+
+class Command(BaseCommand):
+    help = (
+        "Измеряет стоимость ограничения частоты на запрос: проверка "
+        "корзин клиента и маршрута для анонимов и пользователей, в "
+        "памяти процесса и в кэше. База данных не используется."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20_000)
+        parser.add_argument(
+            "--clients", type=int, default=1000,
+            help="Сколько разных клиентов (корзин) в прогоне.",
+        )
+        parser.add_argument(
+            "--cache", action="append", default=[],
+            help="Псевдоним кэша для корзин; можно указать несколько.",
+        )
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        stores = [None] + (options["cache"] or ["catalog"])
+        self.stdout.write(
+            f"{'хранилище':<12}{'клиент':<8}{'маршрут':<22}"
+            f"{'пропущено':>10}{'мкс':>8}"
+        )
+        for alias in stores:
+            # Корзина клиента везде и корзина маршрута у token_obtain_pair;
+            # лимиты с запасом: измеряется проверка, а не отказы.
+            rates = {
+                scope: {"anon": "1000000/s", "user": "1000000/s"}
+                for scope in ("default", "token_obtain_pair")
+            }
+            throttle = {**settings.THROTTLE, "CACHE_ALIAS": alias}
+            with override_settings(ROLES_THROTTLE=rates, THROTTLE=throttle):
+                for kind in ("anon", "user"):
+                    for path in PATHS:
+                        cases = self.cases(
+                            factory, kind, path, options["clients"]
+                        )
+                        allowed, per_request = self.measure(
+                            cases, options["iterations"]
+                        )
+                        self.stdout.write(
+                            f"{alias or 'процесс':<12}{kind:<8}"
+                            f"{resolve(path).url_name:<22}"
+                            f"{allowed:>10.0%}{per_request:>8.2f}"
+                        )
+
+    @staticmethod
+    def cases(factory, kind, path, clients):
+        match = resolve(path)
+        cases = []
+        for number in range(clients):
+            request = factory.get(
+                path, REMOTE_ADDR=f"10.{number >> 16 & 255}."
+                f"{number >> 8 & 255}.{number & 255}"
+            )
+            request.resolver_match = match
+            request = Request(request)
+            request.user = (
+                AnonymousUser() if kind == "anon"
+                else User(id=number + 1, username=f"u{number}", role="user")
+            )
+            cases.append(request)
+        return cases
+
+    @staticmethod
+    def measure(cases, iterations):
+        """Доля пропущенных и среднее время проверки в микросекундах."""
+        throttling.local_buckets = throttling.LocalBuckets()
+        rounds = max(1, iterations // len(cases))
+        allowed = 0
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for request in cases:
+                allowed += throttling.TokenBucketThrottle().allow_request(
+                    request, None
+                )
+        elapsed = time.perf_counter() - started
+        total = rounds * len(cases)
+        return allowed / total, elapsed / total * 1e6
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import changes
+
+
+class Command(BaseCommand):
+    help = (
+        "Сжимает журнал изменений каталога: удаляет записи, перекрытые "
+        "более поздними по тому же объекту, и записи старше "
+        "CHANGES['RETENTION'] секунд. Запускается по расписанию."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention",
+            type=int,
+            default=settings.CHANGES["RETENTION"],
+            help="Сколько секунд хранить записи.",
+        )
+        parser.add_argument(
+            "--compact-after",
+            type=int,
+            default=settings.CHANGES["COMPACT_AFTER"],
+            help="Перекрытые записи старше стольких секунд удаляются.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = changes.compact(
+            options["retention"], options["compact_after"]
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"Удалено записей журнала: {deleted}")
+        )
@@ -0,0 +1,69 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.catalog_io import (CSV_COLUMNS, EXPORT_ORDER, export_records,
+                            write_csv, write_json)
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает каталог в JSON (формат фикстур) или CSV, читая таблицы "
+        "курсором на сервере, так что память не растёт с их размером."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл для выгрузки, '-' — stdout.")
+        parser.add_argument(
+            "--format", choices=("json", "csv"), default="json"
+        )
+        parser.add_argument(
+            "--model",
+            action="append",
+            choices=EXPORT_ORDER,
+            help="Модель для выгрузки; по умолчанию все (в JSON).",
+        )
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        labels = [
+            label for label in EXPORT_ORDER
+            if label in (options["model"] or EXPORT_ORDER)
+        ]
+        if options["format"] == "csv" and len(labels) != 1:
+            raise CommandError("В CSV выгружается одна модель: --model.")
+        counter = Counter()
+        records = counter.wrap(
+            record
+            for label in labels
+            for record in export_records(label, options["chunk_size"])
+        )
+        started = time.perf_counter()
+        stream = (
+            sys.stdout if options["path"] == "-"
+            else open(options["path"], "w", encoding="utf-8", newline="")
+        )
+        try:
+            if options["format"] == "csv":
+                write_csv(stream, records, CSV_COLUMNS[labels[0]])
+            else:
+                write_json(stream, records)
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(
+            f"Выгружено {counter.count} записей за {elapsed:.1f} с "
+            f"({counter.count / elapsed if elapsed else 0:.0f} записей/с)"
+        )
+
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    def wrap(self, records):
+        for record in records:
+            self.count += 1
+            yield record
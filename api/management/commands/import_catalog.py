@@ -0,0 +1,65 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.catalog_io import (MODELS, CatalogImporter, CatalogImportError,
+                            read_csv, read_json)
+
+
+class Command(BaseCommand):
+    help = (
+        "Потоково загружает категории, жанры, произведения, отзывы и "
+        "комментарии из JSON (формат фикстур) или CSV пачками bulk_create."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Файл с данными, '-' — stdin.")
+        parser.add_argument(
+            "--format", choices=("json", "csv"), default="json"
+        )
+        parser.add_argument(
+            "--model",
+            choices=sorted(MODELS),
+            help="Модель записей CSV-файла.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--ignore-conflicts",
+            action="store_true",
+            help="Пропускать записи, уже существующие в базе.",
+        )
+
+    def handle(self, *args, **options):
+        if options["format"] == "csv" and not options["model"]:
+            raise CommandError("Для CSV нужно указать --model.")
+        importer = CatalogImporter(
+            batch_size=options["batch_size"],
+            ignore_conflicts=options["ignore_conflicts"],
+        )
+        started = time.perf_counter()
+        stream = (
+            sys.stdin if options["path"] == "-"
+            else open(options["path"], encoding="utf-8", newline="")
+        )
+        try:
+            if options["format"] == "csv":
+                records = read_csv(stream, options["model"])
+            else:
+                records = read_json(stream)
+            counts = importer.run(records)
+        except CatalogImportError as error:
+            raise CommandError(error)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        for label, count in counts.items():
+            self.stdout.write(f"{label}: {count}")
+        if importer.skipped:
+            self.stdout.write(f"Пропущено записей: {importer.skipped}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Загружено {total} записей за {elapsed:.1f} с "
+            f"({total / elapsed if elapsed else total:.0f} записей/с)"
+        ))
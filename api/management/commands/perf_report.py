@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+
+from api import metrics
+
+SORT_KEYS = {
+    "total": lambda stats: stats.sums[0],
+    "p95": lambda stats: metrics.percentile(sorted(stats.recent(0)), 0.95),
+    "count": lambda stats: stats.count,
+    "db": lambda stats: stats.sums[2],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Сводка метрик запросов по маршрутам со всех воркеров: число "
+        "запросов, перцентили времени по последним запросам, средние "
+        "число и время SQL, время сериализации и размер ответа. Метрики "
+        "воркеры копируют в общий кэш раз в METRICS['FLUSH_INTERVAL'] "
+        "секунд."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sort", choices=sorted(SORT_KEYS), default="total",
+            help="total — суммарное время, db — суммарное время SQL.",
+        )
+        parser.add_argument("--limit", type=int, default=20)
+
+    def handle(self, *args, **options):
+        routes, workers = metrics.collect()
+        self.stdout.write(f"воркеров: {workers}, маршрутов: {len(routes)}")
+        if not routes:
+            return
+        self.stdout.write(
+            f"{'маршрут':<36}{'запросов':>9}{'p50':>8}{'p95':>8}{'p99':>8}"
+            f"{'SQL':>6}{'SQL, мс':>9}{'сер., мс':>9}{'КБ':>8}"
+        )
+        ordered = sorted(
+            routes.items(), key=lambda item: SORT_KEYS[options["sort"]](
+                item[1]
+            ),
+            reverse=True,
+        )
+        for route, stats in ordered[:options["limit"]]:
+            durations = sorted(stats.recent(0))
+            queries, db_time, serialize_time, size = (
+                stats.sums[column] / stats.count for column in range(1, 5)
+            )
+            self.stdout.write(
+                f"{route:<36}{stats.count:>9}"
+                + "".join(
+                    f"{metrics.percentile(durations, fraction) * 1000:>8.1f}"
+                    for fraction in (0.5, 0.95, 0.99)
+                )
+                + f"{queries:>6.1f}{db_time * 1000:>9.2f}"
+                f"{serialize_time * 1000:>9.2f}{size / 1024:>8.1f}"
+            )
+        self.stdout.write(
+            "Время p50–p99 в миллисекундах, остальное — среднее."
+        )
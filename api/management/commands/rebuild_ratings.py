@@ -0,0 +1,93 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from api import changes
+from api.models import Review, Title
+from api.ranking import trending_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает сумму, количество и среднее оценок произведений и "
+        "их обсуждаемость с нуля."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только сообщить о расхождениях, ничего не записывая.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = []
+        with transaction.atomic():
+            titles = Title.objects.only(
+                "id", "rating_sum", "rating_count", "rating_avg",
+                "trending_score",
+            )
+            if not options["check"]:
+                # Блокировка строк произведений до подсчёта: отзывы,
+                # записанные параллельно, применят свою дельту уже поверх
+                # пересчитанных сумм. Проверке блокировка не нужна.
+                titles = titles.select_for_update()
+            titles = list(titles)
+            actual = {
+                row["title_id"]: (row["total"], row["count"])
+                for row in Review.objects.order_by()
+                .values("title_id")
+                .annotate(total=Sum("score"), count=Count("id"))
+            }
+            trending = trending_scores([title.id for title in titles])
+            for title in titles:
+                total, count = actual.get(title.id, (0, 0))
+                expected = (
+                    total, count, total / count if count else None,
+                    trending.get(title.id, 0.0),
+                )
+                if not self.matches(title, expected):
+                    self.stdout.write(
+                        f"{title.id}: {title.rating_sum}/{title.rating_count}"
+                        f" -> {total}/{count}"
+                    )
+                    drifted.append((title, expected))
+            if not options["check"]:
+                for title, expected in drifted:
+                    (title.rating_sum, title.rating_count, title.rating_avg,
+                     title.trending_score) = expected
+                Title.objects.bulk_update(
+                    [title for title, _ in drifted],
+                    ("rating_sum", "rating_count", "rating_avg",
+                     "trending_score"),
+                    batch_size=500,
+                )
+                changes.record(*(
+                    (Title, changes.Actions.UPDATE, title.id)
+                    for title, _ in drifted
+                ))
+
+        if options["check"] and drifted:
+            raise CommandError(
+                f"Рейтинг расходится у {len(drifted)} произведений."
+            )
+        self.stdout.write(
+            self.style.SUCCESS(f"Исправлено произведений: {len(drifted)}")
+        )
+
+    @staticmethod
+    def matches(title, expected):
+        total, count, average, trending = expected
+        # Средняя и обсуждаемость — float: сравниваем с точностью
+        # до накопленной ошибки округления.
+        return (
+            (title.rating_sum, title.rating_count) == (total, count)
+            and (title.rating_avg is None) == (average is None)
+            and (average is None
+                 or math.isclose(title.rating_avg, average))
+            and math.isclose(
+                title.trending_score, trending, rel_tol=1e-6, abs_tol=1e-6
+            )
+        )
@@ -0,0 +1,76 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import codes, outbox
+
+# Как часто удалять старые отправленные письма и просроченные коды
+# подтверждения, в секундах.
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    help = (
+        "Отправляет письма из очереди OutboxMessage. Без --once работает "
+        "постоянно, опрашивая очередь раз в OUTBOX['POLL_INTERVAL'] секунд, "
+        "и раз в час удаляет старые письма и просроченные коды."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Разобрать очередь до конца и выйти.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.OUTBOX["BATCH_SIZE"],
+            help="Писем за одно соединение с почтовым сервером.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=settings.OUTBOX["POLL_INTERVAL"],
+            help="Пауза между опросами пустой очереди, в секундах.",
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help="Только вывести глубину очереди и задержку доставки.",
+        )
+
+    def handle(self, *args, **options):
+        if options["stats"]:
+            for name, value in outbox.stats().items():
+                self.stdout.write(f"{name} {value:g}")
+            return
+        try:
+            self.run(options)
+        except KeyboardInterrupt:
+            pass
+
+    def run(self, options):
+        last_purge = None
+        while True:
+            sent, failed = outbox.deliver_pending(options["batch_size"])
+            for message, error in failed:
+                self.stderr.write(
+                    f"{message.pk} (попытка {message.attempts}): {error}"
+                )
+            if sent or failed:
+                self.stdout.write(
+                    f"Отправлено: {len(sent)}, ошибок: {len(failed)}"
+                )
+                continue
+            if options["once"]:
+                return
+            if (
+                last_purge is None
+                or time.monotonic() - last_purge > PURGE_INTERVAL
+            ):
+                outbox.purge_sent()
+                codes.purge_expired()
+                last_purge = time.monotonic()
+            time.sleep(options["interval"])
@@ -0,0 +1,334 @@
+"""Метрики запросов по маршрутам (viewset и action).
+
+MetricsMiddleware измеряет каждый запрос: время, число и время SQL-
+запросов, время сериализации (TimedRepresentationMixin у сериализаторов)
+и размер ответа. Данные живут в памяти воркера: по маршруту счётчики,
+гистограмма времени и кольцевые буферы последних METRICS["RING_SIZE"]
+запросов для перцентилей. Не чаще раза в METRICS["FLUSH_INTERVAL"]
+секунд воркер копирует их в общий кэш, откуда их собирают эндпоинт
+/api/v1/service/metrics/ (формат Prometheus) и команда perf_report.
+Запросы дольше METRICS["SLOW_REQUEST"] секунд пишутся в лог вместе с SQL.
+Счётчики событий (count) копируются в кэш вместе с метриками маршрутов.
+"""
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ("duration", "queries", "db_time", "serialize_time", "size")
+WORKERS_KEY = "metrics:workers"
+WORKER_KEY = "metrics:worker:{}"
+COUNTERS_KEY = "metrics:counters:{}"
+# Счётчики событий для count(): имя -> описание в формате Prometheus.
+COUNTERS = {
+    "yamdb_throttled_requests_total":
+        "Запросы, отклонённые ограничением частоты.",
+    "yamdb_throttle_fallback_total":
+        "Проверки частоты по локальным корзинам при ошибке общего кэша.",
+}
+# Сколько SQL-запросов медленного запроса попадает в лог.
+SLOW_SQL_LIMIT = 100
+
+_local = threading.local()
+
+
+class RouteStats:
+    """Счётчики, гистограмма и кольцевые буферы одного маршрута."""
+
+    __slots__ = ("samples", "count", "buckets", "sums")
+
+    def __init__(self, ring_size, buckets):
+        self.samples = [array("d", bytes(8 * ring_size)) for _ in FIELDS]
+        self.count = 0
+        self.buckets = [0] * len(buckets)
+        self.sums = [0.0] * len(FIELDS)
+
+    def add(self, values, bucket):
+        slot = self.count % len(self.samples[0])
+        for column, value in enumerate(values):
+            self.samples[column][slot] = value
+            self.sums[column] += value
+        if bucket < len(self.buckets):
+            self.buckets[bucket] += 1
+        self.count += 1
+
+    def recent(self, column):
+        """Значения последних запросов из кольцевого буфера."""
+        return self.samples[column][:min(self.count, len(self.samples[0]))]
+
+    def merge(self, other):
+        """Сумма метрик маршрута двух воркеров (только для чтения)."""
+        merged = RouteStats(0, self.buckets)
+        merged.samples = [
+            self.recent(column) + other.recent(column)
+            for column in range(len(FIELDS))
+        ]
+        merged.count = self.count + other.count
+        merged.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        merged.sums = [a + b for a, b in zip(self.sums, other.sums)]
+        return merged
+
+
+class Registry:
+    """Метрики воркера; общая для его потоков."""
+
+    def __init__(self):
+        self.routes = {}
+        self.counters = {}  # (имя, метки) -> значение
+        self.lock = threading.Lock()
+        self.flushed = 0.0
+
+    def record(self, route, values):
+        options = settings.METRICS
+        bucket = bisect_left(options["BUCKETS"], values[0])
+        with self.lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = RouteStats(
+                    options["RING_SIZE"], options["BUCKETS"]
+                )
+            stats.add(values, bucket)
+        if time.monotonic() - self.flushed >= options["FLUSH_INTERVAL"]:
+            self.flush()
+
+    def count(self, name, labels):
+        with self.lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                route: _copy(stats) for route, stats in self.routes.items()
+            }
+
+    def counters_snapshot(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def flush(self):
+        """Копирует метрики воркера в общий кэш."""
+        self.flushed = time.monotonic()
+        cache = get_cache()
+        timeout = settings.METRICS["FLUSH_INTERVAL"] * 6
+        pid = os.getpid()
+        cache.set_many({
+            WORKER_KEY.format(pid): self.snapshot(),
+            COUNTERS_KEY.format(pid): self.counters_snapshot(),
+        }, timeout)
+        # Гонка между воркерами может потерять pid, но каждый воркер
+        # возвращает себя в список при следующей записи.
+        workers = cache.get(WORKERS_KEY) or set()
+        if pid not in workers:
+            cache.set(WORKERS_KEY, workers | {pid}, None)
+
+
+registry = Registry()
+
+
+def _copy(stats):
+    copy = RouteStats(0, stats.buckets)
+    copy.samples = [column[:] for column in stats.samples]
+    copy.count = stats.count
+    copy.buckets = stats.buckets[:]
+    copy.sums = stats.sums[:]
+    return copy
+
+
+def get_cache():
+    return caches[settings.METRICS["CACHE_ALIAS"]]
+
+
+def collect():
+    """Метрики всех живых воркеров по маршрутам и число воркеров.
+
+    Метрики этого воркера берутся из памяти, остальных — из кэша.
+    """
+    cache = get_cache()
+    pid = os.getpid()
+    workers = (cache.get(WORKERS_KEY) or set()) - {pid}
+    snapshots = cache.get_many([WORKER_KEY.format(other) for other in workers])
+    alive = {pid} | {
+        other for other in workers
+        if WORKER_KEY.format(other) in snapshots
+    }
+    if alive - {pid} != workers:
+        cache.set(WORKERS_KEY, alive, None)
+    routes = registry.snapshot()
+    for snapshot in snapshots.values():
+        for route, stats in snapshot.items():
+            routes[route] = (
+                routes[route].merge(stats) if route in routes else stats
+            )
+    return routes, len(alive)
+
+
+def collect_counters():
+    """Счётчики событий всех живых воркеров: {(имя, метки): значение}."""
+    cache = get_cache()
+    workers = (cache.get(WORKERS_KEY) or set()) - {os.getpid()}
+    totals = registry.counters_snapshot()
+    snapshots = cache.get_many(
+        [COUNTERS_KEY.format(other) for other in workers]
+    )
+    for counters in snapshots.values():
+        for key, value in counters.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def count(name, **labels):
+    """Увеличивает счётчик события name (из COUNTERS) с метками labels."""
+    registry.count(name, tuple(sorted(labels.items())))
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def measure_serialization(represent, instance):
+    """Время сериализации внешнего объекта; вложенные не считаются."""
+    sample = getattr(_local, "sample", None)
+    if sample is None or sample.serializing:
+        return represent(instance)
+    sample.serializing = True
+    started = time.perf_counter()
+    try:
+        return represent(instance)
+    finally:
+        sample.serialize_time += time.perf_counter() - started
+        sample.serializing = False
+
+
+class RequestSample:
+    __slots__ = (
+        "route", "queries", "db_time", "serialize_time", "serializing",
+    )
+
+    def __init__(self):
+        self.route = "unmatched"
+        self.queries = []
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.db_time += duration
+            self.queries.append((sql, duration))
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = _local.sample = RequestSample()
+        started = time.perf_counter()
+        try:
+            # В проекте одна база.
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(sample):
+                response = self.get_response(request)
+        finally:
+            _local.sample = None
+        duration = time.perf_counter() - started
+        size = 0 if response.streaming else len(response.content)
+        registry.record(sample.route, (
+            duration, len(sample.queries), sample.db_time,
+            sample.serialize_time, size,
+        ))
+        if duration >= settings.METRICS["SLOW_REQUEST"]:
+            log_slow_request(request, response, sample, duration)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        sample = getattr(_local, "sample", None)
+        if sample is not None:
+            sample.route = route_name(request, view_func)
+
+
+def route_name(request, view_func):
+    """TitleModelViewSet.list, email_auth.post, admin:index."""
+    method = request.method.lower()
+    cls = getattr(view_func, "cls", None)
+    if cls is None:
+        return request.resolver_match.view_name or view_func.__name__
+    actions = getattr(view_func, "actions", None) or {}
+    return f"{cls.__name__}.{actions.get(method, method)}"
+
+
+def log_slow_request(request, response, sample, duration):
+    lines = [
+        f"{spent * 1000:.1f} ms {sql}"
+        for sql, spent in sample.queries[:SLOW_SQL_LIMIT]
+    ]
+    if len(sample.queries) > SLOW_SQL_LIMIT:
+        lines.append(f"... ещё {len(sample.queries) - SLOW_SQL_LIMIT}")
+    logger.warning(
+        "Медленный запрос %s %s (%s, статус %s): %.1f ms, SQL %d за %.1f ms"
+        "\n%s",
+        request.method, request.get_full_path(), sample.route,
+        response.status_code, duration * 1000, len(sample.queries),
+        sample.db_time * 1000, "\n".join(lines),
+    )
+
+
+def render_prometheus(routes, workers, counters=None):
+    """Текстовый формат Prometheus; counters — как у collect_counters."""
+    buckets = settings.METRICS["BUCKETS"]
+    lines = [
+        "# HELP yamdb_metrics_workers Воркеры, чьи метрики собраны.",
+        "# TYPE yamdb_metrics_workers gauge",
+        f"yamdb_metrics_workers {workers}",
+        "# HELP yamdb_request_duration_seconds Время обработки запроса.",
+        "# TYPE yamdb_request_duration_seconds histogram",
+    ]
+    for route, stats in sorted(routes.items()):
+        label = f'route="{route}"'
+        cumulative = 0
+        for bound, count in zip(buckets, stats.buckets):
+            cumulative += count
+            lines.append(
+                f'yamdb_request_duration_seconds_bucket{{{label},'
+                f'le="{bound}"}} {cumulative}'
+            )
+        lines += [
+            f'yamdb_request_duration_seconds_bucket{{{label},le="+Inf"}} '
+            f'{stats.count}',
+            f"yamdb_request_duration_seconds_sum{{{label}}} {stats.sums[0]}",
+            f"yamdb_request_duration_seconds_count{{{label}}} {stats.count}",
+        ]
+    for column, name, help_text in (
+        (1, "yamdb_db_queries_total", "SQL-запросы."),
+        (2, "yamdb_db_query_seconds_total", "Время SQL-запросов."),
+        (3, "yamdb_serialize_seconds_total", "Время сериализации."),
+        (4, "yamdb_response_bytes_total", "Размер ответов."),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [
+            f'{name}{{route="{route}"}} {stats.sums[column]}'
+            for route, stats in sorted(routes.items())
+        ]
+    counters = counters or {}
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (counter, labels), total in sorted(counters.items()):
+            if counter == name:
+                label = ",".join(f'{key}="{value}"' for key, value in labels)
+                lines.append(f"{name}{{{label}}} {total}")
+    return "\n".join(lines) + "\n"
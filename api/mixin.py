@@ -1,6 +1,19 @@
-from rest_framework import mixins
+import json
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from rest_framework import mixins, permissions, serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from . import cache as catalog_cache
+
 
 class CreateListDestroyModelMixinViewSet(
     mixins.CreateModelMixin,
@@ -9,3 +22,128 @@ class CreateListDestroyModelMixinViewSet(
     GenericViewSet,
 ):
     pass
+
+
+class ConditionalReadModelMixin:
+    """ETag и Last-Modified для list и retrieve без сериализации тела.
+
+    Валидаторы строятся из версий пространств имён кэша каталога, от
+    которых зависит ответ: cache_namespaces — для списка,
+    detail_cache_namespaces — для объекта. В шаблонах ``{}`` заменяется
+    значением lookup, ``{title_id}`` и подобные — аргументами URL.
+    Запрос с совпавшим If-None-Match получает 304 без обращения к базе.
+    Проверки прав выполняются до этого. Last-Modified — справочный: его
+    точность — секунда, а версии меняются чаще, поэтому If-Modified-Since
+    на 304 не влияет.
+    """
+
+    cache_namespaces = ()
+    detail_cache_namespaces = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.cache_namespaces, super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            self.detail_cache_namespaces, super().retrieve,
+            request, *args, **kwargs
+        )
+
+    def conditional_response(self, templates, handler, request, *args,
+                             **kwargs):
+        lookup = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        namespaces = [name.format(lookup, **kwargs) for name in templates]
+        digest, version = catalog_cache.response_validators(
+            namespaces, request
+        )
+        etag = f'"{digest}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.read_response(
+                digest, handler, request, *args, **kwargs
+            )
+        if response.status_code in (
+            status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED
+        ):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(version // 1000)
+        return response
+
+    def read_response(self, digest, handler, request, *args, **kwargs):
+        return handler(request, *args, **kwargs)
+
+
+class CachedReadModelMixin(ConditionalReadModelMixin):
+    """Read-through кэш для list и retrieve под тем же ключом, что ETag."""
+
+    def read_response(self, digest, handler, request, *args, **kwargs):
+        cache = catalog_cache.get_cache()
+        key = catalog_cache.response_key(digest)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.CATALOG_CACHE["TIMEOUT"])
+        return response
+
+
+class NDJSONExportMixin:
+    """Потоковая выгрузка списка в NDJSON: ``export/``, по строке на запись.
+
+    Записи читаются курсором на сервере пачками по export_chunk_size без
+    моделей и сериализаторов, поэтому память не растёт с размером
+    выгрузки, а первые строки уходят клиенту сразу. Порядок — по
+    (pub_date, id); ``?since=`` выгружает записи с pub_date не раньше
+    указанной: для следующей синхронизации достаточно передать дату
+    последней полученной записи и пропустить уже известные id.
+    export_fields — пары (ключ в строке, поле для values()).
+    """
+
+    export_fields = ()
+    export_chunk_size = 2000
+    # Сколько строк отдаётся серверу одной записью.
+    export_lines_per_write = 100
+
+    @action(
+        methods=["GET"],
+        detail=False,
+        permission_classes=[permissions.IsAuthenticated],
+    )
+    def export(self, request, *args, **kwargs):
+        """Все записи списка одним потоковым ответом NDJSON."""
+        queryset = self.get_queryset().order_by("pub_date", "id")
+        since = request.query_params.get("since")
+        if since:
+            moment = parse_datetime(since)
+            if moment is None:
+                raise ParseError(detail="since — дата и время в ISO 8601.")
+            if timezone.is_naive(moment):
+                moment = timezone.make_aware(moment, timezone.utc)
+            queryset = queryset.filter(pub_date__gte=moment)
+        rows = queryset.values_list(
+            *(field for _, field in self.export_fields)
+        ).iterator(chunk_size=self.export_chunk_size)
+        response = StreamingHttpResponse(
+            self.export_lines(rows), content_type="application/x-ndjson"
+        )
+        # Выгрузку не кэшируют и не буферизуют прокси (nginx).
+        patch_cache_control(response, private=True, no_store=True)
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    def export_lines(self, rows):
+        keys = [key for key, _ in self.export_fields]
+        dates = serializers.DateTimeField()
+        lines = []
+        for row in rows:
+            record = dict(zip(keys, row))
+            record["pub_date"] = dates.to_representation(record["pub_date"])
+            lines.append(json.dumps(record, ensure_ascii=False))
+            if len(lines) >= self.export_lines_per_write:
+                yield ("\n".join(lines) + "\n").encode()
+                lines = []
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
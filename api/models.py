@@ -3,7 +3,8 @@ import datetime
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
@@ -13,7 +14,25 @@ def max_value_current_year(value):
         value)
 
 
-class User(AbstractUser):
+class RoleMixin:
+    """Проверки роли; общие для User и пользователя из токена."""
+
+    __slots__ = ()
+
+    @property
+    def is_admin(self):
+        return self.role == "admin" or self.is_superuser
+
+    @property
+    def is_moder(self):
+        return self.role == "moderator" or self.is_staff
+
+    @property
+    def is_user(self):
+        return self.role == "user"
+
+
+class User(RoleMixin, AbstractUser):
     """User model with some custom fields."""
 
     class Roles(models.TextChoices):
@@ -26,27 +45,49 @@ class User(AbstractUser):
         _("role"), choices=Roles.choices, default=Roles.USER, max_length=30
     )
     bio = models.TextField(_("biography"), blank=True)
-    confirmation_code = models.CharField(
-        _("confirmation code"), max_length=100, blank=True
+    token_version = models.PositiveIntegerField(
+        _("token version"),
+        default=0,
+        editable=False,
+        help_text=_("Incremented to revoke issued JWT tokens."),
     )
 
-    @property
-    def is_admin(self):
-        return self.role == "admin" or self.is_superuser
+    class Meta:
+        ordering = ("username",)
 
-    @property
-    def is_moder(self):
-        return self.role == "moderator" or self.is_staff
 
-    @property
-    def is_user(self):
-        return self.role == "user"
+class AtomicSaveMixin:
+    """save() в транзакции вместе с сигналами: журнал изменений и рейтинг.
 
-    class Meta:
-        ordering = ("username",)
+    delete() и так выполняет сигналы внутри транзакции удаления.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+class TitleQuerySet(models.QuerySet):
+    def for_listing(self):
+        """Категория через JOIN, жанры одним запросом на всю страницу.
+
+        Рейтинг хранится в самой строке (rating_sum, rating_count),
+        поэтому отдельная агрегация по отзывам не нужна.
+        """
+        return self.select_related("category").prefetch_related("genre")
 
+    def top_rated(self):
+        return self.filter(rating_avg__isnull=False).order_by(
+            "-rating_avg", "-rating_count", "id"
+        )
 
-class Title(models.Model):
+    def trending(self):
+        return self.filter(trending_score__gt=0).order_by(
+            "-trending_score", "id"
+        )
+
+
+class Title(AtomicSaveMixin, models.Model):
     """Название произведения."""
     name = models.TextField(
         "Название произведения",
@@ -81,17 +122,65 @@ class Title(models.Model):
         verbose_name="Жанр",
         related_name="Genre",
     )
+    rating_sum = models.PositiveIntegerField(
+        "Сумма оценок",
+        default=0,
+        editable=False,
+        help_text="Сумма оценок всех отзывов на произведение.",
+    )
+    rating_count = models.PositiveIntegerField(
+        "Количество оценок",
+        default=0,
+        editable=False,
+        help_text="Количество отзывов на произведение.",
+    )
+    rating_avg = models.FloatField(
+        "Средняя оценка",
+        null=True,
+        editable=False,
+        help_text="rating_sum / rating_count, пусто без отзывов.",
+    )
+    trending_score = models.FloatField(
+        "Обсуждаемость",
+        default=0,
+        editable=False,
+        help_text="Сумма весов отзывов, убывающих со временем.",
+    )
+
+    objects = TitleQuerySet.as_manager()
 
     def __str__(self) -> str:
         return self.name
 
+    @property
+    def rating(self):
+        """Средняя оценка, округлённая вниз, или None без отзывов."""
+        if not self.rating_count:
+            return None
+        return self.rating_sum // self.rating_count
+
     class Meta:
         ordering = ("year",)
+        indexes = [
+            # Список с фильтром по категории в порядке выдачи.
+            models.Index(
+                fields=("category", "year"), name="title_category_year_idx"
+            ),
+            # Лучшие и обсуждаемые произведения: первые k строк индекса.
+            models.Index(
+                fields=("-rating_avg", "-rating_count", "id"),
+                name="title_rating_avg_idx",
+            ),
+            models.Index(
+                fields=("-trending_score", "id"),
+                name="title_trending_idx",
+            ),
+        ]
         verbose_name = "Произведение"
         verbose_name_plural = "Произведения"
 
 
-class Category(models.Model):
+class Category(AtomicSaveMixin, models.Model):
     """Тип произведения."""
     name = models.CharField(
         "Категория произведения",
@@ -111,7 +200,7 @@ class Category(models.Model):
         verbose_name_plural = "Категории"
 
 
-class Genre(models.Model):
+class Genre(AtomicSaveMixin, models.Model):
     """Название жанра."""
     name = models.TextField(
         "Название жанра",
@@ -131,14 +220,19 @@ class Genre(models.Model):
         verbose_name_plural = "Жанры"
 
 
-class Review(models.Model):
+class Review(AtomicSaveMixin, models.Model):
     """Отзыв с оценкой (рейтингом)."""
     text = models.TextField()
     author = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, related_name="Author"
     )
+    # Индекс по title_id покрывают составные индексы ниже.
     title = models.ForeignKey(
-        Title, on_delete=models.CASCADE, related_name="Title", blank=True
+        Title,
+        on_delete=models.CASCADE,
+        related_name="Title",
+        blank=True,
+        db_index=False,
     )
     score = models.SmallIntegerField(
         validators=[MinValueValidator(1), MaxValueValidator(10)])
@@ -146,33 +240,122 @@ class Review(models.Model):
 
     class Meta:
         ordering = ("-pub_date",)
+        constraints = [
+            models.UniqueConstraint(
+                fields=("title", "author"), name="unique_review_author"
+            ),
+        ]
+        indexes = [
+            # Отзывы произведения от новых к старым, в том числе keyset.
+            models.Index(
+                fields=("title", "-pub_date", "-id"),
+                name="review_title_pub_date_idx",
+            ),
+        ]
         verbose_name = "review"
         verbose_name_plural = "отзывы"
 
 
-class Comment(models.Model):
+class Comment(AtomicSaveMixin, models.Model):
     """Комментарий к отзыву."""
     text = models.TextField()
     pub_date = models.DateTimeField("Дата публикации", auto_now_add=True)
     author = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, related_name="comments"
     )
-    title = models.ForeignKey(
-        Title,
-        on_delete=models.CASCADE,
-        verbose_name="произвидение",
-        help_text="Произведение интелектуальное.",
-        related_name="title",
-    )
     review = models.ForeignKey(
         Review,
         on_delete=models.CASCADE,
         verbose_name="отзыв",
         help_text="Отзыв на котоорый сделан комментарий.",
         related_name="review",
+        db_index=False,
     )
 
     class Meta:
         ordering = ("-pub_date",)
+        indexes = [
+            models.Index(
+                fields=("review", "-pub_date", "-id"),
+                name="comment_review_pub_date_idx",
+            ),
+        ]
         verbose_name = "comment"
         verbose_name_plural = "комментарии"
+
+
+class OutboxMessage(models.Model):
+    """Письмо, ожидающее отправки командой send_outbox (api/outbox.py)."""
+    subject = models.CharField("Тема", max_length=255)
+    body = models.TextField("Текст")
+    from_email = models.CharField("Отправитель", max_length=254)
+    recipients = models.TextField("Получатели", help_text="Через запятую.")
+    created = models.DateTimeField("Поставлено в очередь", auto_now_add=True)
+    next_attempt = models.DateTimeField(
+        "Следующая попытка", default=timezone.now
+    )
+    attempts = models.PositiveSmallIntegerField("Попыток", default=0)
+    sent = models.DateTimeField("Отправлено", null=True, blank=True)
+    error = models.TextField("Последняя ошибка", blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.recipients}: {self.subject}"
+
+    class Meta:
+        ordering = ("next_attempt", "id")
+        indexes = [models.Index(fields=("sent", "next_attempt"))]
+        verbose_name = "Исходящее письмо"
+        verbose_name_plural = "Исходящие письма"
+
+
+class ChangeLogEntry(models.Model):
+    """Запись журнала изменений каталога (api/changes.py)."""
+
+    class Actions(models.TextChoices):
+        CREATE = "create"
+        UPDATE = "update"
+        DELETE = "delete"
+        # Коллекция модели изменилась в обход сигналов.
+        RESET = "reset"
+
+    seq = models.BigAutoField("Номер", primary_key=True)
+    created = models.DateTimeField("Время", default=timezone.now)
+    model = models.CharField("Модель", max_length=16)
+    object_id = models.PositiveIntegerField(
+        "id объекта", null=True, blank=True, help_text="Пусто для reset."
+    )
+    action = models.CharField(
+        "Действие", choices=Actions.choices, max_length=6
+    )
+
+    def __str__(self) -> str:
+        return f"{self.seq} {self.action} {self.model} {self.object_id}"
+
+    class Meta:
+        ordering = ("seq",)
+        indexes = [
+            models.Index(
+                fields=("model", "object_id", "seq"),
+                name="changelog_object_idx",
+            ),
+            models.Index(fields=("created",), name="changelog_created_idx"),
+        ]
+        verbose_name = "Изменение каталога"
+        verbose_name_plural = "Журнал изменений каталога"
+
+
+class OneTimeCode(models.Model):
+    """Код подтверждения для получения токена (api/codes.py).
+
+    Хранится только HMAC от email и кода; запись удаляется при
+    использовании, просроченные — командой send_outbox.
+    """
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="one_time_codes"
+    )
+    digest = models.CharField("HMAC кода", max_length=64, unique=True)
+    expires = models.DateTimeField("Действует до", db_index=True)
+
+    class Meta:
+        verbose_name = "Код подтверждения"
+        verbose_name_plural = "Коды подтверждения"
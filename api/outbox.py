@@ -0,0 +1,164 @@
+"""Очередь исходящих писем.
+
+Представление только записывает письмо в таблицу OutboxMessage и сразу
+отвечает. Команда send_outbox забирает письма пачками, отправляет их
+через одно соединение с почтовым сервером и при ошибке откладывает
+повтор с удвоением задержки. Письма, забранные упавшим обработчиком,
+снова становятся доступны по истечении аренды (OUTBOX["LEASE"]).
+
+В письмах лежат коды подтверждения в открытом виде, поэтому текст
+письма стирается, как только оно отправлено или попытки кончились;
+запись остаётся для статистики до OUTBOX["RETENTION"].
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from . import metrics
+from .models import OutboxMessage
+
+# Сколько последних отправленных писем учитывать в оценке задержки.
+LATENCY_SAMPLE = 1000
+
+
+def enqueue(subject, message, recipient_list, from_email=None):
+    """Ставит письмо в очередь; аргументы как у send_mail."""
+    return OutboxMessage.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipients=",".join(recipient_list),
+    )
+
+
+def pending():
+    return OutboxMessage.objects.filter(
+        sent__isnull=True, attempts__lt=settings.OUTBOX["MAX_ATTEMPTS"]
+    )
+
+
+def claim(batch_size):
+    """Забирает готовые к отправке письма в аренду на OUTBOX["LEASE"]."""
+    now = timezone.now()
+    queryset = pending().filter(next_attempt__lte=now)
+    with transaction.atomic():
+        if connections[queryset.db].features.has_select_for_update_skip_locked:
+            # Параллельные обработчики пропускают чужие письма.
+            queryset = queryset.select_for_update(skip_locked=True)
+        messages = list(queryset[:batch_size])
+        OutboxMessage.objects.filter(
+            pk__in=[message.pk for message in messages]
+        ).update(
+            attempts=F("attempts") + 1,
+            next_attempt=now + timedelta(seconds=settings.OUTBOX["LEASE"]),
+        )
+    for message in messages:
+        message.attempts += 1
+    return messages
+
+
+def deliver(messages):
+    """Отправляет письма через одно соединение; возвращает (sent, failed)."""
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        failed = [(message, error) for message in messages]
+    else:
+        try:
+            for message in messages:
+                try:
+                    connection.send_messages([_as_email(message, connection)])
+                except Exception as error:
+                    failed.append((message, error))
+                else:
+                    sent.append(message)
+        finally:
+            connection.close()
+    _mark_sent(sent)
+    _schedule_retries(failed)
+    return sent, failed
+
+
+def deliver_pending(batch_size=None):
+    """Одна пачка: забрать, отправить, отметить результат."""
+    messages = claim(batch_size or settings.OUTBOX["BATCH_SIZE"])
+    if not messages:
+        return [], []
+    return deliver(messages)
+
+
+def purge_sent(retention=None):
+    """Удаляет отправленные письма старше OUTBOX["RETENTION"] секунд."""
+    if retention is None:
+        retention = settings.OUTBOX["RETENTION"]
+    border = timezone.now() - timedelta(seconds=retention)
+    deleted, _ = OutboxMessage.objects.filter(sent__lt=border).delete()
+    return deleted
+
+
+def stats():
+    """Глубина очереди и задержка доставки по последним письмам, в секундах.
+
+    Считается по таблице, поэтому видна из любого процесса, а не только
+    из обработчика.
+    """
+    now = timezone.now()
+    queue = pending()
+    oldest = queue.aggregate(oldest=Min("created"))["oldest"]
+    latencies = sorted(
+        (sent - created).total_seconds()
+        for created, sent in OutboxMessage.objects.filter(sent__isnull=False)
+        .order_by("-sent")
+        .values_list("created", "sent")[:LATENCY_SAMPLE]
+    )
+    return {
+        "queue_depth": queue.count(),
+        "oldest_pending_age": (
+            (now - oldest).total_seconds() if oldest else 0.0
+        ),
+        "failed": OutboxMessage.objects.filter(
+            sent__isnull=True,
+            attempts__gte=settings.OUTBOX["MAX_ATTEMPTS"],
+        ).count(),
+        "latency_p50": metrics.percentile(latencies, 0.5),
+        "latency_p95": metrics.percentile(latencies, 0.95),
+        "latency_max": latencies[-1] if latencies else 0.0,
+    }
+
+
+def _as_email(message, connection):
+    return EmailMessage(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email,
+        to=message.recipients.split(","),
+        connection=connection,
+    )
+
+
+def _mark_sent(messages):
+    if messages:
+        OutboxMessage.objects.filter(
+            pk__in=[message.pk for message in messages]
+        ).update(sent=timezone.now(), error="", body="")
+
+
+def _schedule_retries(failed):
+    now = timezone.now()
+    delay = settings.OUTBOX["RETRY_DELAY"]
+    for message, error in failed:
+        message.error = f"{type(error).__name__}: {error}"
+        message.next_attempt = now + timedelta(
+            seconds=delay * 2 ** (message.attempts - 1)
+        )
+        if message.attempts >= settings.OUTBOX["MAX_ATTEMPTS"]:
+            message.body = ""
+    OutboxMessage.objects.bulk_update(
+        [message for message, _ in failed], ("error", "next_attempt", "body")
+    )
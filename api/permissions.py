@@ -1,5 +1,43 @@
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
+METHOD_BITS = {
+    method: 1 << position
+    for position, method in enumerate(
+        ("GET", "HEAD", "OPTIONS", "POST", "PUT", "PATCH", "DELETE")
+    )
+}
+
+
+def compile_roles_permissions(roles_permissions):
+    """{ресурс: {роль: (методы)}} -> {ресурс: {роль: битовая маска}}.
+
+    Строка вместо кортежа считается одним методом, None — ни одним.
+    """
+    compiled = {}
+    for resource, roles in roles_permissions.items():
+        compiled[resource] = {}
+        for role, methods in roles.items():
+            if isinstance(methods, str):
+                methods = (methods,)
+            mask = 0
+            for method in methods:
+                mask |= METHOD_BITS.get(method, 0)
+            compiled[resource][role] = mask
+    return compiled
+
+
+ROLE_MASKS = compile_roles_permissions(settings.ROLES_PERMISSIONS)
+
+
+@receiver(setting_changed)
+def recompile_roles_permissions(setting, value, **kwargs):
+    global ROLE_MASKS
+    if setting == "ROLES_PERMISSIONS":
+        ROLE_MASKS = compile_roles_permissions(value)
+
 
 class IsAuthorOrReadOnly(BasePermission):
     """
@@ -8,34 +46,36 @@ class IsAuthorOrReadOnly(BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        return request.method in SAFE_METHODS or obj.author == request.user
+        # author_id уже в строке объекта, сам автор не загружается.
+        return (
+            request.method in SAFE_METHODS
+            or obj.author_id == request.user.id
+        )
 
 
 class PermissonForRole(BasePermission):
     """Custom permissons for all models.
 
-    All availiable methods in SETTINGS.ROLES_PERMISSIONS.
-    Needed permisson for each ViewSet passed by argument of this class like:
+    All availiable methods in SETTINGS.ROLES_PERMISSIONS, compiled once
+    into method bitmasks (ROLE_MASKS).
+    Needed permisson for each ViewSet passed by resource name like:
 
-    permissons_clases=[ROLES_PERMISSIONS.get("Genres")]
+    permission_classes=[partial(PermissonForRole, "Genres")]
     """
 
-    def __init__(self, roles_permissions) -> None:
+    def __init__(self, resource) -> None:
         super().__init__()
-        self.roles_permissions = roles_permissions
+        self.masks = ROLE_MASKS[resource]
 
     def has_permission(self, request, view):
-        if request.user.is_authenticated:
-            return (
-                request.user.is_admin
-                or request.method in self.roles_permissions[request.user.role]
-            )
-        return request.method in self.roles_permissions["anon"]
+        user = request.user
+        if user.is_authenticated:
+            if user.is_admin:
+                return True
+            mask = self.masks.get(user.role, 0)
+        else:
+            mask = self.masks["anon"]
+        return bool(mask & METHOD_BITS.get(request.method, 0))
 
     def has_object_permission(self, request, view, obj):
-        if request.user.is_authenticated:
-            return (
-                request.user.is_admin
-                or request.method in self.roles_permissions[request.user.role]
-            )
-        return request.method in self.roles_permissions["anon"]
+        return self.has_permission(request, view)
@@ -0,0 +1,64 @@
+"""Лучшие по оценке и обсуждаемые сейчас произведения.
+
+Средняя оценка (Title.rating_avg) и обсуждаемость (Title.trending_score)
+хранятся в строке произведения и обновляются сигналами отзывов тем же
+UPDATE, что и сумма оценок. По обоим полям есть индексы, поэтому первые
+k произведений читаются из начала индекса, без сортировки каталога.
+
+Обсуждаемость — сумма весов отзывов 2^((t - эпоха) / половина жизни):
+отзыв недельной давности при половине жизни в неделю весит вдвое меньше
+нового. Общий множитель 2^(-сейчас / половина жизни) на порядок не
+влияет, поэтому сохранённые суммы не нужно уменьшать со временем.
+Новый отзыв прибавляет свой вес к сумме, а убранный из произведения —
+пересчитывает её по оставшимся отзывам: вычитание веса свежего отзыва
+из суммы теряет вклад старых, которые легче в 2^52 раз и больше.
+"""
+from collections import defaultdict
+
+from django.conf import settings
+
+from .models import Review, Title
+
+
+def trending_weight(moment):
+    options = settings.TITLE_RANKING
+    age = (moment - options["TRENDING_EPOCH"]).total_seconds()
+    return 2.0 ** (age / options["TRENDING_HALF_LIFE"])
+
+
+def trending_scores(title_ids):
+    """Обсуждаемость произведений по их отзывам: {id: вес}."""
+    scores = defaultdict(float)
+    reviews = (
+        Review.objects.filter(title_id__in=title_ids)
+        .order_by()
+        .values_list("title_id", "pub_date")
+    )
+    for title_id, pub_date in reviews.iterator():
+        scores[title_id] += trending_weight(pub_date)
+    return scores
+
+
+def recount_trending(title_id):
+    """Пересчитывает обсуждаемость произведения по его отзывам.
+
+    Вызывается после UPDATE строки произведения в той же транзакции:
+    строка заблокирована, и отзыв, добавленный параллельно, прибавит
+    свой вес уже к пересчитанной сумме.
+    """
+    Title.objects.filter(pk=title_id).update(
+        trending_score=trending_scores([title_id]).get(title_id, 0.0)
+    )
+
+
+def rebuild_trending(title_ids, batch_size=500):
+    """Пересчитывает обсуждаемость указанных произведений с нуля."""
+    scores = trending_scores(title_ids)
+    Title.objects.bulk_update(
+        [
+            Title(pk=title_id, trending_score=scores.get(title_id, 0.0))
+            for title_id in title_ids
+        ],
+        ("trending_score",),
+        batch_size=batch_size,
+    )
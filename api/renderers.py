@@ -0,0 +1,58 @@
+"""JSON-рендерер на orjson с тем же выводом, что у JSONRenderer DRF.
+
+orjson необязателен: без него, с отступами (``; indent=4``), с
+нестандартными настройками JSON в REST_FRAMEWORK или на данных, которые
+orjson не умеет кодировать, работает обычный JSONRenderer. Единственное
+расхождение — запись экспоненты у float (``1e-7`` вместо ``1e-07``, число
+то же); API чисел с плавающей точкой не отдаёт.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - зависит от окружения
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    # datetime и прочие особые типы кодирует энкодер DRF: у orjson другой
+    # формат дат.
+    orjson_options = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if orjson is not None else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not (self.compact and self.strict and not self.ensure_ascii)
+            or self.get_indent(accepted_media_type, renderer_context or {})
+            is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=self.orjson_options,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранируем U+2028 и U+2029 для JavaScript.
+        return ret.replace(
+            "\u2028".encode(), b"\\u2028"
+        ).replace("\u2029".encode(), b"\\u2029")
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Текстовый формат Prometheus; ошибки выводятся текстом detail."""
+
+    media_type = "text/plain"
+    format = "prometheus"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict):
+            data = f"{data.get('detail', data)}\n"
+        return data.encode(self.charset)
@@ -0,0 +1,241 @@
+"""Полнотекстовый поиск произведений по названию.
+
+На PostgreSQL используются GIN-индексы по tsvector и триграммам (они
+создаются после migrate, см. create_search_indexes): оба условия поиска
+проверяются по индексам и объединяются через BitmapOr. На остальных базах —
+инвертированный индекс в памяти процесса. Оба пути ищут по префиксам слов
+и сортируют результат по релевантности.
+"""
+import bisect
+import heapq
+import math
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.lookups import TrigramSimilar
+from django.db import connections
+from django.db.models import CharField, Func, IntegerField, Q, TextField, Value
+from django.db.models.functions import Cast, Concat
+
+from .changes import FollowingIndex
+
+# Лукап __trigram_similar (оператор % из pg_trgm) регистрирует приложение
+# django.contrib.postgres, но оно требует psycopg2 и не подключено.
+CharField.register_lookup(TrigramSimilar)
+TextField.register_lookup(TrigramSimilar)
+
+TOKEN_RE = re.compile(r"\w+")
+SEARCH_NAMESPACE = "title-search"
+# Вес точного совпадения слова; совпадение по префиксу весит 1.
+EXACT_MATCH_WEIGHT = 2.0
+
+POSTGRES_INDEXES = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS api_title_name_trgm "
+    "ON api_title USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS api_title_name_tsv "
+    "ON api_title USING gin "
+    "(to_tsvector('simple'::regconfig, COALESCE(name, '')))",
+)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+def search_titles(queryset, text):
+    """Произведения, подходящие под запрос, от самых релевантных."""
+    terms = tokenize(text)
+    if not terms:
+        return queryset.none()
+    if is_indexed_in_memory(queryset.db):
+        return _search_index(queryset, terms)
+    return _search_postgresql(queryset, text, terms)
+
+
+def is_indexed_in_memory(using):
+    return connections[using].vendor != "postgresql"
+
+
+def create_search_indexes(using="default", **kwargs):
+    """Обработчик post_migrate: индексы, которых нет в моделях."""
+    if is_indexed_in_memory(using):
+        return
+    with connections[using].cursor() as cursor:
+        for statement in POSTGRES_INDEXES:
+            cursor.execute(statement)
+
+
+def _search_postgresql(queryset, text, terms):
+    from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                                SearchVector,
+                                                TrigramSimilarity)
+
+    vector = SearchVector("name", config="simple")
+    query = SearchQuery(
+        " & ".join(f"{term}:*" for term in terms),
+        config="simple",
+        search_type="raw",
+    )
+    # Сравнение similarity() с порогом индекс не использует, а оператор %
+    # использует; его порог — pg_trgm.similarity_threshold (0.3).
+    return (
+        queryset.annotate(search_document=vector)
+        .filter(Q(search_document=query) | Q(name__trigram_similar=text))
+        .annotate(
+            search_rank=SearchRank(vector, query)
+            + TrigramSimilarity("name", text)
+        )
+        .order_by("-search_rank", "pk")
+    )
+
+
+def _search_index(queryset, terms):
+    ranked = title_index().search(terms, settings.TITLE_SEARCH_MAX_RESULTS)
+    if not ranked:
+        return queryset.none()
+    ids = [pk for pk, _ in ranked]
+    # Место id в строке ",id1,id2,...," задаёт порядок по релевантности:
+    # одна функция вместо CASE на тысячу веток, и count() её не считает.
+    position = Func(
+        Value("," + ",".join(map(str, ids)) + ","),
+        Concat(Value(","), Cast("pk", CharField()), Value(",")),
+        function="INSTR",
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).order_by(position.asc())
+
+
+class InvertedIndex:
+    """Инвертированный индекс: слово -> {id документа: число вхождений}.
+
+    Словарь хранится отсортированным, поэтому все слова с заданным
+    префиксом находятся двоичным поиском.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self.vocabulary = []
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add(self, doc_id, text):
+        self.remove(doc_id)
+        for token in self._add_postings(doc_id, text):
+            bisect.insort(self.vocabulary, token)
+
+    def load(self, documents):
+        """Заполняет пустой индекс парами (id, текст) за один проход."""
+        for doc_id, text in documents:
+            self._add_postings(doc_id, text)
+        self.vocabulary = sorted(self.postings)
+
+    def _add_postings(self, doc_id, text):
+        """Добавляет вхождения документа, возвращает новые слова."""
+        tokens = tokenize(text)
+        self.documents[doc_id] = set(tokens)
+        new_tokens = []
+        for token in tokens:
+            posting = self.postings[token]
+            if not posting:
+                new_tokens.append(token)
+            posting[doc_id] = posting.get(doc_id, 0) + 1
+        return new_tokens
+
+    def remove(self, doc_id):
+        for token in self.documents.pop(doc_id, ()):
+            posting = self.postings[token]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[token]
+                position = bisect.bisect_left(self.vocabulary, token)
+                del self.vocabulary[position]
+
+    def expand(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def search(self, terms, limit):
+        """[(id, релевантность)] документов, где есть все слова запроса."""
+        total = len(self.documents) or 1
+        scores = None
+        for term in terms:
+            term_scores = defaultdict(float)
+            for token in self.expand(term):
+                posting = self.postings[token]
+                idf = math.log(1 + total / len(posting))
+                weight = EXACT_MATCH_WEIGHT if token == term else 1.0
+                for doc_id, frequency in posting.items():
+                    term_scores[doc_id] += weight * idf * frequency
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    doc_id: score + term_scores[doc_id]
+                    for doc_id, score in scores.items()
+                    if doc_id in term_scores
+                }
+            if not scores:
+                return []
+        return heapq.nsmallest(
+            limit, scores.items(), key=lambda item: (-item[1], item[0])
+        )
+
+
+class TitleIndex(InvertedIndex, FollowingIndex):
+    """Индекс названий произведений, общий для процесса.
+
+    Записи этого процесса применяются сигналами после коммита, записи
+    других процессов индекс находит в журнале изменений и перечитывает
+    только изменённые названия; сдвиг версии SEARCH_NAMESPACE (массовая
+    запись) перестраивает его целиком.
+    """
+
+    namespace = SEARCH_NAMESPACE
+    labels = ("title",)
+
+    def __init__(self):
+        InvertedIndex.__init__(self)
+        FollowingIndex.__init__(self)
+
+    def search(self, terms, limit):
+        with self.lock:
+            self.sync()
+            return super().search(terms, limit)
+
+    def rebuild(self):
+        from .models import Title
+
+        self.postings.clear()
+        self.documents.clear()
+        self.load(
+            Title.objects.order_by().values_list("pk", "name").iterator()
+        )
+
+    def reload(self, changed):
+        from .models import Title
+
+        ids = changed.get("title")
+        if ids:
+            names = dict(
+                Title.objects.filter(pk__in=ids).values_list("pk", "name")
+            )
+            for pk in ids:
+                if pk in names:
+                    self.add(pk, names[pk])
+                else:
+                    self.remove(pk)
+        return True
+
+
+_title_index = TitleIndex()
+
+
+def title_index():
+    return _title_index
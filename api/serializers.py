@@ -1,14 +1,96 @@
 import datetime
+from operator import attrgetter
 
-from django.db.models import Avg
+from django.db import transaction
+from django.db.models import Manager
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .models import Category, Comment, Genre, Review, Title, User
+from . import codes, metrics
+from .authentication import token_for_user
+from .catalog_io import insert_genre_links
+from .models import (Category, ChangeLogEntry, Comment, Genre, Review, Title,
+                     User)
+from .signals import catalog_bulk_changed
 
 
-class UserSerializer(serializers.ModelSerializer):
+def compile_representation(serializer):
+    """Функция instance -> dict с тем же выводом, что to_representation.
+
+    Поля разбираются один раз: на каждой строке остаются только чтение
+    атрибута и to_representation поля, без get_attribute, SkipField и
+    OrderedDict. Вложенные сериализаторы компилируются так же.
+    """
+    getters = [
+        (field.field_name, _compile_field(field))
+        for field in serializer._readable_fields
+    ]
+
+    def represent(instance):
+        return {name: getter(instance) for name, getter in getters}
+
+    return represent
+
+
+def _compile_field(field):
+    if isinstance(field, serializers.ListSerializer):
+        child = compile_representation(field.child)
+        read = _compile_source(field)
+        return lambda instance: [
+            child(item) for item in _iterate(read(instance))
+        ]
+    if isinstance(field, serializers.BaseSerializer):
+        nested = compile_representation(field)
+        represent = nested
+    else:
+        represent = field.to_representation
+    read = _compile_source(field)
+
+    def get(instance):
+        value = read(instance)
+        return None if value is None else represent(value)
+
+    return get
+
+
+def _compile_source(field):
+    if len(field.source_attrs) == 1:
+        return attrgetter(field.source_attrs[0])
+    return field.get_attribute
+
+
+def _iterate(value):
+    return value.all() if isinstance(value, Manager) else value
+
+
+class TimedRepresentationMixin:
+    """Время вывода попадает в метрики запроса (api/metrics.py)."""
+
+    def to_representation(self, instance):
+        return metrics.measure_serialization(
+            super().to_representation, instance
+        )
+
+
+class CompiledRepresentationMixin:
+    """Быстрый путь вывода для горячих списков (см. compile_representation).
+
+    Вывод байт в байт совпадает с ModelSerializer, это проверяет
+    tests/test_fast_serialization.py.
+    """
+
+    def to_representation(self, instance):
+        return self.compiled_representation(instance)
+
+    @cached_property
+    def compiled_representation(self):
+        return compile_representation(self)
+
+
+class UserSerializer(TimedRepresentationMixin,
+                     serializers.ModelSerializer):
     """Custom serializer for User model."""
 
     lookup_field = "username"
@@ -25,19 +107,22 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
 
 
-class GenreSerializer(serializers.ModelSerializer):
+class GenreSerializer(TimedRepresentationMixin,
+                      serializers.ModelSerializer):
     class Meta:
         fields = ("name", "slug")
         model = Genre
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(TimedRepresentationMixin,
+                         serializers.ModelSerializer):
     class Meta:
         fields = ("name", "slug")
         model = Category
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(TimedRepresentationMixin, CompiledRepresentationMixin,
+                       serializers.ModelSerializer):
     author = serializers.SlugRelatedField(
         read_only=True, slug_field="username"
     )
@@ -47,19 +132,20 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
 
 
-class CommentSerializer(serializers.ModelSerializer):
-    author = serializers.SerializerMethodField()
-
-    def get_author(self, obj):
-        return obj.author.username
+class CommentSerializer(TimedRepresentationMixin, CompiledRepresentationMixin,
+                        serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        read_only=True, slug_field="username"
+    )
 
     class Meta:
         fields = ("id", "author", "text", "pub_date")
         model = Comment
 
 
-class TitleSerializer(serializers.ModelSerializer):
-    rating = serializers.SerializerMethodField()
+class TitleSerializer(TimedRepresentationMixin, CompiledRepresentationMixin,
+                      serializers.ModelSerializer):
+    rating = serializers.IntegerField(read_only=True)
     genre = GenreSerializer(many=True, read_only=True)
     category = CategorySerializer(read_only=True)
 
@@ -75,13 +161,171 @@ class TitleSerializer(serializers.ModelSerializer):
         )
         model = Title
 
-    def get_rating(self, obj):
-        if Review.objects.filter(title_id=obj.id):
-            rating = Review.objects.filter(title_id=obj.id).aggregate(
-                rating=Avg("score")
-            )["rating"]
-            return int(rating)
-        return None
+
+class TitleBatchSerializer(serializers.ListSerializer):
+    """Пакетное создание произведений или upsert по (name, year).
+
+    Все записи проверяются вместе, slug категорий и жанров разрешаются
+    одним запросом на модель; запись идёт одной транзакцией: bulk_create
+    новых, bulk_update существующих и многострочный INSERT связей.
+    """
+
+    max_items = 1000
+
+    def to_internal_value(self, data):
+        if isinstance(data, list) and len(data) > self.max_items:
+            raise serializers.ValidationError(
+                f"Не больше {self.max_items} произведений за запрос."
+            )
+        items = super().to_internal_value(data)
+        upsert = self.context.get("upsert", False)
+        categories = self._slug_ids(
+            Category, {item["category"] for item in items
+                       if item.get("category")}
+        )
+        genres = self._slug_ids(
+            Genre, {slug for item in items for slug in item["genre"]}
+        )
+        existing = {}
+        for pk, name, year in Title.objects.filter(
+            name__in={item["name"] for item in items}
+        ).order_by("pk").values_list("pk", "name", "year"):
+            existing.setdefault((name, year), pk)
+
+        errors, seen = [], set()
+        for item in items:
+            key = (item["name"], item.get("year"))
+            errors.append(self._item_errors(
+                item, key in seen, key in existing and not upsert,
+                categories, genres,
+            ))
+            seen.add(key)
+            item["pk"] = existing.get(key)
+            item["category_id"] = categories.get(item.get("category"))
+            item["genre_ids"] = sorted(
+                {genres[slug] for slug in item["genre"] if slug in genres}
+            )
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return items
+
+    @staticmethod
+    def _item_errors(item, duplicate, exists, categories, genres):
+        error = {}
+        if duplicate:
+            error["name"] = ["Произведение повторяется в запросе."]
+        elif exists:
+            error["name"] = ["Такое произведение уже существует."]
+        if item.get("category") and item["category"] not in categories:
+            error["category"] = [f"Категория {item['category']} не найдена."]
+        missing = [slug for slug in item["genre"] if slug not in genres]
+        if missing:
+            error["genre"] = [f"Жанр {slug} не найден." for slug in missing]
+        return error
+
+    def create(self, validated_data):
+        titles = [
+            Title(
+                pk=item["pk"],
+                name=item["name"],
+                year=item.get("year"),
+                description=item.get("description", ""),
+                category_id=item["category_id"],
+            )
+            for item in validated_data
+        ]
+        new = [title for title in titles if title.pk is None]
+        updated = [title for title in titles if title.pk is not None]
+        with transaction.atomic():
+            Title.objects.bulk_create(new)
+            if new and new[0].pk is None:
+                # Бэкенд не вернул id вставленных строк: дочитываем их.
+                created = {
+                    (name, year): pk
+                    for pk, name, year in Title.objects.filter(
+                        name__in={title.name for title in new}
+                    ).exclude(
+                        pk__in=[title.pk for title in updated]
+                    ).order_by("pk").values_list("pk", "name", "year")
+                }
+                for title in new:
+                    title.pk = created[(title.name, title.year)]
+            Title.objects.bulk_update(
+                updated, ("name", "year", "description", "category")
+            )
+            Title.genre.through.objects.filter(
+                title_id__in=[title.pk for title in updated]
+            ).delete()
+            insert_genre_links([
+                (title.pk, genre_id)
+                for title, item in zip(titles, validated_data)
+                for genre_id in item["genre_ids"]
+            ])
+            # Журнал пишется в той же транзакции, что и произведения.
+            catalog_bulk_changed.send(
+                sender=self.__class__,
+                models=[Title],
+                title_ids=[title.pk for title in updated],
+                created={Title: [title.pk for title in new]},
+                updated={Title: [title.pk for title in updated]},
+            )
+        return [
+            {
+                "id": title.pk,
+                "name": title.name,
+                "year": title.year,
+                "status": "updated" if item["pk"] else "created",
+            }
+            for title, item in zip(titles, validated_data)
+        ]
+
+    @staticmethod
+    def _slug_ids(model, slugs):
+        if not slugs:
+            return {}
+        return dict(
+            model.objects.filter(slug__in=slugs).values_list("slug", "pk")
+        )
+
+
+class TitleBatchItemSerializer(TimedRepresentationMixin,
+                               serializers.ModelSerializer):
+    category = serializers.SlugField(required=False, allow_null=True)
+    genre = serializers.ListField(
+        child=serializers.SlugField(), required=False, default=list
+    )
+
+    class Meta:
+        fields = ("name", "year", "description", "category", "genre")
+        model = Title
+        list_serializer_class = TitleBatchSerializer
+
+
+class ChangeLogEntrySerializer(TimedRepresentationMixin,
+                               CompiledRepresentationMixin,
+                               serializers.ModelSerializer):
+    """Запись ленты изменений; context["snapshots"] — api.changes.snapshots.
+
+    Если объекта уже нет, запись выводится как delete: его удаление
+    придёт дальше в ленте.
+    """
+    id = serializers.IntegerField(source="object_id")
+    data = serializers.SerializerMethodField()
+
+    class Meta:
+        fields = ("seq", "created", "model", "action", "id", "data")
+        model = ChangeLogEntry
+
+    def get_data(self, entry):
+        return self.context["snapshots"].get((entry.model, entry.object_id))
+
+    def to_representation(self, entry):
+        data = super().to_representation(entry)
+        if data["data"] is None and data["action"] in (
+            ChangeLogEntry.Actions.CREATE, ChangeLogEntry.Actions.UPDATE
+        ):
+            data["action"] = ChangeLogEntry.Actions.DELETE
+        return data
 
 
 def validate_year(self, value):
@@ -101,19 +345,21 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         self.fields["confirmation_code"] = serializers.CharField(required=True)
         self.fields["email"] = serializers.EmailField(required=True)
 
+    @classmethod
+    def get_token(cls, user):
+        return token_for_user(user)
+
     def validate(self, attrs):
-        data = {}
-        user = User.objects.get(email=attrs["email"])
-        confirmation_code = User.objects.get(
-            confirmation_code=attrs["confirmation_code"]
-        )
+        user_id = codes.consume(attrs["email"], attrs["confirmation_code"])
+        # email в коде сравнивается без учёта регистра, поэтому
+        # пользователь ищется по id из кода, а не по email.
+        user = User.objects.filter(pk=user_id).first() if user_id else None
+        if user is None:
+            raise serializers.ValidationError(
+                {"confirmation_code": "Неверный или просроченный код."}
+            )
         refresh = self.get_token(user)
-        if user and confirmation_code:
-            data["refresh"] = str(refresh)
-            data["access"] = str(refresh.access_token)
-            user.confirmation_code = ""
-            user.save()
-        return data
+        return {"refresh": str(refresh), "access": str(refresh.access_token)}
 
 
 class MyTokenObtainPairView(TokenObtainPairView):
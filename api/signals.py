@@ -0,0 +1,319 @@
+from django.db.models import Case, ExpressionWrapper, F, FloatField, Q, When
+from django.db.models.functions import Cast
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import Signal, receiver
+
+from . import cache as catalog_cache
+from . import changes, facets, ranking, search
+from .authentication import (REVOKING_FIELDS, forget_token_version,
+                             revoke_tokens)
+from .models import Category, Comment, Genre, Review, Title, User
+
+# Массовая запись в обход save()/delete() (bulk_create, update):
+# отправитель перечисляет затронутые модели в аргументе models и, если
+# знает, id изменённых произведений и отзывов в title_ids и review_ids.
+# created и updated — {модель: id} созданных и изменённых объектов; по
+# ним журнал получает записи объектов, для остальных моделей — reset.
+catalog_bulk_changed = Signal(
+    providing_args=["models", "title_ids", "review_ids", "created", "updated"]
+)
+
+
+def update_title_rating(title_id, score_delta, count_delta,
+                        trending_delta=0.0):
+    """Атомарно сдвигает сумму и количество оценок произведения.
+
+    Средняя оценка считается в том же UPDATE из прежних значений строки,
+    обсуждаемость сдвигается на trending_delta.
+    """
+    if not (score_delta or count_delta):
+        return
+    new_count = F("rating_count") + count_delta
+    has_reviews = Q(rating_count__gt=-count_delta)
+    Title.objects.filter(pk=title_id).update(
+        rating_sum=F("rating_sum") + score_delta,
+        rating_count=new_count,
+        rating_avg=Case(
+            When(has_reviews, then=ExpressionWrapper(
+                Cast(F("rating_sum") + score_delta, FloatField())
+                / new_count,
+                output_field=FloatField(),
+            )),
+            default=None,
+            output_field=FloatField(),
+        ),
+        # Без отзывов — ровно ноль, а не остаток округления.
+        trending_score=Case(
+            When(has_reviews, then=F("trending_score") + trending_delta),
+            default=0.0,
+            output_field=FloatField(),
+        ),
+    )
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_score(sender, instance, raw, **kwargs):
+    instance._previous_rating = None
+    if raw or instance.pk is None:
+        return
+    # Review.save() открывает транзакцию до pre_save: блокировка строки
+    # держится до записи дельты, и параллельная правка того же отзыва
+    # прочитает уже новую оценку.
+    instance._previous_rating = (
+        Review.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list("title_id", "score")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Review)
+def apply_review_score(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_previous_rating", None)
+    weight = ranking.trending_weight(instance.pub_date)
+    if created or previous is None:
+        update_title_rating(instance.title_id, instance.score, 1, weight)
+        return
+    previous_title_id, previous_score = previous
+    if previous_title_id == instance.title_id:
+        update_title_rating(
+            instance.title_id, instance.score - previous_score, 0
+        )
+        return
+    update_title_rating(previous_title_id, -previous_score, -1)
+    ranking.recount_trending(previous_title_id)
+    update_title_rating(instance.title_id, instance.score, 1, weight)
+
+
+@receiver(post_delete, sender=Review)
+def revoke_review_score(sender, instance, **kwargs):
+    update_title_rating(instance.title_id, -instance.score, -1)
+    ranking.recount_trending(instance.title_id)
+
+
+def invalidate_titles(*title_ids):
+    catalog_cache.invalidate(
+        "titles", *(f"title:{title_id}" for title_id in title_ids)
+    )
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def invalidate_title(sender, instance, **kwargs):
+    invalidate_titles(instance.pk)
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_delete, sender=Title)
+def index_title(sender, instance, using, **kwargs):
+    changed = {"title": {instance.pk}}
+    if search.is_indexed_in_memory(using):
+        search.title_index().reload_on_commit(changed)
+    facets.title_facets().reload_on_commit(changed)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def index_title_genres(sender, instance, action, reverse, pk_set,
+                       **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        facets.title_facets().reload_on_commit({"title": {instance.pk}})
+    elif pk_set:
+        facets.title_facets().reload_on_commit({"title": set(pk_set)})
+    else:
+        # Очистка со стороны жанра: затронутые произведения неизвестны.
+        facets.title_facets().reload_on_commit(None)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+def index_facet_name(sender, instance, **kwargs):
+    facet = "genre" if sender is Genre else "category"
+    facets.title_facets().reload_on_commit({facet: {instance.pk}})
+
+
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+def unindex_facet_name(sender, **kwargs):
+    # Связи и категории произведений меняются каскадом без сигналов.
+    facets.title_facets().reload_on_commit(None)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def invalidate_title_genres(sender, instance, action, reverse, pk_set,
+                            **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        invalidate_titles(instance.pk)
+    elif pk_set:
+        invalidate_titles(*pk_set)
+    else:
+        # Очистка со стороны жанра: затронутые произведения неизвестны.
+        catalog_cache.invalidate("titles", "genres")
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_genre(sender, **kwargs):
+    catalog_cache.invalidate("genres")
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category(sender, **kwargs):
+    catalog_cache.invalidate("categories")
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_review_title(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous_rating", None)
+    if previous is not None and previous[0] != instance.title_id:
+        invalidate_titles(instance.title_id, previous[0])
+    else:
+        invalidate_titles(instance.title_id)
+    catalog_cache.invalidate(f"review:{instance.pk}")
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_review(sender, instance, **kwargs):
+    catalog_cache.invalidate(f"review:{instance.review_id}")
+
+
+@receiver(pre_save, sender=User)
+def remember_token_fields(sender, instance, raw, **kwargs):
+    instance._previous_token_fields = None
+    if raw or instance.pk is None:
+        return
+    instance._previous_token_fields = (
+        User.objects.filter(pk=instance.pk)
+        .values_list(*REVOKING_FIELDS)
+        .first()
+    )
+
+
+@receiver(post_save, sender=User)
+def revoke_changed_tokens(sender, instance, raw, **kwargs):
+    previous = getattr(instance, "_previous_token_fields", None)
+    if raw or previous is None:
+        return
+    current = tuple(getattr(instance, field) for field in REVOKING_FIELDS)
+    if current != previous:
+        # Отдельный UPDATE: save(update_fields=...) не запишет версию.
+        revoke_tokens(instance.pk)
+        instance.refresh_from_db(fields=["token_version"])
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_tokens(sender, instance, **kwargs):
+    forget_token_version(instance.pk)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_users(sender, **kwargs):
+    # Имена авторов входят в ответы с отзывами и комментариями.
+    catalog_cache.invalidate("users")
+
+
+@receiver(post_save, sender=Title)
+@receiver(post_save, sender=Genre)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Comment)
+def log_saved(sender, instance, created, **kwargs):
+    changes.record((
+        sender, changes.Actions.CREATE if created else changes.Actions.UPDATE,
+        instance.pk,
+    ))
+
+
+@receiver(post_delete, sender=Title)
+@receiver(post_delete, sender=Genre)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Comment)
+def log_deleted(sender, instance, **kwargs):
+    changes.record((sender, changes.Actions.DELETE, instance.pk))
+
+
+def log_review(review, action):
+    # Рейтинг входит в данные произведения.
+    title_ids = {review.title_id}
+    previous = getattr(review, "_previous_rating", None)
+    if previous is not None:
+        title_ids.add(previous[0])
+    changes.record((Review, action, review.pk), *(
+        (Title, changes.Actions.UPDATE, title_id)
+        for title_id in sorted(title_ids)
+    ))
+
+
+@receiver(post_save, sender=Review)
+def log_review_saved(sender, instance, created, **kwargs):
+    log_review(
+        instance,
+        changes.Actions.CREATE if created else changes.Actions.UPDATE,
+    )
+
+
+@receiver(post_delete, sender=Review)
+def log_review_deleted(sender, instance, **kwargs):
+    log_review(instance, changes.Actions.DELETE)
+
+
+@receiver(m2m_changed, sender=Title.genre.through)
+def log_title_genres(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        changes.record((Title, changes.Actions.UPDATE, instance.pk))
+    elif pk_set is None:
+        # Очистка со стороны жанра: затронутые произведения неизвестны.
+        changes.reset(Title)
+    else:
+        changes.record(*(
+            (Title, changes.Actions.UPDATE, pk) for pk in sorted(pk_set)
+        ))
+
+
+@receiver(catalog_bulk_changed)
+def log_bulk_change(sender, models, created=None, updated=None, **kwargs):
+    created = created or {}
+    updated = updated or {}
+    changes.record(*(
+        (model, action, pk)
+        for action, ids in (
+            (changes.Actions.CREATE, created),
+            (changes.Actions.UPDATE, updated),
+        )
+        for model in models
+        for pk in sorted(ids.get(model, ()))
+    ))
+    changes.reset(*(
+        model for model in models
+        if model not in created and model not in updated
+    ))
+
+
+@receiver(catalog_bulk_changed)
+def invalidate_bulk_change(sender, models, title_ids=(), review_ids=(),
+                           **kwargs):
+    namespaces = {f"title:{title_id}" for title_id in title_ids}
+    namespaces.update(f"review:{review_id}" for review_id in review_ids)
+    if Title in models or Review in models:
+        namespaces.add("titles")
+    if Title in models:
+        namespaces.add(search.SEARCH_NAMESPACE)
+    if Title in models or Genre in models or Category in models:
+        namespaces.add(facets.FACETS_NAMESPACE)
+    if Genre in models:
+        namespaces.add("genres")
+    if Category in models:
+        namespaces.add("categories")
+    if namespaces:
+        catalog_cache.invalidate(*namespaces)
@@ -0,0 +1,198 @@
+"""Детерминированный синтетический каталог для бенчмарков.
+
+Один и тот же seed даёт те же данные на любой базе. Популярность
+распределена по Ципфу, как в реальном каталоге: немногие произведения
+собирают большинство отзывов, немногие пользователи пишут большинство
+отзывов и комментариев, а оценки смещены к высоким. Каталог, отзывы и
+комментарии загружает CatalogImporter (пачки bulk_create, пересчёт
+рейтингов, сброс кэша), пользователей — bulk_create.
+"""
+import datetime
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .catalog_io import CatalogImporter
+from .models import Category, Comment, Genre, Review, Title, User
+
+SYLLABLES = (
+    "ка", "ро", "ми", "на", "то", "ле", "са", "во", "ри", "до",
+    "ma", "ri", "to", "ne", "la", "so", "di", "ve", "ko", "ba",
+)
+# Доли оценок 1..10: большинство отзывов положительные.
+SCORE_WEIGHTS = (2, 1, 2, 3, 5, 8, 14, 20, 22, 23)
+# Даты отсчитываются от фиксированного момента, чтобы данные не зависели
+# от дня запуска.
+EPOCH = datetime.datetime(2021, 9, 1, tzinfo=timezone.utc)
+HISTORY = datetime.timedelta(days=3 * 365)
+MODERATOR_SHARE = 0.02
+
+
+def zipf_weights(count, exponent=1.0):
+    """Накопленные веса для random.choices: k-й элемент с весом 1/k^s."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+class SyntheticCatalog:
+
+    def __init__(self, seed=42, titles=1000, genres=30, categories=8,
+                 users=200, reviews=5000, comments=10000):
+        if reviews > titles * users:
+            raise ValueError(
+                "Отзывов больше, чем пар произведение-автор: "
+                f"{reviews} > {titles} * {users}"
+            )
+        self.rnd = random.Random(seed)
+        self.counts = {
+            "users": users, "categories": categories, "genres": genres,
+            "titles": titles, "reviews": reviews, "comments": comments,
+        }
+        self.words = self.make_words(2000)
+        self.word_weights = zipf_weights(len(self.words))
+
+    def generate(self, batch_size=1000):
+        """Загружает данные после уже существующих; возвращает счётчики."""
+        start = {
+            model: (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+            for model in (User, Category, Genre, Title, Review, Comment)
+        }
+        with transaction.atomic():
+            self.create_users(start[User], batch_size)
+            counts = CatalogImporter(batch_size=batch_size).run(
+                self.records(start)
+            )
+        counts["api.user"] = self.counts["users"]
+        return counts
+
+    def create_users(self, first_pk, batch_size):
+        users = []
+        for pk in range(first_pk, first_pk + self.counts["users"]):
+            users.append(User(
+                pk=pk,
+                username=f"bench{pk}",
+                email=f"bench{pk}@example.com",
+                password=make_password(None),
+                role=(
+                    User.Roles.MODER
+                    if self.rnd.random() < MODERATOR_SHARE
+                    else User.Roles.USER
+                ),
+                bio=self.text(0, 12),
+            ))
+        for start in range(0, len(users), batch_size):
+            # Размер пачки запроса подбирает бэкенд, как в CatalogImporter.
+            User.objects.bulk_create(users[start:start + batch_size])
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [User]):
+                cursor.execute(sql)
+        self.user_ids = [user.pk for user in users]
+        # Активность пользователей по Ципфу в случайном порядке.
+        self.rnd.shuffle(self.user_ids)
+
+    def records(self, start):
+        """Записи в формате фикстур: справочники, произведения, отзывы."""
+        category_ids = self.range(start[Category], "categories")
+        genre_ids = self.range(start[Genre], "genres")
+        for pk in category_ids:
+            yield self.dictionary_record("api.category", pk, "category")
+        for pk in genre_ids:
+            yield self.dictionary_record("api.genre", pk, "genre")
+        category_weights = zipf_weights(len(category_ids))
+        genre_weights = zipf_weights(len(genre_ids), 0.8)
+        for pk in self.range(start[Title], "titles"):
+            yield {"model": "api.title", "pk": pk, "fields": {
+                "name": self.text(1, 4).capitalize(),
+                "year": int(self.rnd.triangular(1900, 2021, 2015)),
+                "description": self.text(0, 30),
+                "category": self.rnd.choices(
+                    category_ids, cum_weights=category_weights
+                )[0],
+                "genre": sorted(set(self.rnd.choices(
+                    genre_ids, cum_weights=genre_weights,
+                    k=self.rnd.randint(1, 3),
+                ))),
+            }}
+        reviews = list(self.review_records(start))
+        yield from reviews
+        yield from self.comment_records(start, reviews)
+
+    def review_records(self, start):
+        title_ids = self.range(start[Title], "titles")
+        self.rnd.shuffle(title_ids)
+        title_weights = zipf_weights(len(title_ids), 1.1)
+        user_weights = zipf_weights(len(self.user_ids))
+        pairs = set()
+        pk = start[Review]
+        while len(pairs) < self.counts["reviews"]:
+            pair = (
+                self.rnd.choices(title_ids, cum_weights=title_weights)[0],
+                self.rnd.choices(self.user_ids, cum_weights=user_weights)[0],
+            )
+            if pair in pairs:
+                # Автор уже писал отзыв на это произведение.
+                continue
+            pairs.add(pair)
+            yield {"model": "api.review", "pk": pk, "fields": {
+                "title": pair[0],
+                "author": pair[1],
+                "text": self.text(5, 60),
+                "score": self.rnd.choices(
+                    range(1, 11), weights=SCORE_WEIGHTS
+                )[0],
+                "pub_date": self.date(EPOCH - HISTORY, HISTORY),
+            }}
+            pk += 1
+
+    def comment_records(self, start, reviews):
+        if not reviews:
+            return
+        # Обсуждают отзывы популярных произведений: они идут первыми.
+        review_weights = zipf_weights(len(reviews), 0.9)
+        user_weights = zipf_weights(len(self.user_ids))
+        for pk in self.range(start[Comment], "comments"):
+            review = self.rnd.choices(reviews, cum_weights=review_weights)[0]
+            published = datetime.datetime.fromisoformat(
+                review["fields"]["pub_date"]
+            )
+            yield {"model": "api.comment", "pk": pk, "fields": {
+                "review": review["pk"],
+                "author": self.rnd.choices(
+                    self.user_ids, cum_weights=user_weights
+                )[0],
+                "text": self.text(3, 25),
+                "pub_date": self.date(published, datetime.timedelta(days=30)),
+            }}
+
+    def dictionary_record(self, model, pk, prefix):
+        return {"model": model, "pk": pk, "fields": {
+            "name": f"{self.text(1, 2).capitalize()} {pk}",
+            "slug": f"{prefix}-{pk}",
+        }}
+
+    def range(self, first_pk, label):
+        return list(range(first_pk, first_pk + self.counts[label]))
+
+    def text(self, least, most):
+        return " ".join(self.rnd.choices(
+            self.words, cum_weights=self.word_weights,
+            k=self.rnd.randint(least, most),
+        ))
+
+    def date(self, since, span):
+        return (since + span * self.rnd.random()).isoformat()
+
+    def make_words(self, count):
+        words = set()
+        while len(words) < count:
+            words.add("".join(
+                self.rnd.choice(SYLLABLES)
+                for _ in range(self.rnd.randint(2, 4))
+            ))
+        return sorted(words)
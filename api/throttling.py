@@ -0,0 +1,194 @@
+"""Ограничение частоты запросов корзинами токенов.
+
+Лимиты задаёт ROLES_THROTTLE по ролям, как ROLES_PERMISSIONS: корзина
+'default' — на клиента для всех запросов, корзины с именем маршрута из
+api/urls.py — на клиента для этого маршрута. Клиент — пользователь из
+токена или IP анонима (последний адрес X-Forwarded-For от nginx, см.
+NUM_PROXIES). Запрос проходит, если токен есть во всех его корзинах.
+
+Корзина хранится одним числом — временем, когда она снова станет
+полной (GCRA): проверка — чтение и запись одного значения без фоновых
+пополнений. По умолчанию корзины живут в памяти процесса; с
+THROTTLE["CACHE_ALIAS"] они общие для воркеров и лежат в этом кэше, а
+при ошибке кэша проверка идёт по корзинам процесса. Чтение и запись в
+кэше не атомарны: параллельные запросы одного клиента в разных воркерах
+могут ненадолго превысить лимит на несколько запросов.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.throttling import BaseThrottle
+
+from . import metrics
+
+KEY = "throttle:{}"
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate):
+    """'120/m' -> (вместимость 120, секунд на токен 0.5)."""
+    count, period = rate.split("/")
+    count = int(count)
+    return count, PERIODS[period[0]] / count
+
+
+def compile_throttle_rates(roles_throttle):
+    """{корзина: {роль: 'N/период'}} -> {корзина: {роль: (N, интервал)}}."""
+    return {
+        scope: {
+            role: parse_rate(rate)
+            for role, rate in roles.items() if rate is not None
+        }
+        for scope, roles in roles_throttle.items()
+    }
+
+
+LIMITS = compile_throttle_rates(settings.ROLES_THROTTLE)
+
+
+@receiver(setting_changed)
+def recompile_throttle_rates(setting, value, **kwargs):
+    global LIMITS
+    if setting == "ROLES_THROTTLE":
+        LIMITS = compile_throttle_rates(value)
+
+
+def take(buckets, states, now):
+    """Берёт по токену из всех корзин или ни из одной.
+
+    buckets — [(ключ, (вместимость, интервал))], states — {ключ: время
+    заполнения}. Возвращает (новые состояния или None при отказе,
+    (лимит, осталось, до заполнения, ждать) самой пустой корзины).
+    """
+    updated = {}
+    tightest = None
+    for key, (capacity, interval) in buckets:
+        full_at = max(states.get(key) or now, now) + interval
+        allowed_from = full_at - capacity * interval
+        if now < allowed_from:
+            return None, (capacity, 0, full_at - interval - now,
+                          allowed_from - now)
+        updated[key] = full_at
+        remaining = int((now - allowed_from) / interval)
+        if tightest is None or remaining < tightest[1]:
+            tightest = (capacity, remaining, full_at - now, 0.0)
+    return updated, tightest
+
+
+class LocalBuckets:
+    """Корзины в памяти процесса."""
+
+    def __init__(self):
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def check(self, buckets, now):
+        with self.lock:
+            updated, state = take(buckets, self.states, now)
+            if updated:
+                self.states.update(updated)
+                if len(self.states) > settings.THROTTLE["LOCAL_MAX_KEYS"]:
+                    self.purge(now)
+        return updated is not None, state
+
+    def purge(self, now):
+        # Полная корзина и отсутствующая ничем не отличаются.
+        self.states = {
+            key: full_at for key, full_at in self.states.items()
+            if full_at > now
+        }
+
+
+class CacheBuckets:
+    """Корзины в общем кэше: одно чтение и одна запись на запрос."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def check(self, buckets, now):
+        keys = [KEY.format(key) for key, _ in buckets]
+        found = self.cache.get_many(keys)
+        states = {key: found.get(KEY.format(key)) for key, _ in buckets}
+        updated, state = take(buckets, states, now)
+        if updated:
+            # Через время заполнения корзина полна, ключ не нужен.
+            timeout = math.ceil(max(updated.values()) - now) + 1
+            self.cache.set_many(
+                {KEY.format(key): full_at for key, full_at in updated.items()},
+                timeout,
+            )
+        return updated is not None, state
+
+
+local_buckets = LocalBuckets()
+
+
+def check(buckets, now=None):
+    """(пропустить ли запрос, состояние самой пустой корзины)."""
+    if now is None:
+        now = time.time()
+    alias = settings.THROTTLE["CACHE_ALIAS"]
+    if alias:
+        try:
+            return CacheBuckets(caches[alias]).check(buckets, now)
+        except Exception:
+            metrics.count("yamdb_throttle_fallback_total")
+    return local_buckets.check(buckets, now)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Корзины 'default' и маршрута для роли клиента (ROLES_THROTTLE)."""
+
+    def allow_request(self, request, view):
+        user = request.user
+        if user.is_authenticated:
+            if user.is_admin:
+                return True
+            role, client = user.role, f"user:{user.id}"
+        else:
+            role, client = "anon", f"ip:{self.get_ident(request)}"
+        buckets = []
+        limit = LIMITS.get("default", {}).get(role)
+        if limit:
+            buckets.append((client, limit))
+        match = request.resolver_match
+        route = match.url_name if match else None
+        limit = LIMITS.get(route, {}).get(role) if route else None
+        if limit:
+            buckets.append((f"{client}:{route}", limit))
+        if not buckets:
+            return True
+        allowed, state = check(buckets)
+        # Заголовки ответа добавляет RateLimitMiddleware.
+        request._request.rate_limit = state
+        self.wait_time = state[3]
+        if not allowed:
+            metrics.count(
+                "yamdb_throttled_requests_total", role=role, route=route
+            )
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class RateLimitMiddleware:
+    """X-RateLimit-Limit, -Remaining и -Reset (секунд до полной корзины)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        state = getattr(request, "rate_limit", None)
+        if state is not None:
+            limit, remaining, reset, _ = state
+            response["X-RateLimit-Limit"] = limit
+            response["X-RateLimit-Remaining"] = remaining
+            response["X-RateLimit-Reset"] = math.ceil(reset)
+        return response
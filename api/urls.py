@@ -4,7 +4,7 @@ from rest_framework_simplejwt.views import TokenRefreshView
 
 from . import views as vs
 from .serializers import MyTokenObtainPairView
-from .views import email_auth
+from .views import changes_view, db_stats, email_auth, metrics_view
 
 router_v1 = routers.DefaultRouter()
 
@@ -28,6 +28,9 @@ router_v1.register('users', vs.UserModelViewSet, basename='users')
 urlpatterns = [
     re_path(r'^v1/', include(router_v1.urls)),
     path('v1/auth/email/', email_auth, name='email_auth'),
+    path('v1/changes/', changes_view, name='changes'),
+    path('v1/service/db/', db_stats, name='db_stats'),
+    path('v1/service/metrics/', metrics_view, name='metrics'),
     path(
         'v1/auth/token/',
         MyTokenObtainPairView.as_view(),
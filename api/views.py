@@ -1,34 +1,44 @@
 from functools import partial
 
-from django.core.mail import send_mail
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
 from django.shortcuts import get_object_or_404
-from django.utils.crypto import get_random_string
+from django_filters.utils import translate_validation
 from rest_framework import filters, permissions, status, viewsets
-from rest_framework.decorators import action, api_view
-from rest_framework.exceptions import ParseError
+from rest_framework.decorators import (action, api_view, permission_classes,
+                                       renderer_classes)
+from rest_framework.exceptions import NotFound, ParseError, ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 
-from api_yamdb.settings import DEFAULT_FROM_EMAIL, ROLES_PERMISSIONS
+from api_yamdb.settings import DEFAULT_FROM_EMAIL
 
+from . import changes, codes, facets, metrics, outbox
+from .db import pool
 from .filters import TitleFilter
-from .mixin import CreateListDestroyModelMixinViewSet
+from .mixin import (CachedReadModelMixin, ConditionalReadModelMixin,
+                    CreateListDestroyModelMixinViewSet, NDJSONExportMixin)
 from .models import Category, Comment, Genre, Review, Title, User
+from .paginations import OptionalKeysetPagination
 from .permissions import IsAuthorOrReadOnly, PermissonForRole
-from .serializers import (CategorySerializer, CommentSerializer,
-                          GenreSerializer, ReviewSerializer, TitleSerializer,
+from .renderers import PrometheusRenderer
+from .serializers import (CategorySerializer, ChangeLogEntrySerializer,
+                          CommentSerializer, GenreSerializer, ReviewSerializer,
+                          TitleBatchItemSerializer, TitleSerializer,
                           UserSerializer)
 
 
-class UserModelViewSet(viewsets.ModelViewSet):
+class UserModelViewSet(ConditionalReadModelMixin, viewsets.ModelViewSet):
     """Custщm User model with custom action."""
 
     lookup_field = "username"
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (
-        partial(PermissonForRole, ROLES_PERMISSIONS.get("Users")),
+        partial(PermissonForRole, "Users"),
     )
+    cache_namespaces = ("users",)
+    detail_cache_namespaces = ("users",)
 
     @action(
         methods=["PATCH", "GET"],
@@ -38,24 +48,28 @@ class UserModelViewSet(viewsets.ModelViewSet):
     )
     def user_me(self, request) -> Response:
         """Пользовательский URL-адрес для редактирования своего профиля."""
+        # request.user собран из токена; профиль читается из базы.
+        user = get_object_or_404(User, pk=request.user.id)
         if request.method == "GET":
-            serializer = self.get_serializer(request.user)
+            serializer = self.get_serializer(user)
             return Response(serializer.data)
         serializer = self.get_serializer(
-            request.user, data=request.data, partial=True
+            user, data=request.data, partial=True
         )
         if serializer.is_valid(raise_exception=True):
-            serializer.save()
+            self.perform_update(serializer)
             return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class TitleModelViewSet(viewsets.ModelViewSet):
-    queryset = Title.objects.all()
+class TitleModelViewSet(CachedReadModelMixin, viewsets.ModelViewSet):
+    queryset = Title.objects.for_listing()
     serializer_class = TitleSerializer
     permission_classes = (
-        partial(PermissonForRole, ROLES_PERMISSIONS.get("Titles")),
+        partial(PermissonForRole, "Titles"),
     )
     filterset_class = TitleFilter
+    cache_namespaces = ("titles", "genres", "categories")
+    detail_cache_namespaces = ("title:{}", "genres", "categories")
 
     def perform_create(self, serializer):
         slugs_genre = self.request.POST.getlist("genre")
@@ -66,40 +80,161 @@ class TitleModelViewSet(viewsets.ModelViewSet):
             genre = get_object_or_404(Genre, slug=slug)
             title.genre.add(genre)
 
+    @action(methods=["GET"], detail=False)
+    def facets(self, request) -> Response:
+        """Число произведений по жанрам, категориям и годам при фильтрах."""
+        return self.conditional_response(
+            self.cache_namespaces, self.facet_counts, request
+        )
+
+    def facet_counts(self, request):
+        filterset = self.filterset_class(
+            request.query_params, queryset=Title.objects.order_by(),
+            request=request,
+        )
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        data = filterset.form.cleaned_data
+        ids = None
+        if data.get("name") or data.get("search"):
+            # Текстовые фильтры считает база, остальные — индекс фасетов.
+            text = self.filterset_class(
+                {key: request.query_params[key] for key in ("name", "search")
+                 if data.get(key)},
+                queryset=Title.objects.order_by(),
+            )
+            ids = text.qs.values_list("pk", flat=True)
+        return Response(facets.title_facets().counts(
+            genre=data.get("genre") or None,
+            category=data.get("category") or None,
+            year=int(data["year"]) if data.get("year") is not None else None,
+            ids=ids,
+        ))
+
+    @action(methods=["GET"], detail=False)
+    def top(self, request) -> Response:
+        """Лучшие по средней оценке; фильтры — как у списка."""
+        return self.conditional_response(
+            self.cache_namespaces, self.ranked, request, "top_rated"
+        )
+
+    @action(methods=["GET"], detail=False)
+    def trending(self, request) -> Response:
+        """Больше всего свежих отзывов; фильтры — как у списка."""
+        return self.conditional_response(
+            self.cache_namespaces, self.ranked, request, "trending"
+        )
+
+    def ranked(self, request, ordering):
+        """Первые limit произведений по индексу ordering (TitleQuerySet)."""
+        options = settings.TITLE_RANKING
+        try:
+            limit = int(
+                request.query_params.get("limit", options["DEFAULT_LIMIT"])
+            )
+        except ValueError:
+            raise ParseError(detail="limit должен быть целым числом.")
+        limit = max(1, min(limit, options["MAX_LIMIT"]))
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(
+            getattr(queryset, ordering)()[:limit], many=True
+        )
+        return Response(serializer.data)
+
+    @action(methods=["POST"], detail=False, url_path="batch")
+    def batch(self, request) -> Response:
+        """Пакетное создание; ?upsert=1 — обновление по (name, year)."""
+        serializer = TitleBatchItemSerializer(
+            data=request.data,
+            many=True,
+            context={"upsert": request.query_params.get("upsert") == "1"},
+        )
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        created = all(item["status"] == "created" for item in results)
+        return Response(
+            {"results": results},
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
     def perform_update(self, serializer):
-        if "genre" in self.request.data:
-            slug_str = self.request.data["genre"]
-            slugs = [x.strip() for x in slug_str.split(",")]
-            genre = Genre.objects.none()
-            for i in slugs:
-                genre_a = Genre.objects.filter(slug=i)
-                genre = genre.union(genre_a)
-            genre_title = self.get_object().genre.all()
-            genre = genre_title.union(genre)
+        data = self.request.data
+        category_id = serializer.instance.category_id
+        if "category" in data:
+            category_id = get_object_or_404(
+                Category, slug=data["category"]
+            ).id
+        genre_ids = None
+        if "genre" in data:
+            genre_ids = self.get_genre_ids(self.get_genre_slugs(data))
+        with transaction.atomic():
+            title = serializer.save(category_id=category_id)
+            if genre_ids is not None:
+                self.set_genres(title, genre_ids)
+
+    @staticmethod
+    def get_genre_slugs(data):
+        """Slug жанров из списка, повторяющегося поля формы или строки
+        через запятую."""
+        if hasattr(data, "getlist"):
+            values = data.getlist("genre")
         else:
-            genre = self.get_object().genre.all()
-        if "category" in self.request.data:
-            category = get_object_or_404(
-                Category, slug=self.request.data["category"]
+            values = data["genre"]
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list) or not all(
+            isinstance(value, str) for value in values
+        ):
+            raise ValidationError(
+                {"genre": "Ожидается список slug жанров или строка."}
             )
-        else:
-            slug = self.get_object().category.slug
-            category = get_object_or_404(Category, slug=slug)
-        serializer.save(
-            genre=genre,
-            category_id=category.id,
+        return {
+            slug.strip()
+            for value in values
+            for slug in value.split(",")
+            if slug.strip()
+        }
+
+    @staticmethod
+    def get_genre_ids(slugs):
+        """id жанров одним IN-запросом; неизвестный slug — 404."""
+        genre_ids = dict(
+            Genre.objects.filter(slug__in=slugs).values_list("slug", "id")
+        )
+        missing = slugs - genre_ids.keys()
+        if missing:
+            raise NotFound(f"Жанр не найден: {', '.join(sorted(missing))}")
+        return set(genre_ids.values())
+
+    @staticmethod
+    def set_genres(title, wanted):
+        """Заменяет жанры произведения, записывая только разницу.
+
+        Число запросов не зависит от количества жанров: чтение текущих
+        связей, затем вставка и удаление разницы.
+        """
+        current = set(
+            Title.genre.through.objects.filter(title_id=title.pk)
+            .values_list("genre_id", flat=True)
         )
+        if current - wanted:
+            title.genre.remove(*(current - wanted))
+        if wanted - current:
+            title.genre.add(*(wanted - current))
 
 
-class CategoryModelViewSet(CreateListDestroyModelMixinViewSet):
+class CategoryModelViewSet(
+    CachedReadModelMixin, CreateListDestroyModelMixinViewSet
+):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = (
-        partial(PermissonForRole, ROLES_PERMISSIONS.get("Categories")),
+        partial(PermissonForRole, "Categories"),
     )
     filter_backends = (filters.SearchFilter,)
     search_fields = ("name",)
     lookup_field = "slug"
+    cache_namespaces = ("categories",)
 
     def perform_create(self, serializer):
         serializer.save(
@@ -111,16 +246,19 @@ class CategoryModelViewSet(CreateListDestroyModelMixinViewSet):
         serializer.delete()
 
 
-class GenreModelViewSet(CreateListDestroyModelMixinViewSet):
+class GenreModelViewSet(
+    CachedReadModelMixin, CreateListDestroyModelMixinViewSet
+):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
     permission_classes = (
-        partial(PermissonForRole, ROLES_PERMISSIONS.get("Genres")),
+        partial(PermissonForRole, "Genres"),
     )
     filter_backends = (filters.SearchFilter,)
 
     search_fields = ("name",)
     lookup_field = "slug"
+    cache_namespaces = ("genres",)
 
     def perform_create(self, serializer):
         serializer.save(
@@ -132,19 +270,24 @@ class GenreModelViewSet(CreateListDestroyModelMixinViewSet):
         serializer.delete()
 
 
-class ReviewModelViewSet(viewsets.ModelViewSet):
+class ReviewModelViewSet(NDJSONExportMixin, ConditionalReadModelMixin,
+                         viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
+    pagination_class = OptionalKeysetPagination
     permission_classes = (
         (IsAuthenticatedOrReadOnly & IsAuthorOrReadOnly)
-        | partial(PermissonForRole, ROLES_PERMISSIONS.get("Reviews")),
+        | partial(PermissonForRole, "Reviews"),
+    )
+    # Любая запись отзыва сдвигает версию его произведения (signals.py).
+    cache_namespaces = ("title:{title_id}", "users")
+    detail_cache_namespaces = ("title:{title_id}", "users")
+    export_fields = (
+        ("id", "id"), ("text", "text"), ("author", "author__username"),
+        ("score", "score"), ("pub_date", "pub_date"),
     )
 
     def perform_create(self, serializer):
         title = get_object_or_404(Title, pk=self.kwargs["title_id"])
-        user = User.objects.get(username=self.request.user)
-        if user is None:
-            raise ParseError("Неверный запрос!")
-
         review = Review.objects.filter(
             title=self.kwargs["title_id"], author=self.request.user.id
         )
@@ -152,44 +295,125 @@ class ReviewModelViewSet(viewsets.ModelViewSet):
         if review.exists():
             raise ParseError(detail="Ваш отзыв уже существует!")
 
-        serializer.save(author=user, title=title)
+        # Параллельный запрос того же автора проходит проверку выше, но
+        # упирается в уникальность (title, author).
+        try:
+            with transaction.atomic():
+                serializer.save(author_id=self.request.user.id, title=title)
+        except IntegrityError:
+            raise ParseError(detail="Ваш отзыв уже существует!")
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def get_queryset(self):
-        return Review.objects.filter(title_id=self.kwargs["title_id"])
+        return Review.objects.filter(
+            title_id=self.kwargs["title_id"]
+        ).select_related("author")
 
 
-class CommentModelViewSet(viewsets.ModelViewSet):
+class CommentModelViewSet(NDJSONExportMixin, ConditionalReadModelMixin,
+                          viewsets.ModelViewSet):
     serializer_class = CommentSerializer
+    pagination_class = OptionalKeysetPagination
     permission_classes = (
         (IsAuthenticatedOrReadOnly & IsAuthorOrReadOnly)
-        | partial(PermissonForRole, ROLES_PERMISSIONS.get("Reviews")),
+        | partial(PermissonForRole, "Reviews"),
+    )
+    cache_namespaces = ("review:{review_id}", "users")
+    detail_cache_namespaces = ("review:{review_id}", "users")
+    export_fields = (
+        ("id", "id"), ("author", "author__username"), ("text", "text"),
+        ("pub_date", "pub_date"),
     )
 
     def perform_create(self, serializer):
-        review = get_object_or_404(Review, pk=self.kwargs["review_id"])
-        title = get_object_or_404(Title, pk=self.kwargs["title_id"])
-        serializer.save(author=self.request.user, review=review, title=title)
+        # Один поиск по первичному ключу проверяет и отзыв, и то, что он
+        # относится к произведению из URL.
+        review = get_object_or_404(
+            Review.objects.only("id"),
+            pk=self.kwargs["review_id"],
+            title_id=self.kwargs["title_id"],
+        )
+        serializer.save(author_id=self.request.user.id, review=review)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def get_queryset(self):
-        return Comment.objects.filter(review_id=self.kwargs["review_id"])
+        return Comment.objects.filter(
+            review_id=self.kwargs["review_id"],
+            review__title_id=self.kwargs["title_id"],
+        ).select_related("author")
 
 
 @api_view(["POST"])
 def email_auth(request):
     """Check email and send to it confirmation code for token auth."""
     user = get_object_or_404(User, email=request.data["email"])
-    confirmation_code = get_random_string()
-    user.confirmation_code = confirmation_code
-    user.save()
-    send_mail(
-        subject="Код для генерации токена аутентификации YAMDB",
-        message=str(confirmation_code),
-        from_email=DEFAULT_FROM_EMAIL,
-        recipient_list=(request.data["email"],),
-    )
+    with transaction.atomic():
+        outbox.enqueue(
+            subject="Код для генерации токена аутентификации YAMDB",
+            message=codes.issue(user),
+            from_email=DEFAULT_FROM_EMAIL,
+            recipient_list=(request.data["email"],),
+        )
     return Response(
         data="Письмо с кодом для аутентификации",
         status=status.HTTP_201_CREATED,
     )
+
+
+@api_view(["GET"])
+def changes_view(request):
+    """Изменения каталога после seq ?after= пачкой до ?limit= записей."""
+    options = settings.CHANGES
+    try:
+        after = max(0, int(request.query_params.get("after", 0)))
+        limit = int(request.query_params.get("limit", options["BATCH_SIZE"]))
+    except ValueError:
+        raise ParseError(detail="after и limit должны быть целыми числами.")
+    limit = max(1, min(limit, options["MAX_BATCH_SIZE"]))
+    try:
+        entries = changes.read(after, limit)
+    except changes.CompactedError as error:
+        return Response(
+            {
+                "detail": "Изменения после after уже удалены: синхронизируйте "
+                          "каталог заново и продолжайте с latest.",
+                "latest": error.latest,
+            },
+            status=status.HTTP_410_GONE,
+        )
+    serializer = ChangeLogEntrySerializer(
+        entries, many=True,
+        context={"snapshots": changes.snapshots(entries)},
+    )
+    return Response({
+        "results": serializer.data,
+        "next": entries[-1].seq if entries else after,
+        "more": len(entries) == limit,
+    })
+
+
+@api_view(["GET"])
+@permission_classes([partial(PermissonForRole, "Service")])
+def db_stats(request):
+    """Соединения с базой процесса, ответившего на запрос."""
+    databases = {}
+    pools = pool.stats()
+    for alias in connections:
+        settings_dict = connections[alias].settings_dict
+        databases[alias] = {
+            "engine": settings_dict["ENGINE"],
+            "conn_max_age": settings_dict["CONN_MAX_AGE"],
+            "pool": pools["pools"].get(alias),
+        }
+    return Response({"pid": pools["pid"], "databases": databases})
+
+
+@api_view(["GET"])
+@permission_classes([partial(PermissonForRole, "Service")])
+@renderer_classes([PrometheusRenderer])
+def metrics_view(request):
+    """Метрики запросов всех воркеров в формате Prometheus."""
+    routes, workers = metrics.collect()
+    return Response(metrics.render_prometheus(
+        routes, workers, metrics.collect_counters()
+    ))
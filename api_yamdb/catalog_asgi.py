@@ -0,0 +1,11 @@
+"""ASGI-приложение каталога только для чтения (см. api/asgi.py)."""
+import os
+
+import django
+
+from api.asgi import CatalogASGIHandler
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "api_yamdb.settings")
+django.setup(set_prefix=False)
+
+application = CatalogASGIHandler()
@@ -1,5 +1,5 @@
 import os
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
 
 import dotenv
 
@@ -23,12 +23,14 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
-    'api',
+    'api.apps.ApiConfig',
     'corsheaders',
     'django_filters',
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.throttling.RateLimitMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -70,9 +72,68 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD'),
         'HOST': os.environ.get('DB_HOST'),
         'PORT': os.environ.get('DB_PORT'),
+        # Соединение живёт между запросами воркера столько секунд.
+        # С пулом (DB_ENGINE=api.db.backends.postgresql) ставьте 0:
+        # соединение вернётся в пул после каждого запроса.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        # Пул соединений процесса, см. api/db/pool.py.
+        'POOL': {
+            'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'MAX_AGE': int(os.environ.get('DB_POOL_MAX_AGE', 300)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+            'HEALTH_CHECK': os.environ.get('DB_POOL_HEALTH_CHECK', '1') == '1',
+        },
     }
 }
 
+# Кэш каталога должен быть общим для всех процессов, которые пишут в базу
+# или читают каталог: воркеров gunicorn и контейнеров web, catalog и
+# outbox. В нём же версии токенов, индекса фильтров и метрики. По
+# умолчанию он файловый; в docker-compose.yaml каталог кэша — общий том
+# cache_value, в тестах — locmem (см. tests/settings_qa.py).
+CATALOG_CACHE_BACKEND = os.environ.get(
+    'CATALOG_CACHE_BACKEND',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': CATALOG_CACHE_BACKEND,
+        'LOCATION': os.environ.get(
+            'CATALOG_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+        # Клиент memcached принимает OPTIONS как свои аргументы.
+        'OPTIONS': (
+            {} if 'memcached' in CATALOG_CACHE_BACKEND
+            else {'MAX_ENTRIES': 10000}
+        ),
+    },
+}
+
+CATALOG_CACHE = {
+    'ALIAS': 'catalog',
+    'TIMEOUT': int(os.environ.get('CATALOG_CACHE_TIMEOUT', 300)),
+}
+
+# Сколько лучших совпадений отдаёт поиск без PostgreSQL (api/search.py).
+TITLE_SEARCH_MAX_RESULTS = 1000
+
+# Лучшие и обсуждаемые произведения (api/ranking.py). Вклад отзыва в
+# trending_score удваивается каждые TRENDING_HALF_LIFE секунд от
+# TRENDING_EPOCH: старые отзывы весят относительно меньше, а порядок не
+# меняется со временем и не требует пересчёта. При половине жизни в 7
+# дней float хватает на 19 лет от эпохи; после сдвига эпохи нужен
+# rebuild_ratings.
+TITLE_RANKING = {
+    'DEFAULT_LIMIT': 10,
+    'MAX_LIMIT': 100,
+    'TRENDING_HALF_LIFE': 7 * 24 * 3600,
+    'TRENDING_EPOCH': datetime(2021, 1, 1, tzinfo=timezone.utc),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -110,20 +171,79 @@ DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.StatelessJWTAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_THROTTLE_CLASSES': ['api.throttling.TokenBucketThrottle'],
+    # Адрес клиента — последний в X-Forwarded-For, его добавляет nginx.
+    'NUM_PROXIES': 1,
     'PAGE_SIZE': 10,
 }
 
 SIMPLE_JWT = {'ACCESS_TOKEN_LIFETIME': timedelta(days=5)}
 
+# Версии токенов пользователей (api/authentication.py). Кэш должен быть
+# общим для всех воркеров, иначе отзыв токена увидит только один из них.
+TOKEN_VERSION_CACHE = {
+    'ALIAS': 'catalog',
+    'TIMEOUT': 60 * 60,
+}
+
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Время жизни кода подтверждения из письма, в секундах (api/codes.py).
+CONFIRMATION_CODE_TTL = 15 * 60
+
+# Очередь исходящих писем (api/outbox.py, команда send_outbox).
+# Интервалы — в секундах; RETRY_DELAY удваивается с каждой попыткой.
+OUTBOX = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 30,
+    'LEASE': 300,
+    'POLL_INTERVAL': float(os.environ.get('OUTBOX_POLL_INTERVAL', 2)),
+    'RETENTION': 24 * 60 * 60,
+}
+
+# Журнал изменений каталога (api/changes.py, команда compact_changes).
+# Интервалы — в секундах. Пропуск в нумерации перед записью моложе
+# GAP_TIMEOUT считается незакоммиченной транзакцией, и лента его ждёт;
+# перекрытые записи старше COMPACT_AFTER и все записи старше RETENTION
+# удаляет compact_changes.
+CHANGES = {
+    'BATCH_SIZE': 500,
+    'MAX_BATCH_SIZE': 1000,
+    'GAP_TIMEOUT': 10,
+    'COMPACT_AFTER': 60 * 60,
+    'RETENTION': 30 * 24 * 60 * 60,
+}
+
+# ASGI-приложение каталога (api/asgi.py): сколько потоков одновременно
+# работают с базой и сколько запросов может ждать свободный поток.
+CATALOG_ASGI = {
+    'THREADS': int(os.environ.get('CATALOG_ASGI_THREADS', 16)),
+    'MAX_PENDING': int(os.environ.get('CATALOG_ASGI_MAX_PENDING', 1000)),
+}
+
+# Метрики запросов (api/metrics.py). BUCKETS — границы гистограммы
+# времени в секундах; запросы дольше SLOW_REQUEST секунд пишутся в лог
+# логгера api.metrics вместе с SQL.
+METRICS = {
+    'RING_SIZE': 256,
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+    'SLOW_REQUEST': float(os.environ.get('METRICS_SLOW_REQUEST', 0.5)),
+    'FLUSH_INTERVAL': 10,
+    'CACHE_ALIAS': 'catalog',
+}
+
 AUTH_USER_MODEL = 'api.User'
 
 ROLES_PERMISSIONS = {
@@ -157,4 +277,43 @@ ROLES_PERMISSIONS = {
         'moderator': ('GET',),
         'anon': ('GET',),
     },
+    'Service': {
+        'user': (None,),
+        'moderator': (None,),
+        'anon': (None,),
+    },
+}
+
+# Ограничение частоты запросов (api/throttling.py): корзина токенов на
+# клиента для всех запросов ('default') и отдельные корзины маршрутов по
+# имени из api/urls.py. Лимит 'N/период' (s, m, h, d): корзина вмещает N
+# запросов и наполняется за период; роли без лимита и администраторы не
+# ограничены.
+ROLES_THROTTLE = {
+    'default': {
+        'user': '600/m',
+        'moderator': '1200/m',
+        'anon': '120/m',
+    },
+    'email_auth': {
+        'anon': '10/h',
+    },
+    'token_obtain_pair': {
+        'anon': '10/m',
+    },
+    'review-export': {
+        'user': '30/m',
+        'moderator': '30/m',
+    },
+    'comment-export': {
+        'user': '30/m',
+        'moderator': '30/m',
+    },
+}
+
+# Где хранить корзины: без CACHE_ALIAS — в памяти процесса (у каждого
+# воркера свои), с ним — в этом кэше, общем для воркеров.
+THROTTLE = {
+    'CACHE_ALIAS': os.environ.get('THROTTLE_CACHE_ALIAS') or None,
+    'LOCAL_MAX_KEYS': 100000,
 }
@@ -0,0 +1,50 @@
+import pytest
+
+
+@pytest.fixture
+def catalog(db):
+    """Фабрика каталога: произведения с категорией и несколькими жанрами."""
+    from api.models import Category, Genre, Title
+
+    def make_catalog(titles=3, genres_per_title=2):
+        category, _ = Category.objects.get_or_create(
+            name='Фильм', slug='movie'
+        )
+        genres = [
+            Genre.objects.get_or_create(
+                name=f'Жанр {i}', slug=f'genre-{i}'
+            )[0]
+            for i in range(genres_per_title)
+        ]
+        created = []
+        for i in range(titles):
+            title = Title.objects.create(
+                name=f'Произведение {i}', year=2000, category=category
+            )
+            title.genre.set(genres)
+            created.append(title)
+        return created
+
+    return make_catalog
+
+
+@pytest.fixture
+def reviews(db, catalog):
+    """Фабрика отзывов разных авторов на одно произведение."""
+    from api.models import Review, User
+
+    def make_reviews(count=5, title=None):
+        title = title or catalog(titles=1)[0]
+        return [
+            Review.objects.create(
+                title=title,
+                author=User.objects.create(
+                    username=f'critic{i}', email=f'critic{i}@yamdb.ru'
+                ),
+                score=i % 10 + 1,
+                text=f'{i}',
+            )
+            for i in range(count)
+        ]
+
+    return make_reviews
@@ -0,0 +1,38 @@
+import pytest
+
+
+def make_client(user):
+    from rest_framework.test import APIClient
+
+    from api.authentication import token_for_user
+
+    client = APIClient()
+    token = token_for_user(user)
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+    return client
+
+
+@pytest.fixture
+def admin(db):
+    from api.models import User
+
+    return User.objects.create(
+        username='TestAdmin', email='admin@yamdb.fake', role='admin'
+    )
+
+
+@pytest.fixture
+def user(db):
+    from api.models import User
+
+    return User.objects.create(username='TestUser', email='user@yamdb.fake')
+
+
+@pytest.fixture
+def admin_client(admin):
+    return make_client(admin)
+
+
+@pytest.fixture
+def user_client(user):
+    return make_client(user)
@@ -6,3 +6,21 @@ DATABASES = {
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
+
+# В репозитории нет миграций (их создаёт makemigrations при деплое),
+# поэтому тестовая база строится напрямую по моделям.
+MIGRATION_MODULES = {'api': None}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+    },
+}
+
+# Тесты шлют сотни запросов с одного адреса; лимиты проверяет
+# tests/test_throttling.py.
+ROLES_THROTTLE = {}
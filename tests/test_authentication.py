@@ -0,0 +1,94 @@
+import pytest
+
+URL = '/api/v1/categories/'
+
+
+@pytest.mark.django_db
+class TestStatelessAuthentication:
+
+    def test_claims_user_without_queries(self, admin):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from rest_framework.test import APIRequestFactory
+
+        from api.authentication import (ClaimsUser, StatelessJWTAuthentication,
+                                        token_for_user)
+
+        token = token_for_user(admin).access_token
+        request = APIRequestFactory().get(
+            URL, HTTP_AUTHORIZATION=f'Bearer {token}'
+        )
+        authentication = StatelessJWTAuthentication()
+        # Первая проверка кэширует версию токенов.
+        authentication.authenticate(request)
+        with CaptureQueriesContext(connection) as context:
+            user, _ = authentication.authenticate(request)
+        assert len(context) == 0, (
+            'Пользователь из токена не должен читаться из базы'
+        )
+        assert isinstance(user, ClaimsUser)
+        assert (user.id, user.username, user.is_admin) == (
+            admin.id, admin.username, True
+        )
+        with pytest.raises(AttributeError):
+            user.extra = 1
+
+    def test_role_change_revokes_tokens(self, admin_client, user_client,
+                                        user):
+        response = user_client.post(URL, {'name': 'Кино', 'slug': 'kino'})
+        assert response.status_code == 403
+        response = admin_client.patch(
+            f'/api/v1/users/{user.username}/', {'role': 'admin'}
+        )
+        assert response.status_code == 200
+        response = user_client.get(URL)
+        assert response.status_code == 401, (
+            'Токен с прежней ролью должен отклоняться'
+        )
+
+    def test_model_demotion_revokes_tokens(self, admin_client, admin):
+        response = admin_client.post(URL, {'name': 'Кино', 'slug': 'kino'})
+        assert response.status_code == 201
+        # Понижение из админки или shell, минуя API.
+        admin.role = 'user'
+        admin.is_superuser = False
+        admin.save()
+        response = admin_client.post(URL, {'name': 'Театр', 'slug': 'teatr'})
+        assert response.status_code == 401, (
+            'Проверьте, что смена роли через модель отзывает токены'
+        )
+
+    def test_deactivation_revokes_tokens(self, user_client, user):
+        assert user_client.get(URL).status_code == 200
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        assert user_client.get(URL).status_code == 401, (
+            'Токен неактивного пользователя должен отклоняться'
+        )
+        user.is_active = True
+        user.save()
+        assert user_client.get(URL).status_code == 401, (
+            'Повторное сохранение не должно возвращать старую версию'
+        )
+
+    def test_profile_change_keeps_tokens(self, user_client):
+        response = user_client.patch('/api/v1/users/me/', {'bio': 'Кратко'})
+        assert response.status_code == 200
+        assert response.json()['bio'] == 'Кратко'
+        assert user_client.get('/api/v1/users/me/').status_code == 200
+
+    def test_deleted_user_rejected(self, admin_client, user_client, user):
+        response = admin_client.delete(f'/api/v1/users/{user.username}/')
+        assert response.status_code == 204
+        assert user_client.get(URL).status_code == 401
+
+    def test_token_without_claims(self, user):
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt.tokens import RefreshToken
+
+        client = APIClient()
+        token = RefreshToken.for_user(user).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = client.get('/api/v1/users/me/')
+        assert response.status_code == 200
+        assert response.json()['username'] == user.username
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from django.core.management import CommandError, call_command
+
+SMALL = dict(titles=20, genres=4, categories=3, users=10, reviews=40,
+             comments=60)
+
+
+def generate(seed=7):
+    from api.synthetic import SyntheticCatalog
+
+    return SyntheticCatalog(seed=seed, **SMALL).generate(batch_size=16)
+
+
+@pytest.mark.django_db
+class TestSyntheticCatalog:
+
+    def test_counts_and_ratings(self):
+        from api.models import Review, Title, User
+
+        counts = generate()
+        assert counts['api.title'] == 20 and counts['api.comment'] == 60
+        assert User.objects.filter(username__startswith='bench').count() == 10
+        title = Title.objects.filter(rating_count__gt=0).first()
+        scores = Review.objects.filter(title=title).values_list(
+            'score', flat=True
+        )
+        assert (title.rating_sum, title.rating_count) == (
+            sum(scores), len(scores)
+        ), (
+            'Рейтинги пересчитываются после загрузки отзывов'
+        )
+
+    def test_same_seed_same_data(self):
+        from api.models import Category, Comment, Genre, Review, Title, User
+
+        def snapshot():
+            return (
+                list(Title.objects.order_by('pk').values_list(
+                    'name', 'year', 'category__slug'
+                )),
+                list(Review.objects.order_by('pk').values_list(
+                    'title__name', 'author__username', 'score', 'pub_date'
+                )),
+                list(Comment.objects.order_by('pk').values_list(
+                    'review__text', 'text'
+                )),
+            )
+
+        generate()
+        first = snapshot()
+        for model in (Title, Category, Genre):
+            model.objects.all().delete()
+        User.objects.filter(username__startswith='bench').delete()
+        generate()
+        assert snapshot() == first, (
+            'Одинаковый seed должен давать одинаковые данные'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBenchApi:
+
+    def test_all_routes_covered(self):
+        from api import benchmark
+
+        assert benchmark.uncovered() == set(), (
+            'Для каждого маршрута api/urls.py нужен сценарий'
+        )
+
+    def test_run_and_compare(self, tmp_path):
+        from api import benchmark
+
+        generate()
+        output = tmp_path / 'bench.json'
+        call_command('bench_api', iterations=2, warmup=1,
+                     output=str(output))
+        result = json.loads(output.read_text())
+        names = {name.split()[0] for name in result['routes']}
+        assert names == benchmark.url_names()
+        assert all(
+            route['errors'] == 0 for route in result['routes'].values()
+        )
+        assert result['routes']['review-list GET']['queries'] > 0
+
+        baseline = tmp_path / 'baseline.json'
+        result['routes']['title-list POST']['queries'] -= 1
+        baseline.write_text(json.dumps(result))
+        with pytest.raises(CommandError, match='title-list POST: SQL'):
+            call_command('bench_api', iterations=2, only=['title-list'],
+                         baseline=str(baseline))
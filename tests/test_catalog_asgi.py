@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from asgiref.testing import ApplicationCommunicator
+
+from api.asgi import CatalogASGIHandler
+
+
+def call(handler, method, path, query_string=b''):
+    scope = {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'headers': [(b'host', b'testserver')],
+        'server': ('testserver', 80),
+    }
+
+    async def run():
+        communicator = ApplicationCommunicator(handler, scope)
+        await communicator.send_input({'type': 'http.request'})
+        start = await communicator.receive_output(5)
+        body = b''
+        while True:
+            message = await communicator.receive_output(5)
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return start['status'], dict(start['headers']), body
+
+    return asyncio.run(run())
+
+
+# Потоки пула открывают свои соединения с базой и не видят
+# незакоммиченную транзакцию теста.
+@pytest.mark.django_db(transaction=True)
+class TestCatalogASGI:
+
+    @pytest.fixture
+    def handler(self):
+        handler = CatalogASGIHandler(threads=2)
+        yield handler
+        handler.executor.shutdown()
+
+    def test_same_response_as_wsgi(self, handler, client, reviews):
+        title_id = reviews(count=3)[0].title_id
+        for path, query in (
+            ('/api/v1/titles/', b'page=1'),
+            (f'/api/v1/titles/{title_id}/', b''),
+            ('/api/v1/genres/', b''),
+            ('/api/v1/categories/', b'search=a'),
+            (f'/api/v1/titles/{title_id}/reviews/', b''),
+        ):
+            status, headers, body = call(handler, 'GET', path, query)
+            expected = client.get(f'{path}?{query.decode()}')
+            assert status == expected.status_code == 200, path
+            assert body == expected.content, (
+                f'ASGI-приложение должно отвечать на {path} так же, как WSGI'
+            )
+            assert headers[b'ETag'] == expected['ETag'].encode()
+
+    def test_read_only(self, handler, reviews):
+        review = reviews(count=1)[0]
+        status, headers, _ = call(handler, 'POST', '/api/v1/genres/')
+        assert status == 405, 'Запись обслуживает только WSGI-приложение'
+        assert headers[b'Allow'] == b'GET, HEAD, OPTIONS'
+        assert call(handler, 'GET', '/api/v1/users/')[0] == 404
+        assert call(
+            handler, 'GET',
+            f'/api/v1/titles/{review.title_id}/reviews/{review.id}/comments/',
+        )[0] == 404
+        assert call(
+            handler, 'GET', f'/api/v1/titles/{review.title_id}/reviews/export/'
+        )[0] == 404, 'Потоковую выгрузку обслуживает WSGI-приложение'
+
+    def test_overload_is_rejected(self):
+        handler = CatalogASGIHandler(threads=1, max_pending=0)
+        status, headers, _ = call(handler, 'GET', '/api/v1/genres/')
+        handler.executor.shutdown()
+        assert status == 503, (
+            'Запросы сверх MAX_PENDING должны сразу получать 503'
+        )
+        assert headers[b'Retry-After'] == b'1'
@@ -0,0 +1,51 @@
+import pytest
+
+
+@pytest.mark.django_db
+class TestCatalogCache:
+
+    def test_title_list_served_from_cache(
+        self, client, catalog, django_assert_num_queries
+    ):
+        catalog(titles=3)
+        first = client.get('/api/v1/titles/')
+        with django_assert_num_queries(0):
+            second = client.get('/api/v1/titles/')
+        assert first.json() == second.json()
+
+    def test_query_params_are_part_of_key(self, client, catalog):
+        catalog(titles=3)
+        assert client.get('/api/v1/titles/').json()['count'] == 3
+        response = client.get('/api/v1/titles/?name=Произведение 1')
+        assert response.json()['count'] == 1, (
+            'Проверьте, что параметры запроса входят в ключ кэша'
+        )
+
+    def test_review_invalidates_title_rating(self, client, catalog):
+        from api.models import Review, User
+
+        title = catalog(titles=1)[0]
+        url = f'/api/v1/titles/{title.id}/'
+        assert client.get(url).json()['rating'] is None
+        author = User.objects.create(username='critic', email='c@yamdb.ru')
+        Review.objects.create(title=title, author=author, score=6, text='!')
+        assert client.get(url).json()['rating'] == 6, (
+            'Проверьте, что отзыв сбрасывает кэш рейтинга произведения'
+        )
+        assert client.get('/api/v1/titles/').json()['results'][0][
+            'rating'] == 6
+
+    def test_genre_rename_invalidates_titles(self, client, catalog):
+        from api.models import Genre
+
+        catalog(titles=1, genres_per_title=1)
+        client.get('/api/v1/titles/')
+        client.get('/api/v1/genres/')
+        genre = Genre.objects.get(slug='genre-0')
+        genre.name = 'Новый жанр'
+        genre.save()
+        title = client.get('/api/v1/titles/').json()['results'][0]
+        assert title['genre'][0]['name'] == 'Новый жанр'
+        names = [g['name'] for g in client.get('/api/v1/genres/').json()[
+            'results']]
+        assert 'Новый жанр' in names
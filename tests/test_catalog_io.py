@@ -0,0 +1,94 @@
+import io
+import os
+
+import pytest
+from django.conf import settings
+from django.core.management import call_command
+
+FIXTURES = os.path.join(settings.BASE_DIR, 'fixtures.json')
+
+
+@pytest.fixture
+def fixture_authors(db):
+    from api.models import User
+
+    User.objects.create(pk=1, username='admin', email='admin@yamdb.ru')
+    User.objects.create(pk=2, username='user', email='user@yamdb.ru')
+
+
+def snapshot():
+    from api.models import Comment, Review, Title
+
+    return {
+        'titles': list(Title.objects.order_by('pk').values_list(
+            'pk', 'name', 'category__slug', 'rating_sum', 'rating_count')),
+        'links': sorted(Title.genre.through.objects.values_list(
+            'title_id', 'genre__slug')),
+        'reviews': list(Review.objects.order_by('pk').values_list(
+            'pk', 'author__username', 'title_id', 'score', 'pub_date')),
+        'comments': list(Comment.objects.order_by('pk').values_list(
+            'pk', 'author__username', 'review_id', 'pub_date')),
+    }
+
+
+def clear_catalog():
+    from api.models import Category, Genre, Title
+
+    Title.objects.all().delete()
+    Genre.objects.all().delete()
+    Category.objects.all().delete()
+
+
+@pytest.mark.django_db
+class TestCatalogImportExport:
+
+    def test_read_json_across_chunks(self, monkeypatch):
+        from api import catalog_io
+
+        monkeypatch.setattr(catalog_io, 'READ_SIZE', 7)
+        with open(FIXTURES, encoding='utf-8') as stream:
+            streamed = list(catalog_io.read_json(stream))
+        with open(FIXTURES, encoding='utf-8') as stream:
+            import json
+            assert streamed == json.load(stream)
+
+    def test_import_fixtures(self, fixture_authors):
+        from api.models import Review, Title
+
+        call_command('import_catalog', FIXTURES, stdout=io.StringIO())
+        assert Title.objects.count() == 3
+        assert Review.objects.get(pk=1).pub_date.isoformat().startswith(
+            '2021-08-31T12:33:26'
+        ), 'Проверьте, что импорт сохраняет исходную дату публикации'
+        assert Title.objects.get(pk=2).rating == 8, (
+            'Проверьте, что импорт отзывов пересчитывает рейтинг'
+        )
+
+    def test_loaddata_ratings_consistent(self):
+        call_command(
+            'loaddata', FIXTURES, exclude=['contenttypes', 'auth', 'admin'],
+            verbosity=0,
+        )
+        call_command('rebuild_ratings', check=True, stdout=io.StringIO())
+
+    @pytest.mark.parametrize('fmt', ['json', 'csv'])
+    def test_export_import_round_trip(self, fixture_authors, tmp_path, fmt):
+        call_command('import_catalog', FIXTURES, stdout=io.StringIO())
+        before = snapshot()
+        labels = ['api.category', 'api.genre', 'api.title', 'api.review',
+                  'api.comment']
+        for label in labels:
+            path = tmp_path / f'{label}.{fmt}'
+            model = [label] if fmt == 'csv' else labels
+            call_command('export_catalog', str(path), format=fmt,
+                         model=model, stderr=io.StringIO())
+            if fmt == 'json':
+                break
+        clear_catalog()
+        for label in labels:
+            path = tmp_path / f'{label}.{fmt}'
+            call_command('import_catalog', str(path), format=fmt,
+                         model=label, stdout=io.StringIO())
+            if fmt == 'json':
+                break
+        assert snapshot() == before
@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+URL = '/api/v1/changes/'
+
+
+def feed(client, **params):
+    response = client.get(URL, params)
+    assert response.status_code == 200, response.content
+    return response.json()
+
+
+def actions(data):
+    return [(item['model'], item['action'], item['id'])
+            for item in data['results']]
+
+
+@pytest.mark.django_db
+class TestChangeFeed:
+
+    def test_writes_are_logged_in_order(self, client, user):
+        from api.models import Category, Comment, Genre, Review, Title
+
+        start = feed(client)['next']
+        category = Category.objects.create(name='Фильм', slug='movie')
+        genre = Genre.objects.create(name='Драма', slug='drama')
+        title = Title.objects.create(name='Сталкер', year=1979)
+        title.genre.add(genre)
+        review = Review.objects.create(
+            title=title, author=user, score=9, text='Да'
+        )
+        comment = Comment.objects.create(review=review, author=user, text='!')
+        category_id = category.pk
+        category.delete()
+
+        data = feed(client, after=start)
+        assert actions(data) == [
+            ('category', 'delete', category_id),
+            ('genre', 'create', genre.pk),
+            ('title', 'create', title.pk),
+            ('title', 'update', title.pk),
+            ('review', 'create', review.pk),
+            ('title', 'update', title.pk),
+            ('comment', 'create', comment.pk),
+            ('category', 'delete', category_id),
+        ]
+        items = data['results']
+        assert items[0]['data'] is None, (
+            'Удалённый объект приходит как delete без данных'
+        )
+        assert items[1]['data'] == {
+            'id': genre.pk, 'name': 'Драма', 'slug': 'drama'
+        }
+        assert items[2]['data']['rating'] == 9, 'Данные — текущее состояние'
+        assert items[4]['data']['title'] == title.pk
+        assert items[6]['data']['review'] == review.pk
+        assert data['next'] == items[-1]['seq'] and not data['more']
+
+        page = feed(client, after=start, limit=3)
+        assert page['more'] and len(page['results']) == 3
+        rest = feed(client, after=page['next'])
+        assert page['results'] + rest['results'] == items
+        assert client.get(URL, {'after': 'x'}).status_code == 400
+
+    def test_batch_logs_titles(self, client, admin_client, catalog):
+        catalog(titles=0)
+        url = '/api/v1/titles/batch/'
+        items = [{'name': f'Пакет {i}', 'year': 2001, 'category': 'movie'}
+                 for i in range(2)]
+        start = feed(client)['next']
+        created = admin_client.post(url, items, format='json').json()
+        first, second = [item['id'] for item in created['results']]
+        middle = feed(client)['next']
+        items.append({'name': 'Пакет 2', 'year': 2002})
+        response = admin_client.post(f'{url}?upsert=1', items, format='json')
+        third = response.json()['results'][2]['id']
+
+        assert actions(feed(client, after=start)) == [
+            ('title', 'create', first),
+            ('title', 'create', second),
+            ('title', 'create', third),
+            ('title', 'update', first),
+            ('title', 'update', second),
+        ], 'Пакетная запись с известными id не должна давать reset'
+        data = feed(client, after=middle)
+        assert data['results'][0]['data']['year'] == 2002
+
+    def test_save_rolls_back_with_log(self, client):
+        from django.db.models.signals import post_save
+
+        from api.models import ChangeLogEntry, Genre
+
+        def fail(**kwargs):
+            raise RuntimeError
+
+        count = ChangeLogEntry.objects.count()
+        # Сбой в обработчике после записи журнала.
+        post_save.connect(fail, sender=Genre)
+        try:
+            with pytest.raises(RuntimeError):
+                Genre.objects.create(name='Драма', slug='drama')
+        finally:
+            post_save.disconnect(fail, sender=Genre)
+        assert not Genre.objects.exists()
+        assert ChangeLogEntry.objects.count() == count, (
+            'Запись журнала откатывается вместе с объектом'
+        )
+
+    def test_waits_for_recent_gap(self, client, catalog):
+        from api.models import ChangeLogEntry
+
+        start = feed(client)['next']
+        catalog(titles=3)
+        entries = list(ChangeLogEntry.objects.filter(seq__gt=start))
+        entries[1].delete()
+        data = feed(client, after=start)
+        assert [item['seq'] for item in data['results']] == [
+            entries[0].seq
+        ], 'Запись за свежим пропуском может обогнать незакоммиченную'
+        ChangeLogEntry.objects.filter(seq__gt=start).update(
+            created=timezone.now() - timedelta(minutes=1)
+        )
+        data = feed(client, after=start)
+        assert len(data['results']) == len(entries) - 1, (
+            'Старый пропуск — откатившаяся транзакция'
+        )
+
+    def test_compaction(self, client, catalog):
+        from api.catalog_io import CatalogImporter
+        from api.models import ChangeLogEntry
+
+        title = catalog(titles=1)[0]
+        for year in (2001, 2002):
+            title.year = year
+            title.save()
+        CatalogImporter().run([{'model': 'api.genre', 'fields': {
+            'name': 'Новый', 'slug': 'new'
+        }}])
+        assert ChangeLogEntry.objects.last().action == 'reset'
+        first = ChangeLogEntry.objects.first().seq
+        ChangeLogEntry.objects.update(
+            created=timezone.now() - timedelta(days=1)
+        )
+
+        call_command('compact_changes', stdout=None)
+        kept = actions(feed(client, after=first - 1))
+        assert ('title', 'update', title.pk) in kept
+        assert len(kept) == len(set(kept)), 'Перекрытые записи удалены'
+        assert not any(model == 'genre' for model, _, _ in kept[:-1]), (
+            'reset перекрывает прежние записи модели'
+        )
+
+        call_command('compact_changes', retention=0, stdout=None)
+        assert ChangeLogEntry.objects.count() == 1, (
+            'Последняя запись остаётся: по ней продолжается нумерация'
+        )
+        response = client.get(URL, {'after': first})
+        assert response.status_code == 410
+        assert response.json()['latest'] == ChangeLogEntry.objects.get().seq
@@ -0,0 +1,48 @@
+import pytest
+
+
+@pytest.mark.django_db
+class TestCommentPath:
+
+    def url(self, title_id, review_id):
+        return f'/api/v1/titles/{title_id}/reviews/{review_id}/comments/'
+
+    def test_create_checks_review_title_in_one_query(
+        self, user_client, reviews, catalog
+    ):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from api.models import Comment
+
+        review = reviews(count=1)[0]
+        other = catalog(titles=1)[0]
+        response = user_client.post(
+            self.url(other.id, review.id), {'text': 'Мимо'}
+        )
+        assert response.status_code == 404, (
+            'Отзыв другого произведения должен давать 404'
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(
+                self.url(review.title_id, review.id), {'text': 'Верно'}
+            )
+        assert response.status_code == 201
+        lookups = [
+            query for query in context.captured_queries
+            if 'FROM "api_review"' in query['sql']
+            or 'FROM "api_title"' in query['sql']
+        ]
+        assert len(lookups) == 1, lookups
+        assert Comment.objects.get().review_id == review.id
+
+    def test_list_filtered_by_title(self, user_client, reviews, catalog, user):
+        from api.models import Comment
+
+        review = reviews(count=1)[0]
+        Comment.objects.create(review=review, author=user, text='Текст')
+        other = catalog(titles=1)[0]
+        response = user_client.get(self.url(review.title_id, review.id))
+        assert response.json()['count'] == 1
+        response = user_client.get(self.url(other.id, review.id))
+        assert response.json()['count'] == 0
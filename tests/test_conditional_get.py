@@ -0,0 +1,72 @@
+import pytest
+
+
+@pytest.mark.django_db
+class TestConditionalGet:
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_title_not_modified_without_queries(
+        self, admin_client, catalog, django_assert_num_queries
+    ):
+        title = catalog(titles=1)[0]
+        url = f'/api/v1/titles/{title.id}/'
+        # Первый запрос кэширует версию токенов пользователя.
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        assert response['ETag'] and response['Last-Modified']
+        with django_assert_num_queries(0):
+            revalidated = self.revalidate(admin_client, url, response)
+        assert revalidated.status_code == 304
+        assert revalidated['ETag'] == response['ETag']
+        assert revalidated.content == b''
+
+        admin_client.patch(url, {'name': 'Новое'}, format='json')
+        changed = self.revalidate(admin_client, url, response)
+        assert changed.status_code == 200, (
+            'После изменения произведения ETag должен смениться'
+        )
+        assert changed.json()['name'] == 'Новое'
+
+    def test_if_modified_since_ignored(self, admin_client, catalog):
+        title = catalog(titles=1)[0]
+        url = f'/api/v1/titles/{title.id}/'
+        response = admin_client.get(url)
+        # Правка в ту же секунду: Last-Modified не меняется.
+        admin_client.patch(url, {'name': 'Новое'}, format='json')
+        revalidated = admin_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        assert revalidated.status_code == 200, (
+            'Проверьте, что 304 решается только по ETag'
+        )
+        assert revalidated.json()['name'] == 'Новое'
+        assert revalidated['Last-Modified']
+
+    def test_reviews_etag_follows_writes(self, user_client, reviews, user):
+        review = reviews(count=2)[0]
+        url = f'/api/v1/titles/{review.title_id}/reviews/'
+        comments = f'{url}{review.id}/comments/'
+        listed = user_client.get(url)
+        commented = user_client.get(comments)
+        assert self.revalidate(user_client, url, listed).status_code == 304
+        user_client.post(comments, {'text': 'Комментарий'})
+        assert self.revalidate(
+            user_client, comments, commented
+        ).status_code == 200
+        assert self.revalidate(user_client, url, listed).status_code == 304, (
+            'Комментарий не меняет список отзывов'
+        )
+        user_client.post(url, {'text': 'Отзыв', 'score': 3})
+        assert self.revalidate(user_client, url, listed).status_code == 200
+
+    def test_author_rename_changes_reviews_etag(self, client, reviews):
+        review = reviews(count=1)[0]
+        url = f'/api/v1/titles/{review.title_id}/reviews/'
+        listed = client.get(url)
+        review.author.username = 'renamed'
+        review.author.save()
+        changed = self.revalidate(client, url, listed)
+        assert changed.status_code == 200
+        assert changed.json()['results'][0]['author'] == 'renamed'
@@ -0,0 +1,76 @@
+import pytest
+
+EMAIL_URL = '/api/v1/auth/email/'
+TOKEN_URL = '/api/v1/auth/token/'
+
+
+@pytest.mark.django_db
+class TestConfirmationCodes:
+
+    def request_code(self, client, user):
+        from api.models import OutboxMessage
+
+        response = client.post(EMAIL_URL, {'email': user.email})
+        assert response.status_code == 201
+        return OutboxMessage.objects.latest('id').body
+
+    def test_code_exchanged_for_token_once(self, client, user):
+        from api.models import OneTimeCode
+
+        code = self.request_code(client, user)
+        assert not OneTimeCode.objects.filter(digest__contains=code).exists(), (
+            'Код не должен храниться в открытом виде'
+        )
+        data = {'email': user.email, 'confirmation_code': code}
+        response = client.post(TOKEN_URL, data)
+        assert response.status_code == 200, response.json()
+        assert 'access' in response.json()
+        response = client.post(TOKEN_URL, data)
+        assert response.status_code == 400, 'Код должен быть одноразовым'
+
+    def test_code_bound_to_email(self, client, user, admin):
+        code = self.request_code(client, user)
+        response = client.post(
+            TOKEN_URL, {'email': admin.email, 'confirmation_code': code}
+        )
+        assert response.status_code == 400
+
+    def test_new_code_replaces_previous(self, client, user):
+        first = self.request_code(client, user)
+        second = self.request_code(client, user)
+        response = client.post(
+            TOKEN_URL, {'email': user.email, 'confirmation_code': first}
+        )
+        assert response.status_code == 400
+        response = client.post(
+            TOKEN_URL, {'email': user.email, 'confirmation_code': second}
+        )
+        assert response.status_code == 200
+
+    def test_email_case_insensitive(self, client, user):
+        code = self.request_code(client, user)
+        response = client.post(TOKEN_URL, {
+            'email': user.email.upper(), 'confirmation_code': code
+        })
+        assert response.status_code == 200, (
+            'Код должен подходить к email в любом регистре'
+        )
+
+    def test_consume_is_single_query(self, user, django_assert_num_queries):
+        from api import codes
+
+        code = codes.issue(user)
+        with django_assert_num_queries(1):
+            assert codes.consume(user.email, code) == user.pk
+        with django_assert_num_queries(1):
+            assert codes.consume(user.email, code) is None
+
+    def test_expired_code(self, user, settings):
+        from api import codes
+        from api.models import OneTimeCode
+
+        settings.CONFIRMATION_CODE_TTL = -1
+        code = codes.issue(user)
+        assert codes.consume(user.email, code) is None
+        assert codes.purge_expired(batch_size=1) == 1
+        assert not OneTimeCode.objects.exists()
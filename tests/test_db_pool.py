@@ -0,0 +1,109 @@
+import pytest
+from django.db import OperationalError
+from django.db.utils import load_backend
+
+from api.db import pool
+
+
+@pytest.fixture
+def make_connection(tmp_path, monkeypatch, django_db_blocker):
+    monkeypatch.setattr(pool, '_pools', {})
+    backend = load_backend('api.db.backends.sqlite3')
+
+    def make(**options):
+        settings_dict = {
+            'ENGINE': 'api.db.backends.sqlite3',
+            'NAME': str(tmp_path / 'pool.sqlite3'),
+            'CONN_MAX_AGE': 0,
+            'AUTOCOMMIT': True,
+            'ATOMIC_REQUESTS': False,
+            'OPTIONS': {},
+            'TIME_ZONE': None,
+            'USER': '', 'PASSWORD': '', 'HOST': '', 'PORT': '',
+            'TEST': {},
+            'POOL': options,
+        }
+        connection = backend.DatabaseWrapper(settings_dict, alias='pooled')
+        created.append(connection)
+        return connection
+
+    created = []
+    # Отдельная база в файле, тестовая база Django не нужна.
+    with django_db_blocker.unblock():
+        yield make
+        for connection in created:
+            connection.close()
+
+
+def query(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return connection.connection
+
+
+class TestConnectionPool:
+
+    def test_connection_is_reused(self, make_connection):
+        connection = make_connection()
+        raw = query(connection)
+        connection.close()
+        assert query(connection) is raw, (
+            'Закрытое соединение должно вернуться в пул и выдаваться снова'
+        )
+        stats = connection.pool.stats()
+        assert (stats['created'], stats['reused']) == (1, 1)
+        assert (stats['in_use'], stats['idle']) == (1, 0)
+
+    def test_expired_connection_is_replaced(self, make_connection):
+        connection = make_connection(MAX_AGE=0)
+        raw = query(connection)
+        connection.close()
+        assert query(connection) is not raw
+        assert connection.pool.stats()['expired'] == 1
+
+    def test_broken_connection_fails_health_check(self, make_connection):
+        connection = make_connection()
+        raw = query(connection)
+        connection.close()
+        raw.close()
+        assert query(connection) is not raw, (
+            'Перед выдачей соединение из пула должно проверяться'
+        )
+        assert connection.pool.stats()['broken'] == 1
+
+    def test_atomic_connection_is_not_pooled(self, make_connection):
+        connection = make_connection()
+        with connection.cursor():
+            pass
+        connection.in_atomic_block = True
+        connection.close()
+        connection.in_atomic_block = False
+        stats = connection.pool.stats()
+        assert (stats['idle'], stats['discarded']) == (0, 1)
+
+    def test_checkout_waits_for_max_size(self, make_connection):
+        first = make_connection(MAX_SIZE=1, TIMEOUT=0.01)
+        second = make_connection()
+        query(first)
+        with pytest.raises(OperationalError):
+            query(second)
+        assert first.pool.stats()['timeouts'] == 1
+        first.close()
+        query(second)
+        assert second.pool.stats()['size'] == 1
+
+
+@pytest.mark.django_db
+class TestDbStats:
+
+    def test_admin_only(self, client, user_client, admin_client):
+        url = '/api/v1/service/db/'
+        assert client.get(url).status_code == 401
+        assert user_client.get(url).status_code == 403
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        default = response.json()['databases']['default']
+        assert default['engine'] == 'django.db.backends.sqlite3'
+        assert default['pool'] is None, (
+            'Без бэкенда с пулом статистики пула нет'
+        )
@@ -19,3 +19,14 @@ class TestDockerfileCompose:
         assert re.search(r'image:\s+([a-zA-Z0-9]+)\/([a-zA-Z0-9_\.])+(\:[a-zA-Z0-9_-]+)?', docker_compose), (
             'Проверьте, что добавили сборку контейнера из образа на вашем DockerHub в файл docker-compose.yaml'
         )
+
+    def test_shared_catalog_cache(self):
+        with open(os.path.join(settings.BASE_DIR, 'docker-compose.yaml')) as f:
+            services = re.split(r'\n  (?=\w+:\n)', f.read())
+        blocks = {block.split(':')[0]: block for block in services[1:]}
+        for name in ('web', 'catalog', 'outbox'):
+            assert 'cache_value:/code/cache/' in blocks.get(name, ''), (
+                f'Кэш каталога в контейнере {name} должен лежать в общем '
+                'томе cache_value, иначе контейнеры не видят записей '
+                'друг друга'
+            )
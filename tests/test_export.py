@@ -0,0 +1,70 @@
+import json
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+
+def lines(response):
+    assert response.status_code == 200, response.content
+    assert response.streaming, 'Выгрузка должна быть потоковой'
+    assert response['Content-Type'] == 'application/x-ndjson'
+    content = b''.join(response.streaming_content).decode()
+    return [json.loads(line) for line in content.splitlines()]
+
+
+@pytest.mark.django_db
+class TestExport:
+
+    def url(self, title_id):
+        return f'/api/v1/titles/{title_id}/reviews/export/'
+
+    def test_reviews_in_publication_order(self, client, user_client,
+                                          reviews):
+        from api.models import Review
+
+        created = reviews(count=3)
+        title_id = created[0].title_id
+        assert client.get(self.url(title_id)).status_code == 401, (
+            'Выгрузка доступна только с токеном'
+        )
+        now = timezone.now()
+        for days, review in zip((1, 3, 2), created):
+            Review.objects.filter(pk=review.pk).update(
+                pub_date=now - timedelta(days=days)
+            )
+        records = lines(user_client.get(self.url(title_id)))
+        assert [record['id'] for record in records] == [
+            created[1].pk, created[2].pk, created[0].pk
+        ], 'Записи идут по pub_date'
+        listed = user_client.get(
+            f'/api/v1/titles/{title_id}/reviews/{created[1].pk}/'
+        ).json()
+        assert records[0] == listed, 'Поля как у отзыва в API'
+
+        since = records[1]['pub_date']
+        records = lines(user_client.get(self.url(title_id), {'since': since}))
+        assert [record['id'] for record in records] == [
+            created[2].pk, created[0].pk
+        ], 'since включает запись с этой датой'
+        response = user_client.get(self.url(title_id), {'since': 'вчера'})
+        assert response.status_code == 400
+
+    def test_comments(self, user_client, user, reviews):
+        from api.models import Comment
+
+        review, other = reviews(count=2)
+        comments = [
+            Comment.objects.create(review=review, author=user, text=f'{i}')
+            for i in range(3)
+        ]
+        Comment.objects.create(review=other, author=user, text='Мимо')
+        records = lines(user_client.get(
+            f'/api/v1/titles/{review.title_id}/reviews/{review.pk}/'
+            'comments/export/'
+        ))
+        assert [record['id'] for record in records] == [
+            comment.pk for comment in comments
+        ]
+        assert set(records[0]) == {'id', 'author', 'text', 'pub_date'}
+        assert records[0]['author'] == user.username
@@ -0,0 +1,134 @@
+"""Быстрый путь вывода совпадает с прежним байт в байт.
+
+Каждый эндпоинт запрашивается дважды: с рабочими сериализаторами и
+FastJSONRenderer и с эталонными ModelSerializer и JSONRenderer в том виде,
+в каком они были до быстрого пути.
+"""
+import pytest
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+
+def reference_serializers():
+    from api.models import Category, Comment, Genre, Review, Title
+
+    class GenreSerializer(serializers.ModelSerializer):
+        class Meta:
+            fields = ('name', 'slug')
+            model = Genre
+
+    class CategorySerializer(serializers.ModelSerializer):
+        class Meta:
+            fields = ('name', 'slug')
+            model = Category
+
+    class ReviewSerializer(serializers.ModelSerializer):
+        author = serializers.SlugRelatedField(
+            read_only=True, slug_field='username'
+        )
+
+        class Meta:
+            fields = ('id', 'text', 'author', 'score', 'pub_date')
+            model = Review
+
+    class CommentSerializer(serializers.ModelSerializer):
+        author = serializers.SerializerMethodField()
+
+        def get_author(self, obj):
+            return obj.author.username
+
+        class Meta:
+            fields = ('id', 'author', 'text', 'pub_date')
+            model = Comment
+
+    class TitleSerializer(serializers.ModelSerializer):
+        rating = serializers.IntegerField(read_only=True)
+        genre = GenreSerializer(many=True, read_only=True)
+        category = CategorySerializer(read_only=True)
+
+        class Meta:
+            fields = ('id', 'name', 'year', 'rating', 'description',
+                      'genre', 'category')
+            model = Title
+
+    return TitleSerializer, ReviewSerializer, CommentSerializer
+
+
+@pytest.fixture
+def awkward_catalog(catalog, reviews, user):
+    """Данные, на которых расходятся кодировщики: юникод, U+2028,
+    кавычки, управляющие символы, пустые значения, микросекунды."""
+    from api.models import Comment, Title
+
+    titles = catalog(titles=3, genres_per_title=3)
+    titles[0].name = 'Ёжик «в тумане»     "кавычки" \\ \t\x01'
+    titles[0].description = 'строка\nвторая 😀'
+    titles[0].save()
+    bare = Title.objects.create(name='Без года и категории')
+    made = reviews(count=3, title=titles[0])
+    for position, review in enumerate(made):
+        Comment.objects.create(
+            review=review, author=user, text=f'Комментарий {position} '
+        )
+    return titles[0], bare, made[0]
+
+
+@pytest.mark.django_db
+class TestFastSerialization:
+
+    def urls(self, title, bare, review):
+        reviews = f'/api/v1/titles/{title.id}/reviews/'
+        comments = f'{reviews}{review.id}/comments/'
+        return (
+            '/api/v1/titles/',
+            '/api/v1/titles/?page_size=2',
+            f'/api/v1/titles/{title.id}/',
+            f'/api/v1/titles/{bare.id}/',
+            reviews,
+            reviews + '?cursor=',
+            f'{reviews}{review.id}/',
+            comments,
+            comments + '?cursor=&page_size=2',
+            f'{comments}{review.review.first().id}/',
+        )
+
+    def fetch(self, client, urls):
+        from django.core.cache import caches
+
+        caches['catalog'].clear()
+        return [client.get(url).content for url in urls]
+
+    @pytest.mark.parametrize('with_orjson', (True, False))
+    def test_byte_identical(self, client, awkward_catalog, monkeypatch,
+                            with_orjson):
+        from api import renderers, views
+
+        if with_orjson and renderers.orjson is None:
+            pytest.skip('orjson не установлен')
+        if not with_orjson:
+            monkeypatch.setattr(renderers, 'orjson', None)
+        urls = self.urls(*awkward_catalog)
+        fast = self.fetch(client, urls)
+
+        title, review, comment = reference_serializers()
+        for view, serializer in (
+            (views.TitleModelViewSet, title),
+            (views.ReviewModelViewSet, review),
+            (views.CommentModelViewSet, comment),
+        ):
+            monkeypatch.setattr(view, 'serializer_class', serializer)
+            monkeypatch.setattr(view, 'renderer_classes', (JSONRenderer,))
+        reference = self.fetch(client, urls)
+
+        for url, got, expected in zip(urls, fast, reference):
+            assert got == expected, url
+
+    def test_comments_without_author_queries(
+        self, client, awkward_catalog, django_assert_num_queries
+    ):
+        title, _, review = awkward_catalog
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/comments/'
+        # count и одна выборка вместе с авторами.
+        with django_assert_num_queries(2):
+            response = client.get(url)
+        assert response.status_code == 200
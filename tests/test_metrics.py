@@ -0,0 +1,86 @@
+import logging
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from api import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = metrics.Registry()
+    monkeypatch.setattr(metrics, 'registry', registry)
+    return registry
+
+
+@pytest.mark.django_db
+class TestMetrics:
+
+    def test_route_metrics(self, client, catalog, registry):
+        title = catalog(titles=2)[0]
+        response = client.get('/api/v1/titles/')
+        client.get('/api/v1/titles/')
+        client.get(f'/api/v1/titles/{title.id}/')
+        stats = registry.routes['TitleModelViewSet.list']
+        assert stats.count == 2, 'Маршрут — это viewset и action'
+        assert 'TitleModelViewSet.retrieve' in registry.routes
+        first = [stats.recent(column)[0] for column in range(5)]
+        duration, queries, db_time, serialize_time, size = first
+        assert queries > 0 and 0 < db_time < duration
+        assert 0 < serialize_time < duration
+        assert size == len(response.content)
+        assert stats.recent(1)[1] == 0, (
+            'Повторный список отдаётся из кэша без SQL-запросов'
+        )
+
+    def test_slow_request_logs_sql(self, client, catalog, registry,
+                                   settings, caplog):
+        settings.METRICS = {**settings.METRICS, 'SLOW_REQUEST': 0}
+        catalog(titles=1)
+        with caplog.at_level(logging.WARNING, logger='api.metrics'):
+            client.get('/api/v1/titles/')
+        assert 'TitleModelViewSet.list' in caplog.text
+        assert 'SELECT' in caplog.text, (
+            'Медленный запрос должен попасть в лог вместе с SQL'
+        )
+
+    def test_prometheus_endpoint(self, client, admin_client, registry):
+        url = '/api/v1/service/metrics/'
+        assert client.get(url).status_code == 401
+        client.get('/api/v1/genres/')
+        response = admin_client.get(url)
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        text = response.content.decode()
+        assert (
+            'yamdb_request_duration_seconds_bucket{'
+            'route="GenreModelViewSet.list",le="+Inf"} 1'
+        ) in text
+        assert 'yamdb_db_queries_total{route="GenreModelViewSet.list"}' in (
+            text
+        )
+
+    def test_report_merges_workers(self, client, registry, settings):
+        client.get('/api/v1/genres/')
+        # Метрики другого воркера в общем кэше.
+        other = metrics.Registry()
+        other.routes = {
+            name: metrics.RouteStats(4, settings.METRICS['BUCKETS'])
+            for name in ('GenreModelViewSet.list', 'email_auth.post')
+        }
+        for stats in other.routes.values():
+            stats.add((0.2, 1, 0.01, 0.0, 10), 5)
+        cache = metrics.get_cache()
+        cache.set(metrics.WORKER_KEY.format(0), other.snapshot())
+        cache.set(metrics.WORKERS_KEY, {0})
+
+        routes, workers = metrics.collect()
+        assert workers == 2
+        assert routes['GenreModelViewSet.list'].count == 2
+        assert routes['email_auth.post'].count == 1
+
+        out = StringIO()
+        call_command('perf_report', stdout=out)
+        assert 'воркеров: 2' in out.getvalue()
+        assert 'GenreModelViewSet.list' in out.getvalue()
@@ -0,0 +1,92 @@
+import pytest
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+
+URL = '/api/v1/auth/email/'
+
+
+class FailingBackend(EmailBackend):
+    """Почтовый бэкенд, отказывающий одному адресу."""
+
+    opened = 0
+
+    def open(self):
+        FailingBackend.opened += 1
+
+    def send_messages(self, messages):
+        if any('broken' in to for message in messages for to in message.to):
+            raise ConnectionError('отказ сервера')
+        return super().send_messages(messages)
+
+
+@pytest.mark.django_db
+class TestOutbox:
+
+    def enqueue(self, *addresses):
+        from api import outbox
+
+        return [
+            outbox.enqueue('Тема', 'Текст', [address])
+            for address in addresses
+        ]
+
+    def test_email_auth_only_enqueues(self, client, user):
+        from api.models import OutboxMessage
+
+        response = client.post(URL, {'email': user.email})
+        assert response.status_code == 201
+        assert mail.outbox == [], 'Письмо не должно отправляться в запросе'
+        message = OutboxMessage.objects.get()
+        assert message.recipients == user.email
+
+    def test_batch_over_one_connection(self, settings):
+        from api import outbox
+
+        settings.EMAIL_BACKEND = 'tests.test_outbox.FailingBackend'
+        FailingBackend.opened = 0
+        self.enqueue('a@yamdb.ru', 'b@yamdb.ru', 'c@yamdb.ru')
+        sent, failed = outbox.deliver_pending()
+        assert (len(sent), failed) == (3, [])
+        assert FailingBackend.opened == 1, (
+            'Пачка писем должна уходить через одно соединение'
+        )
+        assert [m.to for m in mail.outbox] == [
+            ['a@yamdb.ru'], ['b@yamdb.ru'], ['c@yamdb.ru']
+        ]
+        assert outbox.stats()['queue_depth'] == 0
+        assert outbox.deliver_pending() == ([], [])
+
+    def test_failed_message_is_retried_later(self, settings):
+        from api import outbox
+
+        settings.EMAIL_BACKEND = 'tests.test_outbox.FailingBackend'
+        good, broken = self.enqueue('a@yamdb.ru', 'broken@yamdb.ru')
+        sent, failed = outbox.deliver_pending()
+        assert [m.pk for m in sent] == [good.pk]
+        assert [m.pk for m, _ in failed] == [broken.pk]
+        good.refresh_from_db()
+        assert good.body == '', 'Текст отправленного письма должен стираться'
+        broken.refresh_from_db()
+        assert broken.attempts == 1 and broken.sent is None
+        assert broken.body == 'Текст', 'Текст нужен для повтора'
+        assert 'ConnectionError' in broken.error
+        assert outbox.deliver_pending() == ([], []), (
+            'Повтор должен быть отложен'
+        )
+        assert outbox.stats()['queue_depth'] == 1
+
+    def test_gives_up_after_max_attempts(self, settings):
+        from api import outbox
+
+        settings.EMAIL_BACKEND = 'tests.test_outbox.FailingBackend'
+        settings.OUTBOX = dict(settings.OUTBOX, RETRY_DELAY=0, MAX_ATTEMPTS=2)
+        message, = self.enqueue('broken@yamdb.ru')
+        outbox.deliver_pending()
+        outbox.deliver_pending()
+        assert outbox.deliver_pending() == ([], [])
+        stats = outbox.stats()
+        assert (stats['queue_depth'], stats['failed']) == (0, 1)
+        message.refresh_from_db()
+        assert message.body == '', (
+            'Текст письма должен стираться, когда попытки кончились'
+        )
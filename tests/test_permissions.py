@@ -0,0 +1,53 @@
+import pytest
+
+
+class TestRoleMasks:
+
+    def test_compiled_masks(self):
+        from api.permissions import METHOD_BITS, compile_roles_permissions
+
+        masks = compile_roles_permissions({
+            'Titles': {
+                'user': ('GET', 'POST'), 'moderator': 'GET', 'anon': (None,)
+            },
+        })['Titles']
+        assert masks['user'] == METHOD_BITS['GET'] | METHOD_BITS['POST']
+        assert masks['moderator'] == METHOD_BITS['GET'], (
+            'Строка вместо кортежа — один метод, а не подстроки'
+        )
+        assert masks['anon'] == 0
+
+    def test_settings_override_recompiles(self, settings):
+        from api import permissions
+
+        settings.ROLES_PERMISSIONS = {'Titles': {'anon': ('GET', 'POST')}}
+        assert permissions.ROLE_MASKS['Titles']['anon'] & (
+            permissions.METHOD_BITS['POST']
+        )
+
+
+@pytest.mark.django_db
+class TestAuthorPermission:
+
+    def test_author_check_does_not_load_author(
+        self, user, admin, django_assert_num_queries
+    ):
+        from rest_framework.test import APIRequestFactory
+
+        from api.models import Review, Title
+        from api.permissions import IsAuthorOrReadOnly
+
+        title = Title.objects.create(name='Произведение')
+        review = Review.objects.create(
+            text='Отзыв', author=user, score=5, title=title
+        )
+        review = Review.objects.get(pk=review.pk)
+        request = APIRequestFactory().patch('/')
+        permission = IsAuthorOrReadOnly()
+        with django_assert_num_queries(0):
+            request.user = user
+            assert permission.has_object_permission(request, None, review)
+            request.user = admin
+            assert not permission.has_object_permission(
+                request, None, review
+            )
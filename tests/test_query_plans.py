@@ -0,0 +1,124 @@
+"""EXPLAIN-планы запросов горячих эндпоинтов на заполненной базе.
+
+Тест проходит по эндпоинтам, собирает выполненные SELECT и проверяет,
+что ни один из них не читает большие таблицы целиком. Маленькие
+справочники (категории, жанры, пользователи по username) не проверяются.
+"""
+import re
+
+import pytest
+
+LARGE_TABLES = ('api_title', 'api_review', 'api_comment', 'api_title_genre')
+TITLES = 300
+REVIEWS_PER_TITLE = 4
+COMMENTS_PER_REVIEW = 2
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+POSTGRESQL_FULL_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def full_scans(connection, sql, params):
+    """Большие таблицы, которые запрос читает целиком."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            matches = (
+                SQLITE_FULL_SCAN.match(row[-1]) for row in cursor.fetchall()
+            )
+        else:
+            cursor.execute('EXPLAIN ' + sql, params)
+            matches = (
+                POSTGRESQL_FULL_SCAN.search(row[0])
+                for row in cursor.fetchall()
+            )
+        return {
+            match.group(1) for match in matches
+            if match and match.group(1) in LARGE_TABLES
+        }
+
+
+@pytest.fixture
+def dataset(db, catalog):
+    """Каталог с отзывами и комментариями и собранной статистикой."""
+    from django.db import connection
+
+    from api.models import Comment, Review, User
+
+    titles = catalog(titles=TITLES, genres_per_title=3)
+    User.objects.bulk_create(
+        User(username=f'critic{i}', email=f'critic{i}@yamdb.ru')
+        for i in range(REVIEWS_PER_TITLE)
+    )
+    # SQLite не возвращает id из bulk_create.
+    authors = list(User.objects.filter(username__startswith='critic'))
+    Review.objects.bulk_create(
+        Review(title=title, author=author, score=5, text='Отзыв')
+        for title in titles
+        for author in authors
+    )
+    Comment.objects.bulk_create(
+        Comment(review=review, author=author, text='Комментарий')
+        for review in Review.objects.all()
+        for author in authors[:COMMENTS_PER_REVIEW]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    title = titles[TITLES // 2]
+    return title, Review.objects.filter(title=title).first()
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+
+    def endpoints(self, title, review):
+        reviews = f'/api/v1/titles/{title.id}/reviews/'
+        comments = f'{reviews}{review.id}/comments/'
+        return (
+            '/api/v1/titles/',
+            '/api/v1/titles/?category=movie',
+            '/api/v1/titles/?genre=genre-1',
+            '/api/v1/titles/?year=2000',
+            f'/api/v1/titles/{title.id}/',
+            reviews,
+            reviews + '?cursor=',
+            f'{reviews}{review.id}/',
+            comments,
+            comments + '?cursor=',
+        )
+
+    def test_no_full_scans(self, dataset, user_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        title, review = dataset
+        # Версия токенов кэшируется первым запросом.
+        user_client.get('/api/v1/users/me/')
+        failures = []
+        for url in self.endpoints(title, review):
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.get(url)
+            assert response.status_code == 200, url
+            failures.extend(self.check(connection, url, context))
+        assert not failures, 'Полное чтение таблиц:\n' + '\n'.join(failures)
+
+    def test_review_create_uses_index(self, dataset, user_client):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        title, _ = dataset
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        user_client.get('/api/v1/users/me/')
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.post(url, {'text': 'Новый', 'score': 7})
+        assert response.status_code == 201, response.json()
+        assert not list(self.check(connection, url, context))
+
+    def check(self, connection, url, context):
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            # captured_queries хранит SQL с подставленными параметрами.
+            scans = full_scans(connection, sql, ())
+            if scans:
+                yield f'{url}: {", ".join(sorted(scans))}: {sql}'
@@ -0,0 +1,28 @@
+import pytest
+
+
+@pytest.mark.django_db
+class TestReviewCreate:
+
+    def test_duplicate_review_race(self, user_client, user, catalog,
+                                   monkeypatch):
+        from django.db.models.query import QuerySet
+
+        from api.models import Review
+
+        title = catalog(titles=1)[0]
+        url = f'/api/v1/titles/{title.id}/reviews/'
+        data = {'text': 'Отзыв', 'score': 7}
+        assert user_client.post(url, data).status_code == 201
+        assert user_client.post(url, data).status_code == 400
+        # Параллельный запрос: проверка exists() ещё не видит первый отзыв.
+        monkeypatch.setattr(QuerySet, 'exists', lambda self: False)
+        response = user_client.post(url, data)
+        assert response.status_code == 400, (
+            'Проверьте, что нарушение уникальности (title, author) '
+            'возвращает 400, а не 500'
+        )
+        monkeypatch.undo()
+        assert Review.objects.filter(title=title, author=user).count() == 1
+        title.refresh_from_db()
+        assert (title.rating_sum, title.rating_count) == (7, 1)
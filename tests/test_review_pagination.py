@@ -0,0 +1,56 @@
+import pytest
+
+
+@pytest.mark.django_db
+class TestReviewKeysetPagination:
+
+    def walk(self, client, url):
+        ids = []
+        while url:
+            data = client.get(url).json()
+            ids.extend(review['id'] for review in data['results'])
+            url = data['next']
+        return ids
+
+    def test_page_number_is_default(self, client, reviews):
+        title_id = reviews(count=3)[0].title_id
+        data = client.get(f'/api/v1/titles/{title_id}/reviews/').json()
+        assert data['count'] == 3, (
+            'Проверьте, что без ?cursor используется постраничная пагинация'
+        )
+
+    def test_cursor_walks_all_reviews_once(self, client, reviews):
+        created = reviews(count=7)
+        url = (f'/api/v1/titles/{created[0].title_id}/reviews/'
+               '?cursor=&page_size=3')
+        ids = self.walk(client, url)
+        expected = sorted(
+            created, key=lambda r: (r.pub_date, r.id), reverse=True
+        )
+        assert ids == [review.id for review in expected], (
+            'Проверьте, что курсоры проходят отзывы по (pub_date, id) '
+            'без пропусков и повторов'
+        )
+
+    def test_previous_cursor_returns_same_page(self, client, reviews):
+        created = reviews(count=6)
+        base = f'/api/v1/titles/{created[0].title_id}/reviews/'
+        first = client.get(f'{base}?cursor=&page_size=2').json()
+        second = client.get(first['next']).json()
+        back = client.get(second['previous']).json()
+        assert back['results'] == first['results']
+
+    def test_approximate_count(self, client, reviews):
+        created = reviews(count=4)
+        data = client.get(
+            f'/api/v1/titles/{created[0].title_id}/reviews/'
+            '?cursor=&count=approx'
+        ).json()
+        assert data['count'] == 4
+
+    def test_invalid_cursor(self, client, reviews):
+        created = reviews(count=1)
+        response = client.get(
+            f'/api/v1/titles/{created[0].title_id}/reviews/?cursor=xyz'
+        )
+        assert response.status_code == 404
@@ -0,0 +1,85 @@
+import pytest
+
+from api import metrics, throttling
+
+
+@pytest.fixture
+def buckets(monkeypatch):
+    monkeypatch.setattr(throttling, 'local_buckets', throttling.LocalBuckets())
+    monkeypatch.setattr(metrics, 'registry', metrics.Registry())
+
+
+@pytest.mark.django_db
+class TestThrottling:
+
+    def test_client_bucket(self, client, admin_client, settings, buckets):
+        settings.ROLES_THROTTLE = {'default': {'anon': '3/m'}}
+        url = '/api/v1/genres/'
+        remaining = []
+        for _ in range(3):
+            response = client.get(url)
+            assert response.status_code == 200
+            assert response['X-RateLimit-Limit'] == '3'
+            remaining.append(response['X-RateLimit-Remaining'])
+        assert remaining == ['2', '1', '0']
+        response = client.get(url)
+        assert response.status_code == 429
+        assert response['Retry-After'] == '20', 'Токен раз в 20 секунд'
+        assert client.get(url, REMOTE_ADDR='10.0.0.2').status_code == 200, (
+            'У другого адреса своя корзина'
+        )
+        assert client.get(
+            url, HTTP_X_FORWARDED_FOR='10.0.0.3, 127.0.0.1'
+        ).status_code == 429, 'Адрес клиента добавляет nginx последним'
+        assert admin_client.get(url).status_code == 200
+        text = metrics.render_prometheus({}, 1, metrics.collect_counters())
+        assert (
+            'yamdb_throttled_requests_total{role="anon",route="genre-list"} 2'
+        ) in text
+
+    def test_route_bucket(self, client, settings, buckets):
+        settings.ROLES_THROTTLE = {
+            'default': {'anon': '100/m'},
+            'token_obtain_pair': {'anon': '2/h'},
+        }
+        url = '/api/v1/auth/token/'
+        data = {'email': 'nobody@yamdb.fake', 'confirmation_code': '0'}
+        for _ in range(2):
+            assert client.post(url, data).status_code == 400
+        response = client.post(url, data)
+        assert response.status_code == 429
+        assert response['Retry-After'] == '1800'
+        response = client.get('/api/v1/genres/')
+        assert response.status_code == 200
+        assert response['X-RateLimit-Remaining'] == '97', (
+            'Корзина клиента общая для маршрутов, а отклонённый запрос '
+            'токенов не тратит'
+        )
+
+    def test_refill_and_shared_store(self, settings, buckets, monkeypatch):
+        limit = [('ip:10.0.0.1', throttling.parse_rate('2/s'))]
+        store = throttling.LocalBuckets()
+        assert store.check(limit, 100.0) == (True, (2, 1, 0.5, 0.0))
+        assert store.check(limit, 100.0)[0]
+        assert store.check(limit, 100.0) == (False, (2, 0, 1.0, 0.5))
+        assert store.check(limit, 100.5)[0], 'Токен вернулся за 0.5 с'
+
+        settings.THROTTLE = {**settings.THROTTLE, 'CACHE_ALIAS': 'catalog'}
+        assert throttling.check(limit, 200.0)[0]
+        assert throttling.check(limit, 200.0)[0]
+        assert not throttling.check(limit, 200.0)[0], (
+            'Корзины в кэше общие для воркеров'
+        )
+        assert not throttling.local_buckets.states
+
+        def broken(*args, **kwargs):
+            raise ConnectionError
+
+        monkeypatch.setattr(throttling.CacheBuckets, 'check', broken)
+        assert throttling.check(limit, 200.0)[0], (
+            'Без кэша проверка идёт по корзинам процесса'
+        )
+        assert throttling.local_buckets.states
+        assert metrics.collect_counters() == {
+            ('yamdb_throttle_fallback_total', ()): 1,
+        }
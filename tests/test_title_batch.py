@@ -0,0 +1,76 @@
+import pytest
+
+URL = '/api/v1/titles/batch/'
+
+
+@pytest.mark.django_db
+class TestTitleBatch:
+
+    def items(self, count, genres=('genre-0', 'genre-1')):
+        return [
+            {'name': f'Пакет {i}', 'year': 2001, 'category': 'movie',
+             'genre': list(genres)}
+            for i in range(count)
+        ]
+
+    def test_batch_create(self, admin_client, catalog):
+        from api.models import Title
+
+        catalog(titles=0)
+        response = admin_client.post(URL, self.items(5), format='json')
+        assert response.status_code == 201, response.json()
+        results = response.json()['results']
+        assert [item['status'] for item in results] == ['created'] * 5
+        title = Title.objects.get(pk=results[3]['id'])
+        assert title.name == 'Пакет 3'
+        assert sorted(title.genre.values_list('slug', flat=True)) == [
+            'genre-0', 'genre-1'
+        ]
+
+    def test_batch_queries_do_not_grow(
+        self, admin_client, catalog, django_assert_max_num_queries
+    ):
+        catalog(titles=0)
+        with django_assert_max_num_queries(12):
+            response = admin_client.post(URL, self.items(50), format='json')
+        assert response.status_code == 201
+
+    def test_batch_validates_all_items(self, admin_client, catalog):
+        from api.models import Title
+
+        catalog(titles=0)
+        items = self.items(3)
+        items[1]['genre'] = ['genre-0', 'unknown']
+        items[2]['category'] = 'nope'
+        response = admin_client.post(URL, items, format='json')
+        assert response.status_code == 400
+        errors = response.json()
+        assert errors[0] == {}
+        assert 'genre' in errors[1] and 'category' in errors[2]
+        assert not Title.objects.filter(name__startswith='Пакет').exists(), (
+            'Проверьте, что при ошибке не записывается ни одно произведение'
+        )
+
+    def test_batch_upsert(self, admin_client, catalog):
+        catalog(titles=0)
+        admin_client.post(URL, self.items(2), format='json')
+        items = self.items(3, genres=('genre-1',))
+        items[0]['description'] = 'Обновлено'
+        conflict = admin_client.post(URL, items, format='json')
+        assert conflict.status_code == 400
+        response = admin_client.post(f'{URL}?upsert=1', items, format='json')
+        assert response.status_code == 200
+        results = response.json()['results']
+        assert [item['status'] for item in results] == [
+            'updated', 'updated', 'created'
+        ]
+        title = admin_client.get(
+            f'/api/v1/titles/{results[0]["id"]}/'
+        ).json()
+        assert title['description'] == 'Обновлено'
+        assert [genre['slug'] for genre in title['genre']] == ['genre-1']
+
+    def test_batch_requires_admin(self, user_client, catalog):
+        catalog(titles=0)
+        response = user_client.post(URL, self.items(1), format='json')
+        assert response.status_code == 403
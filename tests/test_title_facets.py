@@ -0,0 +1,107 @@
+import pytest
+
+URL = '/api/v1/titles/facets/'
+
+
+def counts(items, key='slug'):
+    return {item[key]: item['count'] for item in items}
+
+
+@pytest.mark.django_db
+class TestTitleFacets:
+
+    def test_counts_under_filters(self, client, catalog):
+        from api.models import Genre, Title
+
+        titles = catalog(titles=3)
+        other = Genre.objects.create(name='Драма', slug='drama')
+        titles[0].genre.add(other)
+        Title.objects.filter(pk=titles[2].pk).update(year=2010)
+
+        data = client.get(URL).json()
+        assert data['count'] == 3
+        assert counts(data['genre']) == {
+            'genre-0': 3, 'genre-1': 3, 'drama': 1
+        }
+        assert counts(data['year'], 'year') == {2000: 2, 2010: 1}
+
+        data = client.get(URL, {'genre': 'DRAMA'}).json()
+        assert data['count'] == 1
+        assert counts(data['category']) == {'movie': 1}
+        data = client.get(URL, {'year': 2000, 'name': 'Произведение 1'})
+        assert data.json()['count'] == 1, (
+            'Текстовые фильтры должны сужать счётчики'
+        )
+
+    def test_index_follows_writes(self, client, catalog):
+        from api import facets
+
+        title = catalog(titles=2)[0]
+        client.get(URL)
+        assert facets.title_facets().version is not None
+        title.year = 1999
+        title.save()
+        title.genre.clear()
+        data = client.get(URL).json()
+        assert counts(data['year'], 'year') == {1999: 1, 2000: 1}
+        assert counts(data['genre']) == {'genre-0': 1, 'genre-1': 1}
+        title.delete()
+        assert client.get(URL).json()['count'] == 1
+
+    def test_rebuild_matches_incremental(self, catalog):
+        from api import facets
+        from api.models import Genre
+
+        index = facets.title_facets()
+        titles = catalog(titles=4)
+        index.counts()
+        titles[1].genre.set([Genre.objects.create(name='Новый', slug='new')])
+        titles[2].delete()
+        incremental = index.counts()
+        index.rebuild()
+        assert index.counts() == incremental, (
+            'Сигналы должны поддерживать индекс в том же виде, что и '
+            'полная перестройка'
+        )
+
+    def test_other_worker_follows_change_log(self, catalog, monkeypatch):
+        from api import facets
+        from api.models import Genre
+
+        titles = catalog(titles=3)
+        # Индекс другого процесса: сигналы этого процесса его не трогают.
+        worker = facets.FacetIndex()
+        worker.counts()
+        rebuilds = []
+        monkeypatch.setattr(worker, 'rebuild', lambda: rebuilds.append(1))
+        titles[0].year = 1999
+        titles[0].save()
+        titles[1].genre.set([Genre.objects.create(name='Новый', slug='new')])
+        titles[2].delete()
+        assert worker.counts() == facets.FacetIndex().counts(), (
+            'Индекс должен догонять записи других процессов по журналу'
+        )
+        assert not rebuilds, (
+            'Запись одного произведения не должна перестраивать индекс '
+            'других процессов'
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rolled_back_write_not_indexed(self, catalog):
+        from django.db import transaction
+
+        from api import facets
+        from api.models import Title
+
+        catalog(titles=2)
+        index = facets.title_facets()
+        before = index.counts()
+        with transaction.atomic():
+            Title.objects.create(name='Откат', year=1990)
+            transaction.set_rollback(True)
+        assert index.counts() == before, (
+            'Откаченная запись не должна попадать в индекс'
+        )
+
+    def test_invalid_filter(self, client):
+        assert client.get(URL, {'year': 'x'}).status_code == 400
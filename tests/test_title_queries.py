@@ -0,0 +1,47 @@
+import pytest
+
+# count + страница произведений с категорией + жанры всей страницы.
+TITLE_LIST_QUERIES = 3
+
+
+@pytest.mark.django_db
+class TestTitleListQueries:
+
+    @pytest.mark.parametrize('titles', [1, 4, 10])
+    def test_title_list_queries_constant(
+        self, client, catalog, django_assert_num_queries, titles
+    ):
+        catalog(titles=titles, genres_per_title=3)
+        with django_assert_num_queries(TITLE_LIST_QUERIES):
+            response = client.get('/api/v1/titles/')
+        assert response.status_code == 200
+        assert len(response.json()['results']) == titles, (
+            'Проверьте, что на странице выводятся все произведения'
+        )
+
+    @pytest.mark.parametrize('query', [
+        'genre=genre-1',
+        'category=movie',
+        'year=2000',
+        'name=Произведение',
+    ])
+    def test_title_list_queries_with_filter(
+        self, client, catalog, django_assert_num_queries, query
+    ):
+        catalog(titles=6, genres_per_title=2)
+        with django_assert_num_queries(TITLE_LIST_QUERIES):
+            response = client.get(f'/api/v1/titles/?{query}')
+        assert response.status_code == 200
+        assert response.json()['count'] == 6, (
+            f'Проверьте, что фильтр {query} работает с оптимизированным '
+            'запросом'
+        )
+
+    def test_title_detail_queries(
+        self, client, catalog, django_assert_num_queries
+    ):
+        title = catalog(titles=1, genres_per_title=5)[0]
+        with django_assert_num_queries(2):
+            response = client.get(f'/api/v1/titles/{title.id}/')
+        assert response.status_code == 200
+        assert len(response.json()['genre']) == 5
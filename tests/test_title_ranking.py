@@ -0,0 +1,95 @@
+import io
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+
+def names(response):
+    assert response.status_code == 200, response.content
+    return [title['name'] for title in response.json()]
+
+
+@pytest.mark.django_db
+class TestTitleRanking:
+
+    def test_top_by_average(self, client, catalog, admin):
+        from api.models import Category, Review, Title
+
+        first, second, third = catalog(titles=3)
+        for score, title in ((1, first), (9, second), (7, third)):
+            Review.objects.create(
+                title=title, author=admin, score=score, text=''
+            )
+        assert names(client.get('/api/v1/titles/top/')) == [
+            'Произведение 1', 'Произведение 2', 'Произведение 0'
+        ]
+        assert names(client.get('/api/v1/titles/top/', {'limit': 1})) == [
+            'Произведение 1'
+        ]
+        book = Category.objects.create(name='Книга', slug='book')
+        Title.objects.filter(pk=third.pk).update(category=book)
+        response = client.get('/api/v1/titles/top/', {'category': 'book'})
+        assert names(response) == ['Произведение 2']
+        assert client.get(
+            '/api/v1/titles/top/', {'limit': 'x'}
+        ).status_code == 400
+
+    def test_average_follows_reviews(self, catalog, reviews):
+        from api.models import Title
+
+        title = catalog(titles=1)[0]
+        created = reviews(count=3, title=title)  # 1, 2, 3
+        assert Title.objects.get(pk=title.pk).rating_avg == 2.0
+        created[0].score = 10
+        created[0].save()
+        created[1].delete()
+        assert Title.objects.get(pk=title.pk).rating_avg == 6.5
+        for review in created[::2]:
+            review.delete()
+        title.refresh_from_db()
+        assert title.rating_avg is None and title.trending_score == 0
+        call_command('rebuild_ratings', check=True, stdout=io.StringIO())
+
+    def test_trending_prefers_recent_reviews(self, client, catalog,
+                                             admin):
+        from api.catalog_io import CatalogImporter
+
+        old, recent = catalog(titles=2)
+        now = timezone.now()
+        records = [
+            {'model': 'api.review', 'fields': {
+                'title': old.pk, 'author': admin.pk, 'score': 5, 'text': '',
+                'pub_date': (now - timedelta(days=60)).isoformat(),
+            }},
+            {'model': 'api.review', 'fields': {
+                'title': recent.pk, 'author': admin.pk, 'score': 5,
+                'text': '', 'pub_date': now.isoformat(),
+            }},
+        ]
+        CatalogImporter().run(records)
+        assert names(client.get('/api/v1/titles/trending/')) == [
+            'Произведение 1', 'Произведение 0'
+        ], 'Свежий отзыв должен весить больше старого'
+        call_command('rebuild_ratings', check=True, stdout=io.StringIO())
+
+    def test_trending_exact_after_delete(self, catalog, admin, user):
+        from api.models import Review, Title
+        from api.ranking import trending_weight
+
+        title = catalog(titles=1)[0]
+        old = timezone.now() - timedelta(days=365)
+        for author in (admin, user):
+            Review.objects.create(title=title, author=author, score=5)
+        Review.objects.filter(author=admin).update(pub_date=old)
+        call_command('rebuild_ratings', stdout=io.StringIO())
+        # Вес свежего отзыва в 2^52 раз больше: вычитание его из суммы
+        # теряет вклад старого целиком.
+        Review.objects.get(author=user).delete()
+        title = Title.objects.get(pk=title.pk)
+        assert title.trending_score == pytest.approx(trending_weight(old)), (
+            'Проверьте, что после удаления отзыва обсуждаемость '
+            'пересчитывается по оставшимся отзывам'
+        )
+        call_command('rebuild_ratings', check=True, stdout=io.StringIO())
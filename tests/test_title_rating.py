@@ -0,0 +1,86 @@
+import io
+
+import pytest
+from django.core.management import CommandError, call_command
+
+
+def rating(title):
+    from api.models import Title
+
+    title = Title.objects.get(pk=title.pk)
+    return title.rating_sum, title.rating_count, title.rating_avg
+
+
+@pytest.mark.django_db
+class TestTitleRating:
+
+    def test_create_and_delete(self, catalog, reviews):
+        title = catalog(titles=1)[0]
+        assert rating(title) == (0, 0, None)
+        created = reviews(count=3, title=title)  # 1, 2, 3
+        assert rating(title) == (6, 3, 2.0), (
+            'Проверьте, что новый отзыв добавляется к рейтингу произведения'
+        )
+        created[2].delete()
+        assert rating(title) == (3, 2, 1.5), (
+            'Проверьте, что удалённый отзыв вычитается из рейтинга'
+        )
+        for review in created[:2]:
+            review.delete()
+        assert rating(title) == (0, 0, None)
+
+    def test_score_edit(self, catalog, reviews):
+        title = catalog(titles=1)[0]
+        review, _ = reviews(count=2, title=title)  # 1, 2
+        review.score = 8
+        review.save()
+        assert rating(title) == (10, 2, 5.0), (
+            'Проверьте, что правка оценки сдвигает сумму, но не количество'
+        )
+        review.save()
+        assert rating(title) == (10, 2, 5.0), (
+            'Повторное сохранение не должно менять рейтинг'
+        )
+
+    def test_move_to_other_title(self, catalog, reviews):
+        first, second = catalog(titles=2)
+        review, _ = reviews(count=2, title=first)  # 1, 2
+        review.title = second
+        review.score = 7
+        review.save()
+        assert rating(first) == (2, 1, 2.0)
+        assert rating(second) == (7, 1, 7.0), (
+            'Проверьте, что отзыв переносится в рейтинг другого произведения'
+        )
+
+    def test_admin_edits(self, admin_client, catalog, reviews):
+        title = catalog(titles=1)[0]
+        review, _ = reviews(count=2, title=title)  # 1, 2
+        url = f'/api/v1/titles/{title.id}/reviews/{review.id}/'
+        response = admin_client.patch(url, {'score': 10}, format='json')
+        assert response.status_code == 200, response.json()
+        assert rating(title) == (12, 2, 6.0)
+        response = admin_client.get(f'/api/v1/titles/{title.id}/')
+        assert response.json()['rating'] == 6, (
+            'Проверьте, что ответ произведения видит новую среднюю оценку'
+        )
+        assert admin_client.delete(url).status_code == 204
+        assert rating(title) == (2, 1, 2.0)
+
+    def test_rebuild_ratings(self, catalog, reviews):
+        from api.models import Title
+
+        title = catalog(titles=1)[0]
+        reviews(count=3, title=title)
+        call_command('rebuild_ratings', check=True, stdout=io.StringIO())
+        Title.objects.filter(pk=title.pk).update(
+            rating_sum=100, rating_count=1, rating_avg=100.0
+        )
+        with pytest.raises(CommandError):
+            call_command('rebuild_ratings', check=True, stdout=io.StringIO())
+        assert rating(title) == (100, 1, 100.0), (
+            '--check не должен ничего записывать'
+        )
+        call_command('rebuild_ratings', stdout=io.StringIO())
+        assert rating(title) == (6, 3, 2.0)
+        call_command('rebuild_ratings', check=True, stdout=io.StringIO())
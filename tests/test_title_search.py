@@ -0,0 +1,90 @@
+import pytest
+
+
+@pytest.mark.django_db
+class TestTitleSearch:
+
+    def names(self, client, query):
+        response = client.get('/api/v1/titles/', {'search': query})
+        assert response.status_code == 200
+        return [title['name'] for title in response.json()['results']]
+
+    def test_prefix_search(self, client):
+        from api.models import Title
+
+        Title.objects.create(name='Крёстный отец', year=1972)
+        Title.objects.create(name='Побег из Шоушенка', year=1994)
+        assert self.names(client, 'крест') == ['Крёстный отец'], (
+            'Проверьте, что search находит произведения по началу слова'
+        )
+        assert self.names(client, 'ПОБ шоу') == ['Побег из Шоушенка']
+        assert self.names(client, 'побег отец') == []
+
+    def test_ranking(self, client):
+        from api.models import Title
+
+        Title.objects.create(name='Мираж', year=2000)
+        Title.objects.create(name='Мир', year=2001)
+        Title.objects.create(name='Мир и мир', year=2002)
+        assert self.names(client, 'мир') == ['Мир и мир', 'Мир', 'Мираж'], (
+            'Проверьте, что точное совпадение слова выше совпадения префикса'
+        )
+
+    def test_index_follows_writes(self, client):
+        from api.models import Title
+
+        title = Title.objects.create(name='Солярис', year=1972)
+        assert self.names(client, 'солярис') == ['Солярис']
+        title.name = 'Сталкер'
+        title.save()
+        assert self.names(client, 'солярис') == []
+        assert self.names(client, 'стал') == ['Сталкер']
+        title.delete()
+        assert self.names(client, 'стал') == []
+
+    @pytest.mark.django_db(transaction=True)
+    def test_rolled_back_write_not_indexed(self, client):
+        from django.db import transaction
+
+        from api.models import Title
+        from api.search import title_index
+
+        title = Title.objects.create(name='Солярис', year=1972)
+        assert self.names(client, 'сол') == ['Солярис']
+        with transaction.atomic():
+            Title.objects.create(name='Соль земли', year=2014)
+            transaction.set_rollback(True)
+        assert self.names(client, 'сол') == ['Солярис']
+        ranked = title_index().search(['сол'], 10)
+        assert [pk for pk, _ in ranked] == [title.pk], (
+            'Откаченная запись не должна попадать в индекс поиска'
+        )
+
+    def test_search_with_other_filters(self, client, catalog):
+        catalog(titles=3)
+        response = client.get(
+            '/api/v1/titles/', {'search': 'произв', 'category': 'movie'}
+        )
+        assert response.json()['count'] == 3
+
+    def test_postgresql_plan_uses_indexes(self, catalog):
+        from django.db import connection, transaction
+
+        from api.models import Title
+        from api.search import create_search_indexes, search_titles
+
+        if connection.vendor != 'postgresql':
+            pytest.skip('GIN-индексы поиска есть только на PostgreSQL')
+        create_search_indexes()
+        catalog(titles=50)
+        queryset = search_titles(Title.objects.all(), 'произв отец')
+        sql, params = queryset.query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Без индексного пути планировщик всё равно выберет Seq Scan.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN ' + sql, params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        assert 'Seq Scan on api_title' not in plan, (
+            'Поиск должен идти по индексам api_title_name_tsv и '
+            'api_title_name_trgm:\n' + plan
+        )
@@ -0,0 +1,80 @@
+import pytest
+
+from api.models import Genre
+
+
+@pytest.mark.django_db
+class TestTitleUpdate:
+
+    def make_genres(self, count):
+        return [
+            Genre.objects.create(name=f'Новый {i}', slug=f'new-{i}').slug
+            for i in range(count)
+        ]
+
+    def patch(self, client, title, data):
+        return client.patch(
+            f'/api/v1/titles/{title.id}/', data, format='json'
+        )
+
+    def test_genres_replaced_by_delta(self, admin_client, catalog):
+        title = catalog(titles=1, genres_per_title=3)[0]
+        response = self.patch(
+            admin_client, title, {'genre': ['genre-1', 'genre-2']}
+        )
+        assert response.status_code == 200
+        assert [g['slug'] for g in response.json()['genre']] == [
+            'genre-1', 'genre-2'
+        ], 'Проверьте, что genre заменяет жанры произведения'
+
+    def test_comma_separated_genres(self, admin_client, catalog):
+        title = catalog(titles=1, genres_per_title=3)[0]
+        response = self.patch(admin_client, title, {'genre': 'genre-0, genre-2'})
+        assert [g['slug'] for g in response.json()['genre']] == [
+            'genre-0', 'genre-2'
+        ]
+
+    def test_unknown_genre(self, admin_client, catalog):
+        title = catalog(titles=1, genres_per_title=1)[0]
+        response = self.patch(admin_client, title, {'genre': ['missing']})
+        assert response.status_code == 404
+        assert title.genre.count() == 1
+
+    def test_invalid_genre_type(self, admin_client, catalog):
+        title = catalog(titles=1, genres_per_title=1)[0]
+        for value in (5, None, {'slug': 'genre-0'}, [1, 2]):
+            response = self.patch(admin_client, title, {'genre': value})
+            assert response.status_code == 400, (
+                f'Проверьте, что genre={value!r} отклоняется с 400'
+            )
+            assert 'genre' in response.json()
+        assert title.genre.count() == 1
+
+    def test_category_kept_when_absent(self, admin_client, catalog):
+        title = catalog(titles=1)[0]
+        response = self.patch(admin_client, title, {'name': 'Другое'})
+        assert response.json()['category']['slug'] == 'movie'
+        assert response.json()['name'] == 'Другое'
+
+    def test_update_queries_do_not_depend_on_genres(
+        self, admin_client, catalog
+    ):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        # Первый запрос кэширует версию токенов пользователя.
+        admin_client.get('/api/v1/users/me/')
+        counts = []
+        for size in (1, 5, 20):
+            title = catalog(titles=1, genres_per_title=size)[0]
+            slugs = self.make_genres(size)
+            with CaptureQueriesContext(connection) as context:
+                response = self.patch(admin_client, title, {'genre': slugs})
+            assert response.status_code == 200
+            assert len(response.json()['genre']) == size
+            counts.append(len(context))
+            title.genre.clear()
+            Genre.objects.filter(slug__startswith='new-').delete()
+        assert len(set(counts)) == 1, (
+            f'Число запросов растёт с числом жанров: {counts}'
+        )